@@ -0,0 +1,173 @@
+"""
+headless batch question answering
+runs a list of prompts over many files and appends the results to a JSONL file
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Union
+
+from boxsdk import Client
+
+from app.box_ai import AI, AIItem, AIJobResult, QAMode, TextGenMode
+from app.box_content import CrawlFilter, crawl_folder
+
+
+def load_prompts(path: str) -> List[str]:
+    """one prompt per line, blank lines and # comments are skipped"""
+    with open(path, "r", encoding="UTF-8") as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+
+def read_checkpoint(path: str) -> Set[Tuple[str, str, str]]:
+    """
+    (file id, mode, prompt) questions already answered in a previous run,
+    an answer in one mode does not count for the other
+
+    Failed results are not included so a resumed run asks them again,
+    a line cut short by a crash is ignored.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    with open(path, "r", encoding="UTF-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if result.get("error") is None:
+                done.add((result["file_id"], result["mode"], result["prompt"]))
+    return done
+
+
+def iter_files(
+    client: Client,
+    folder_id: str = None,
+    file_ids: Iterable[str] = None,
+    item_filter: CrawlFilter = None,
+    max_workers: int = 8,
+) -> Iterator[Tuple[str, str]]:
+    """(file id, file name) of the listed files, then of the files found under folder_id"""
+    for file_id in file_ids or []:
+        yield file_id, None
+
+    if folder_id is not None:
+        for item in crawl_folder(client, folder_id, item_filter=item_filter, max_workers=max_workers):
+            yield item.id, item.name
+
+
+def run_batch(
+    box_ai: AI,
+    files: Iterable[Tuple[str, str]],
+    prompts: List[str],
+    output_path: str,
+    mode: Union[QAMode, TextGenMode] = QAMode.SINGLE_ITEM_QA,
+    max_workers: int = 8,
+    timeout: float = None,
+) -> Dict[str, int]:
+    """
+    Asks every prompt about every file, appending one JSON line per answer
+    as soon as it completes.
+
+    Questions already answered in output_path in the same mode are skipped,
+    so a crashed or interrupted run picks up where it stopped.
+    Questions still unanswered at the timeout are counted as pending
+    and not written, the next run asks them again,
+    along with the files not reached yet.
+
+    :param files:
+        (file id, file name) pairs, e.g. from iter_files.
+    :param mode:
+        QAMode.SINGLE_ITEM_QA or TextGenMode.TEXT_GEN.
+    :returns:
+        The count of answered, failed, skipped and pending questions.
+    """
+    done = read_checkpoint(output_path)
+    stats = {"answered": 0, "failed": 0, "skipped": 0, "pending": 0}
+    file_names = {}
+
+    def jobs():
+        for file_id, file_name in files:
+            file_names[file_id] = file_name
+            for prompt in prompts:
+                if (file_id, mode.value, prompt) in done:
+                    stats["skipped"] += 1
+                    continue
+                yield mode, prompt, [AIItem(file_id, "file")]
+
+    _end_with_newline(output_path)
+    with open(output_path, "a", encoding="UTF-8") as output:
+        for result in box_ai.ask_many(jobs(), max_workers=max_workers, timeout=timeout, as_completed=True):
+            if isinstance(result.error, TimeoutError):
+                # left out of the checkpoint, so the next run asks it
+                stats["pending"] += 1
+                continue
+            output.write(json.dumps(_result_json(result, file_names)) + "\n")
+            # every line written is a checkpoint
+            output.flush()
+            if result.ok:
+                stats["answered"] += 1
+            else:
+                stats["failed"] += 1
+                logging.warning("%s on %s failed: %r", result.job[1], result.job[2][0].item_id, result.error)
+
+    if stats["pending"]:
+        logging.warning("timed out with %s questions pending, run the batch again to resume", stats["pending"])
+
+    return stats
+
+
+def _result_json(result: AIJobResult, file_names: dict) -> dict:
+    mode, prompt, items = result.job
+    file_id = items[0].item_id
+    answer = result.answer
+    return {
+        "file_id": file_id,
+        "file_name": file_names.get(file_id),
+        "mode": mode.value,
+        "prompt": prompt,
+        "answer": answer.answer if answer else None,
+        "created_at": answer.created_at if answer else None,
+        "completion_reason": answer.completion_reason if answer else None,
+        "error": None if result.ok else repr(result.error),
+    }
+
+
+def _end_with_newline(path: str) -> None:
+    """terminates a line cut short by a crash, so appended results start on their own line"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as file:
+        file.seek(-1, os.SEEK_END)
+        if file.read(1) != b"\n":
+            file.write(b"\n")
+
+
+def export_parquet(jsonl_path: str, parquet_path: str) -> None:
+    """
+    Writes the JSONL results to a Parquet file,
+    keeping the last result of each (file id, mode, prompt) question.
+    Only the JSONL file is written as the answers complete,
+    the Parquet file is written at once, from the JSONL file, once the batch is over.
+
+    Requires the pyarrow package.
+    """
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError("export_parquet requires the pyarrow package") from error
+
+    results = {}
+    with open(jsonl_path, "r", encoding="UTF-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[(result["file_id"], result["mode"], result["prompt"])] = result
+
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(list(results.values())), parquet_path)
@@ -1,14 +1,29 @@
 """ box ai class"""
 
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
 import json
-from typing import Any
+import logging
+import threading
+import time
+from typing import Any, Iterable, Iterator, Sequence, Tuple
 from enum import Enum
-from boxsdk import Client
+from boxsdk import BoxAPIException, Client
 from boxsdk.util.api_call_decorator import api_call
 from boxsdk.util.translator import Translator
 from boxsdk.object.cloneable import Cloneable
 
+from app.box_ai_cache import AnswerCache, make_cache_key
+from app.box_ai_cancel import NOT_CANCELLABLE, CallScope, CancelToken
+from app.box_ai_instrumentation import AICallTimings, AIInstrumentation, InstrumentedCall
+from app.box_ai_json import dumps_json
+from app.box_ai_rate_limit import RateLimiter, RetryPolicy, parse_retry_after
+from app.box_ai_stream import AIAnswerDelta, iter_answer_deltas
+from app.box_client import configure_connection_pool
+from app.singleflight import SingleFlight
+
 
 class QAMode(Enum):
     """box ai item mode enum"""
@@ -35,10 +50,20 @@ class AIQuestionMode(Enum):
 class AIItem:
     """box ai item class"""
 
-    def __init__(self, item_id: str, item_type: str, optional_document_content: str = None):
+    __slots__ = ("item_id", "item_type", "optional_document_content", "version")
+
+    def __init__(
+        self,
+        item_id: str,
+        item_type: str,
+        optional_document_content: str = None,
+        version: str = None,
+    ):
         self.item_id = item_id
         self.item_type = item_type
         self.optional_document_content = optional_document_content
+        # file version (etag), only used to key the answer cache
+        self.version = version
 
     def to_json(self):
         # if self.optional_document_content is not None:
@@ -54,6 +79,8 @@ class AIItem:
 class AIAnswer:
     """box ai answer class"""
 
+    __slots__ = ("answer", "created_at", "completion_reason", "prompt")
+
     def __init__(
         self,
         answer: str,
@@ -74,45 +101,161 @@ class AIAnswer:
             "prompt": self.prompt,
         }
 
+    @classmethod
+    def from_deltas(cls, deltas: Iterable[AIAnswerDelta], prompt: str = None) -> "AIAnswer":
+        """Accumulates streamed answer deltas into the final answer"""
+        answer_parts = []
+        created_at = None
+        completion_reason = None
+        for delta in deltas:
+            answer_parts.append(delta.answer)
+            created_at = created_at or delta.created_at
+            completion_reason = delta.completion_reason or completion_reason
+
+        return cls(
+            answer="".join(answer_parts),
+            created_at=created_at,
+            completion_reason=completion_reason,
+            prompt=prompt,
+        )
+
 
 class AIQuestion:
-    """box ai question class"""
+    """
+    box ai question class
+
+    The items and the dialogue history are snapshotted to tuples,
+    turns appended to a DialogueHistory afterwards are not part of the question.
+    The cached json of a DialogueHistory is snapshotted along to reuse its serialized turns.
+    """
+
+    __slots__ = ("prompt", "items", "mode", "dialogue_history", "_history_json", "_history_json_str")
 
     def __init__(
         self,
         prompt: str,
-        items: [AIItem],
+        items: Sequence[AIItem],
         mode: AIQuestionMode = AIQuestionMode.SINGLE_ITEM_QA,
-        dialogue_history: [AIAnswer] = [],
+        dialogue_history: Sequence[AIAnswer] = None,
     ):
         self.prompt = prompt
-        self.items = items
+        self.items = tuple(items)
         self.mode = mode
-        self.dialogue_history = dialogue_history
+        self._history_json = None
+        self._history_json_str = None
+        if dialogue_history is None:
+            dialogue_history = ()
+        elif hasattr(dialogue_history, "to_json_str"):
+            # a DialogueHistory keeps the json of its turns
+            self._history_json = tuple(dialogue_history.to_json())
+            self._history_json_str = dialogue_history.to_json_str()
+        self.dialogue_history = tuple(dialogue_history)
+
+    def _dialogue_history_json(self) -> list:
+        if self._history_json is not None:
+            return list(self._history_json)
+        return [dialogue.to_json() for dialogue in self.dialogue_history]
 
     def to_json(self):
-        items_json = []
-        for item in self.items:
-            items_json.append(item.to_json())
-
-        dialogue_history_json = []
-        for dialogue in self.dialogue_history:
-            dialogue_history_json.append(dialogue.to_json())
-
         return {
             "prompt": self.prompt,
-            "items": items_json,
+            "items": [item.to_json() for item in self.items],
             "mode": self.mode.value,
-            "dialogue_history": dialogue_history_json,
+            "dialogue_history": self._dialogue_history_json(),
         }
 
+    def to_json_str(self, is_streamed: bool = False) -> str:
+        """
+        The ai/ask request body, serialized in a single pass.
+        The cached turns of a DialogueHistory are spliced in as they are.
+        """
+        question_json = {
+            "prompt": self.prompt,
+            "items": [item.to_json() for item in self.items],
+            "mode": self.mode.value,
+            "config": {"is_streamed": is_streamed},
+        }
+        if self._history_json_str is not None:
+            return dumps_json(question_json)[:-1] + ',"dialogue_history":' + self._history_json_str + "}"
+
+        question_json["dialogue_history"] = self._dialogue_history_json()
+        return dumps_json(question_json)
+
+
+_NOT_INSTRUMENTED = nullcontext()
+
+# items accepted by a single multiple_item_qa request
+MULTIPLE_ITEM_QA_MAX_ITEMS = 25
+# file etags kept by AI.get_file_version, expired ones are dropped past it
+ETAG_CACHE_MAX_ENTRIES = 10000
+
+COLLECTION_REDUCE_PROMPT = (
+    "The content holds partial answers to the same question, each one about a different group of documents. "
+    "Merge them into a single answer to the question, keeping every relevant fact and dropping repetitions. "
+    "Question: {prompt}"
+)
+
+
+class AIJobResult:
+    """box ai batch job result class"""
+
+    def __init__(
+        self,
+        index: int,
+        job: Tuple[Any, str, Iterable[AIItem]],
+        answer: AIAnswer = None,
+        error: Exception = None,
+    ):
+        self.index = index
+        self.job = job
+        self.answer = answer
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """True when the job returned an answer"""
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return f"AIJobResult(index={self.index}, ok={self.ok})"
+
 
 class AI(Cloneable):
     """box ai class"""
 
-    def __init__(self, client: Client):
+    def __init__(
+        self,
+        client: Client,
+        cache: AnswerCache = None,
+        rate_limiter: RateLimiter = None,
+        retry_policy: RetryPolicy = None,
+        instrumentation: AIInstrumentation = None,
+        single_flight: SingleFlight = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        etag_ttl: float = None,
+    ):
         self.client = client
         self._session = client._session
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        # a rate limiter needs to see the throttled responses
+        if retry_policy is None and rate_limiter is not None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.instrumentation = instrumentation
+        # concurrent identical questions share one ai/ask call
+        self.single_flight = single_flight
+        # seconds to connect, and between two reads of the response
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # seconds a looked up file etag is reused to key the answer cache,
+        # a new file version may be answered from the cache for that long
+        self.etag_ttl = etag_ttl
+        self._etags = {}
+        self._etags_lock = threading.Lock()
+        # concurrent lookups of the same file etag share one request
+        self._etag_flight = SingleFlight()
 
     @property
     def translator(self) -> "Translator":
@@ -132,53 +275,382 @@ class AI(Cloneable):
         # pylint:disable=no-self-use
         return self._session.get_url(endpoint, *args)
 
-    def _get_ai_api_response(self, prompt: str, ai_question: AIQuestion) -> AIAnswer:
-        ai_question_json = ai_question.to_json()
-        ai_question_json["config"] = {"is_streamed": False}
-        data = json.dumps(ai_question_json)
-        # print(data)
-
-        url = self.get_url("ai/ask")
-        box_response = self._session.post(url, data=data, expect_json_response=True)
-
-        response = box_response.json()
-        response_object = self.translator.translate(
-            session=self._session,
-            response_object=response,
-        )
+    def _get_item_versions(self, items: [AIItem], scope: CallScope = NOT_CANCELLABLE) -> [str]:
+        """
+        Returns the version of each item, looking up the etag
+        of files that were not given one
+        """
+        versions = []
+        for item in items:
+            version = item.version
+            if version is None and item.item_type == "file":
+                version = self.get_file_version(item.item_id, scope)
+            versions.append(version)
+        return versions
+
+    def get_file_version(self, file_id: str, scope: CallScope = NOT_CANCELLABLE) -> str:
+        """
+        The file etag, reused for etag_ttl seconds when set.
+        Give items their version to skip the lookup altogether.
 
-        return AIAnswer(
-            answer=response_object["answer"],
-            created_at=response_object["created_at"],
-            completion_reason=response_object["completion_reason"],
-            prompt=prompt,
+        :param scope:
+            The call the lookup is made for, cancelling it gives up the lookup,
+            which completes in the background for the other callers.
+        """
+        now = time.monotonic()
+        if self.etag_ttl:
+            with self._etags_lock:
+                entry = self._etags.get(file_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        etag = scope.call(self._etag_flight.do, file_id, lambda: self.client.file(file_id).get(fields=["etag"]).etag)
+
+        if self.etag_ttl:
+            with self._etags_lock:
+                if len(self._etags) >= ETAG_CACHE_MAX_ENTRIES:
+                    self._etags = {key: entry for key, entry in self._etags.items() if entry[0] > now}
+                    if len(self._etags) >= ETAG_CACHE_MAX_ENTRIES:
+                        self._etags.clear()
+                self._etags[file_id] = (time.monotonic() + self.etag_ttl, etag)
+        return etag
+
+    def _get_cache_key(self, ai_question: AIQuestion, scope: CallScope = NOT_CANCELLABLE) -> str:
+        if self.cache is None:
+            return None
+        return make_cache_key(
+            ai_question.to_json(), self._get_item_versions(ai_question.items, scope), user=self._as_user()
         )
 
-    def _get_ai_api_response_streamed(self, prompt: str, ai_question: AIQuestion) -> AIAnswer:
-        ai_question_json = ai_question.to_json()
-        ai_question_json["config"] = {"is_streamed": True}
-        data = json.dumps(ai_question_json)
-        # print(data)
-
+    def _as_user(self) -> str:
+        """the user impersonated by the client, None for the authenticated user"""
+        return self._session.get_constructor_kwargs()["default_headers"].get("As-User")
+
+    def _get_request_timeout(self, scope: CallScope) -> Tuple[float, float]:
+        """the connect and read timeouts, shortened to the time left before the call deadline"""
+        connect_timeout, read_timeout = self.connect_timeout, self.read_timeout
+        remaining = scope.remaining()
+        if remaining is not None:
+            remaining = max(remaining, 0.001)
+            connect_timeout = remaining if connect_timeout is None else min(connect_timeout, remaining)
+            read_timeout = remaining if read_timeout is None else min(read_timeout, remaining)
+        if connect_timeout is None and read_timeout is None:
+            return None
+        return (connect_timeout, read_timeout)
+
+    def _post_ai_ask(
+        self,
+        mode: str,
+        data: str,
+        scope: CallScope = NOT_CANCELLABLE,
+        timings: AICallTimings = None,
+        **kwargs: Any,
+    ):
+        """
+        Posts to ai/ask, going through the rate limiter
+        and retrying throttled or failed requests when configured.
+        Otherwise the boxsdk session default retries apply.
+        """
         url = self.get_url("ai/ask")
-        box_response = self._session.post(url, data=data, expect_json_response=False)
-
-        for chunk in box_response.network_response.request_response.iter_lines():
-            if chunk:
-                response_object = self.translator.translate(
-                    session=self._session,
-                    response_object=json.loads(chunk),
+        scope.raise_if_cancelled()
+        timeout = self._get_request_timeout(scope)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if timings is not None:
+            # passed down to requests, called as soon as the response headers arrive
+            kwargs["hooks"] = {"response": timings.on_response}
+        if self.retry_policy is None:
+            if timings is not None:
+                timings.mark_dispatched()
+            try:
+                return scope.call(self._session.post, url, data=data, abandon=_close_box_response, **kwargs)
+            except Exception:
+                scope.raise_if_cancelled()
+                raise
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(mode)
+            if timings is not None:
+                timings.mark_dispatched()
+            try:
+                box_response = scope.call(
+                    self._session.post,
+                    url,
+                    data=data,
+                    skip_retry_codes=set(self.retry_policy.retry_statuses),
+                    abandon=_close_box_response,
+                    **kwargs,
                 )
+            except BoxAPIException as error:
+                retry_after = parse_retry_after(error.headers)
+                if error.status == 429 and self.rate_limiter is not None:
+                    self.rate_limiter.on_throttle(mode, retry_after)
+                if not self.retry_policy.should_retry(error.status, attempt):
+                    raise
+                scope.sleep(self.retry_policy.get_delay(attempt, retry_after))
+                attempt += 1
+                if timeout is not None:
+                    kwargs["timeout"] = self._get_request_timeout(scope)
+                continue
+            except Exception:
+                scope.raise_if_cancelled()
+                raise
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_success(mode)
+            return box_response
+
+    def _instrumented(self, ai_question: AIQuestion, streamed: bool):
+        """timings context of a call, a shared no-op without instrumentation"""
+        if self.instrumentation is None:
+            return _NOT_INSTRUMENTED
+        return InstrumentedCall(self.instrumentation, AICallTimings(ai_question.mode.value, streamed))
+
+    def _single_flight_key(self, ai_question: AIQuestion, streamed: bool, lean: bool = False) -> tuple:
+        """the request payload, and the impersonated user as answers depend on their permissions"""
+        return (self._as_user(), streamed, lean, ai_question.to_json_str(is_streamed=streamed))
+
+    def _ask(self, prompt: str, ai_question: AIQuestion, scope: CallScope = NOT_CANCELLABLE) -> AIAnswer:
+        # a cancellable call is not shared, cancelling it would fail the other callers
+        if self.single_flight is None or scope.cancellable:
+            with scope:
+                return self._get_ai_api_response(prompt, ai_question, scope)
+
+        answer = self.single_flight.do(
+            self._single_flight_key(ai_question, streamed=False),
+            lambda: self._get_ai_api_response(prompt, ai_question),
+        )
+        # every caller gets its own copy of the shared answer
+        return AIAnswer(answer.answer, answer.created_at, answer.completion_reason, answer.prompt)
+
+    def _ask_streamed(
+        self, prompt: str, ai_question: AIQuestion, lean: bool, scope: CallScope = NOT_CANCELLABLE
+    ) -> Iterator:
+        stream = self._get_ai_api_response_deltas if lean else self._get_ai_api_response_streamed
+        if self.single_flight is None or scope.cancellable:
+            return stream(prompt, ai_question, scope)
+
+        return self.single_flight.do_stream(
+            self._single_flight_key(ai_question, streamed=True, lean=lean),
+            lambda: stream(prompt, ai_question),
+        )
 
-                yield AIAnswer(
-                    answer=response_object["answer"],
-                    created_at=response_object["created_at"],
-                    completion_reason=response_object.get("completion_reason"),
-                    prompt=prompt,
+    def _get_ai_api_response(
+        self, prompt: str, ai_question: AIQuestion, scope: CallScope = NOT_CANCELLABLE
+    ) -> AIAnswer:
+        with self._instrumented(ai_question, streamed=False) as timings:
+            cache_key = self._get_cache_key(ai_question, scope)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if timings is not None:
+                    timings.mark_cache_checked()
+                if cached is not None:
+                    if timings is not None:
+                        timings.cache_hit = True
+                    return AIAnswer(
+                        answer=cached["answer"],
+                        created_at=cached["created_at"],
+                        completion_reason=cached["completion_reason"],
+                        prompt=prompt,
+                    )
+
+            data = ai_question.to_json_str(is_streamed=False)
+            # print(data)
+
+            if timings is not None:
+                timings.mark_serialized()
+
+            # the body is read after the response is attached, so a cancel aborts its read too
+            box_response = self._post_ai_ask(
+                ai_question.mode.value, data, scope, timings, expect_json_response=False, stream=True
+            )
+            request_response = box_response.network_response.request_response
+            scope.attach(request_response)
+            try:
+                body = request_response.content
+            except Exception:
+                # reading an aborted response fails, report the cancellation instead
+                scope.raise_if_cancelled()
+                raise
+            finally:
+                request_response.close()
+            scope.raise_if_cancelled()
+
+            if timings is not None:
+                timings.bytes_received = len(body)
+
+            response = json.loads(body)
+            response_object = self.translator.translate(
+                session=self._session,
+                response_object=response,
+            )
+
+            answer = AIAnswer(
+                answer=response_object["answer"],
+                created_at=response_object["created_at"],
+                completion_reason=response_object["completion_reason"],
+                prompt=prompt,
+            )
+
+            if timings is not None:
+                timings.mark_chunk()
+
+            if cache_key is not None:
+                self.cache.set(cache_key, answer.to_json())
+
+            return answer
+
+    def _get_ai_api_response_streamed(
+        self, prompt: str, ai_question: AIQuestion, scope: CallScope = NOT_CANCELLABLE
+    ) -> AIAnswer:
+        with self._instrumented(ai_question, streamed=True) as timings, scope:
+            cache_key = self._get_cache_key(ai_question, scope)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if timings is not None:
+                    timings.mark_cache_checked()
+                if cached is not None:
+                    if timings is not None:
+                        timings.cache_hit = True
+                    # replay the whole answer as a single final chunk
+                    yield AIAnswer(
+                        answer=cached["answer"],
+                        created_at=cached["created_at"],
+                        completion_reason=cached["completion_reason"],
+                        prompt=prompt,
+                    )
+                    return
+
+            data = ai_question.to_json_str(is_streamed=True)
+            # print(data)
+
+            if timings is not None:
+                timings.mark_serialized()
+
+            box_response = self._post_ai_ask(
+                ai_question.mode.value, data, scope, timings, expect_json_response=False, stream=True
+            )
+            request_response = box_response.network_response.request_response
+            scope.attach(request_response)
+
+            answer_parts = []
+            answer = None
+            try:
+                for chunk in request_response.iter_lines():
+                    scope.raise_if_cancelled()
+                    if chunk:
+                        response_object = self.translator.translate(
+                            session=self._session,
+                            response_object=json.loads(chunk),
+                        )
+
+                        answer = AIAnswer(
+                            answer=response_object["answer"],
+                            created_at=response_object["created_at"],
+                            completion_reason=response_object.get("completion_reason"),
+                            prompt=prompt,
+                        )
+                        if cache_key is not None:
+                            answer_parts.append(answer.answer)
+                        if timings is not None:
+                            timings.bytes_received += len(chunk) + 1
+                            timings.mark_chunk()
+
+                        yield answer
+            except Exception:
+                # reading an aborted response fails, report the cancellation instead
+                scope.raise_if_cancelled()
+                raise
+            finally:
+                # releases the pooled connection, even when the consumer stops early
+                request_response.close()
+            # an aborted response may also just end early
+            scope.raise_if_cancelled()
+
+            # only complete streams are cached
+            if cache_key is not None and answer is not None:
+                self.cache.set(
+                    cache_key,
+                    {
+                        "answer": "".join(answer_parts),
+                        "created_at": answer.created_at,
+                        "completion_reason": answer.completion_reason or "done",
+                        "prompt": prompt,
+                    },
                 )
 
+    def _get_ai_api_response_deltas(
+        self, prompt: str, ai_question: AIQuestion, scope: CallScope = NOT_CANCELLABLE
+    ) -> AIAnswerDelta:
+        """
+        Lean streaming: the response body is read as it arrives and parsed
+        incrementally, plain answer frames skip the boxsdk translator
+        """
+        with self._instrumented(ai_question, streamed=True) as timings, scope:
+            cache_key = self._get_cache_key(ai_question, scope)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if timings is not None:
+                    timings.mark_cache_checked()
+                if cached is not None:
+                    if timings is not None:
+                        timings.cache_hit = True
+                    yield AIAnswerDelta(cached["answer"], cached["created_at"], cached["completion_reason"])
+                    return
+
+            data = ai_question.to_json_str(is_streamed=True)
+
+            if timings is not None:
+                timings.mark_serialized()
+
+            box_response = self._post_ai_ask(
+                ai_question.mode.value, data, scope, timings, expect_json_response=False, stream=True
+            )
+            request_response = box_response.network_response.request_response
+            scope.attach(request_response)
+
+            body = request_response.iter_content(chunk_size=None)
+            if timings is not None:
+                body = timings.count_bytes(body)
+
+            def translate(frame: dict) -> dict:
+                return self.translator.translate(session=self._session, response_object=frame)
+
+            deltas = []
+            try:
+                for delta in iter_answer_deltas(body, translate):
+                    scope.raise_if_cancelled()
+                    if cache_key is not None:
+                        deltas.append(delta)
+                    if timings is not None:
+                        timings.mark_chunk()
+                    yield delta
+            except Exception:
+                # reading an aborted response fails, report the cancellation instead
+                scope.raise_if_cancelled()
+                raise
+            finally:
+                # releases the pooled connection, even when the consumer stops early
+                request_response.close()
+            # an aborted response may also just end early
+            scope.raise_if_cancelled()
+
+            if cache_key is not None and deltas:
+                answer = AIAnswer.from_deltas(deltas, prompt)
+                answer.completion_reason = answer.completion_reason or "done"
+                self.cache.set(cache_key, answer.to_json())
+
     @api_call
-    def ask_item(self, mode: QAMode, prompt: str, items: [AIItem]) -> AIAnswer:
+    def ask_item(
+        self,
+        mode: QAMode,
+        prompt: str,
+        items: [AIItem],
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AIAnswer:
         """
         Ask the AI a question.
 
@@ -187,11 +659,16 @@ class AI(Cloneable):
             “single_item_qa” - Ask a question about a single document
             “multiple_item_qa” - Ask a question about a group of items.
             This is not yet fully implemented, so you may experience issues.
+            See ask_collection for large groups of items.
         :param prompt:
             The question you wish to ask about your document or content.
         :param items:
             This is an array of AIItem objects that describe the file
             or content you wish to add to your context.
+        :param cancel_token:
+            A CancelToken to abort the call from another thread.
+        :param timeout:
+            Seconds allowed for the whole call, AIDeadlineExceeded is raised past it.
 
         :returns:
             An AIAnswer object containing the answer to your question.
@@ -204,10 +681,18 @@ class AI(Cloneable):
             mode=mode,
         )
 
-        return self._get_ai_api_response(prompt, ai_question)
+        return self._ask(prompt, ai_question, _call_scope(cancel_token, timeout))
 
     @api_call
-    def ask_item_streamed(self, mode: QAMode, prompt: str, items: [AIItem]) -> AIAnswer:
+    def ask_item_streamed(
+        self,
+        mode: QAMode,
+        prompt: str,
+        items: [AIItem],
+        lean: bool = False,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AIAnswer:
         """
         Ask the AI a question.
 
@@ -221,6 +706,15 @@ class AI(Cloneable):
         :param items:
             This is an array of AIItem objects that describe the file
             or content you wish to add to your context.
+        :param lean:
+            Yield lightweight AIAnswerDelta chunks parsed as they arrive,
+            see AIAnswer.from_deltas to assemble the final answer.
+        :param cancel_token:
+            A CancelToken to abort the call from another thread,
+            the response is closed and AICancelledError raised by the next read.
+        :param timeout:
+            Seconds allowed for the whole call, including reading the stream,
+            AIDeadlineExceeded is raised past it.
 
         :returns:
             An AIAnswer object containing the answer to your question.
@@ -233,7 +727,7 @@ class AI(Cloneable):
             mode=mode,
         )
 
-        return self._get_ai_api_response_streamed(prompt, ai_question)
+        return self._ask_streamed(prompt, ai_question, lean, _call_scope(cancel_token, timeout))
 
     @api_call
     def ask_text_gen(
@@ -241,6 +735,8 @@ class AI(Cloneable):
         prompt: str,
         item: AIItem,
         dialogue_history: [AIAnswer] = None,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
     ) -> AIAnswer:
         """
         Ask the AI a question.
@@ -250,6 +746,10 @@ class AI(Cloneable):
         :param dialogue_history:
             Dialogue history contains the previous prompts
             and answers from the same item(s)
+        :param cancel_token:
+            A CancelToken to abort the call from another thread.
+        :param timeout:
+            Seconds allowed for the whole call, AIDeadlineExceeded is raised past it.
 
         :returns:
             An AIAnswer object containing the answer to your question.
@@ -264,7 +764,7 @@ class AI(Cloneable):
             dialogue_history=dialogue_history,
         )
 
-        return self._get_ai_api_response(prompt, ai_question)
+        return self._ask(prompt, ai_question, _call_scope(cancel_token, timeout))
 
     @api_call
     def ask_text_gen_streamed(
@@ -272,6 +772,9 @@ class AI(Cloneable):
         prompt: str,
         item: AIItem,
         dialogue_history: [AIAnswer] = None,
+        lean: bool = False,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
     ) -> AIAnswer:
         """
         Ask the AI a question.
@@ -281,6 +784,15 @@ class AI(Cloneable):
         :param dialogue_history:
             Dialogue history contains the previous prompts
             and answers from the same item(s)
+        :param lean:
+            Yield lightweight AIAnswerDelta chunks parsed as they arrive,
+            see AIAnswer.from_deltas to assemble the final answer.
+        :param cancel_token:
+            A CancelToken to abort the call from another thread,
+            the response is closed and AICancelledError raised by the next read.
+        :param timeout:
+            Seconds allowed for the whole call, including reading the stream,
+            AIDeadlineExceeded is raised past it.
 
         :returns:
             An AIAnswer object containing the answer to your question.
@@ -295,4 +807,211 @@ class AI(Cloneable):
             dialogue_history=dialogue_history,
         )
 
-        return self._get_ai_api_response_streamed(prompt, ai_question)
+        return self._ask_streamed(prompt, ai_question, lean, _call_scope(cancel_token, timeout))
+
+    def ask_many(
+        self,
+        jobs: Iterable[Tuple[Any, str, Iterable[AIItem]]],
+        max_workers: int = 8,
+        timeout: float = None,
+        as_completed: bool = False,
+    ) -> Iterator[AIJobResult]:
+        """
+        Ask the AI many questions in parallel.
+
+        :param jobs:
+            An iterable of (mode, prompt, items) tuples,
+            each one is sent as an ask_item request,
+            or as an ask_text_gen request about its single item
+            when mode is TextGenMode.TEXT_GEN (or AIQuestionMode.TEXT_GEN).
+            A text_gen job without exactly one item is reported with a ValueError.
+        :param max_workers:
+            Maximum number of requests in flight.
+            Jobs are pulled from the iterable as workers free up,
+            so large (or lazy) job lists are never queued at once.
+        :param timeout:
+            Seconds allowed for the whole batch. Jobs submitted but not
+            answered in time are reported with a TimeoutError, the jobs
+            not yet pulled from the iterable are left in it, unreported.
+            Requests already running are not aborted, they complete in
+            the background (pass a cancel_token per call to abort them).
+        :param as_completed:
+            Yield results as they complete instead of in input order.
+
+        :returns:
+            An iterator of AIJobResult objects, one per job pulled from the iterable,
+            so every job without timeout, only the jobs submitted in time with one.
+            Errors are reported per job and never stop the batch.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        configure_connection_pool(self.client, max_workers)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        indexed_jobs = enumerate(jobs)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="box-ai-batch")
+
+        def submit_next() -> bool:
+            for index, job in indexed_jobs:
+                mode, prompt, items = job
+                if getattr(mode, "value", mode) == TextGenMode.TEXT_GEN.value:
+                    items = list(items)
+                    if len(items) == 1:
+                        future = executor.submit(self.ask_text_gen, prompt, items[0], [])
+                    else:
+                        future = Future()
+                        future.set_exception(ValueError(f"a text_gen job takes a single item, got {len(items)}"))
+                else:
+                    future = executor.submit(self.ask_item, mode, prompt, items)
+                pending.append((index, job, future))
+                return True
+            return False
+
+        def remaining() -> float:
+            if deadline is None:
+                return None
+            return max(0.0, deadline - time.monotonic())
+
+        def result_of(index, job, future) -> AIJobResult:
+            try:
+                return AIJobResult(index, job, answer=future.result(timeout=0))
+            except Exception as error:  # pylint: disable=broad-except
+                return AIJobResult(index, job, error=error)
+
+        try:
+            # keep a small backlog so workers never wait on submission
+            while len(pending) < max_workers * 2 and submit_next():
+                pass
+
+            while pending:
+                if as_completed:
+                    done, _ = wait(
+                        [future for _, _, future in pending], timeout=remaining(), return_when=FIRST_COMPLETED
+                    )
+                else:
+                    done, _ = wait([pending[0][2]], timeout=remaining())
+
+                if not done:
+                    break
+
+                for entry in [entry for entry in pending if entry[2] in done]:
+                    pending.remove(entry)
+                    yield result_of(*entry)
+                    # no new job is pulled once out of time
+                    if deadline is None or time.monotonic() < deadline:
+                        submit_next()
+
+            # out of time, report the submitted jobs, the others stay in the iterable
+            for index, job, future in pending:
+                if future.done():
+                    yield result_of(index, job, future)
+                    continue
+                future.cancel()
+                yield AIJobResult(index, job, error=TimeoutError("batch timeout exceeded"))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def ask_collection(
+        self,
+        prompt: str,
+        items: Iterable[AIItem],
+        batch_size: int = MULTIPLE_ITEM_QA_MAX_ITEMS,
+        max_workers: int = 8,
+        timeout: float = None,
+        reduce_prompt: str = COLLECTION_REDUCE_PROMPT,
+    ) -> AIAnswer:
+        """
+        Ask the AI a question about any number of items, map-reduce style.
+
+        The items are split into multiple_item_qa batches of batch_size
+        asked in parallel, then the partial answers are merged by text_gen
+        calls, batch_size answers at a time, until a single answer is left.
+
+        :param prompt:
+            The question you wish to ask about the items.
+        :param items:
+            The AIItem objects the question is about.
+        :param batch_size:
+            Items per multiple_item_qa request, and partial answers per merge.
+        :param max_workers:
+            Maximum number of requests in flight.
+        :param timeout:
+            Seconds allowed for each round of requests.
+        :param reduce_prompt:
+            Prompt of the merge calls, formatted with the question as {prompt}.
+
+        :returns:
+            An AIAnswer object containing the merged answer.
+            Failed batches are left out of the merge,
+            the first error is raised when every batch failed.
+        """
+        items = list(items)
+        if not items:
+            raise ValueError("ask_collection requires at least one item")
+        if batch_size < 2:
+            raise ValueError("batch_size must be at least 2")
+
+        if len(items) == 1:
+            return self.ask_item(QAMode.SINGLE_ITEM_QA, prompt, items)
+
+        jobs = [(QAMode.MULTIPLE_ITEM_QA, prompt, batch) for batch in _batches(items, batch_size)]
+        answers = self._ask_all(jobs, max_workers, timeout)
+
+        # the merge content is attached to the first item, as text_gen takes a single item
+        anchor = items[0]
+        merge_prompt = reduce_prompt.format(prompt=prompt)
+        while len(answers) > 1:
+            jobs = [
+                (
+                    TextGenMode.TEXT_GEN,
+                    merge_prompt,
+                    [AIItem(anchor.item_id, anchor.item_type, _partial_answers_content(group))],
+                )
+                for group in _batches(answers, batch_size)
+            ]
+            answers = self._ask_all(jobs, max_workers, timeout)
+
+        answer = answers[0]
+        answer.prompt = prompt
+        return answer
+
+    def _ask_all(self, jobs: list, max_workers: int, timeout: float) -> [AIAnswer]:
+        """answers of the successful jobs, in order, raising the first error when none succeeded"""
+        answers = []
+        errors = []
+        for result in self.ask_many(jobs, max_workers=max_workers, timeout=timeout):
+            if result.ok:
+                answers.append(result.answer)
+            else:
+                logging.warning("ask_collection batch %s failed: %r", result.index, result.error)
+                errors.append(result.error)
+        # jobs never submitted before the timeout are not reported by ask_many
+        unasked = len(jobs) - len(answers) - len(errors)
+        if unasked:
+            logging.warning("ask_collection: %s batches not asked before the timeout", unasked)
+            errors.append(TimeoutError("batch timeout exceeded"))
+        if not answers:
+            raise errors[0]
+        return answers
+
+
+def _close_box_response(box_response) -> None:
+    """releases the connection of a response nobody waits for anymore"""
+    box_response.network_response.request_response.close()
+
+
+def _call_scope(cancel_token: CancelToken, timeout: float) -> CallScope:
+    if cancel_token is None and timeout is None:
+        return NOT_CANCELLABLE
+    return CallScope(cancel_token, None if timeout is None else time.monotonic() + timeout)
+
+
+def _batches(values: list, size: int) -> Iterator[list]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _partial_answers_content(answers: [AIAnswer]) -> str:
+    return "\n\n".join(f"Partial answer {index}:\n{answer.answer}" for index, answer in enumerate(answers, 1))
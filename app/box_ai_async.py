@@ -0,0 +1,213 @@
+""" box ai asyncio class"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from boxsdk import Client
+
+from app.box_ai import AI, AIAnswer, AIItem, QAMode
+from app.box_ai_cancel import CancelToken
+from app.box_client import configure_connection_pool
+
+_STREAM_DONE = object()
+
+
+class AsyncAI:
+    """
+    asyncio box ai class
+
+    Runs the AI requests on a bounded worker pool sharing the client
+    keep-alive connection pool, so authentication, session renewal
+    and retries are handled by the same boxsdk session as AI.
+    Calls go through the AI methods, with its cache, single-flight and cancellation.
+    """
+
+    def __init__(self, client: Client, max_concurrency: int = 10, ai: AI = None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        configure_connection_pool(client, max_concurrency)
+
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._ai = ai if ai is not None else AI(client)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="box-ai")
+        self._semaphore = None
+
+    async def __aenter__(self) -> "AsyncAI":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the worker pool"""
+        self._executor.shutdown(wait=False)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # created on first use so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call(self, method: Callable, *args: Any, **kwargs: Any) -> AIAnswer:
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def _stream(self, answers: Iterator) -> AsyncIterator:
+        """
+        Reads a blocking stream on the worker pool.
+
+        When the consumer stops early (or its task is cancelled) the chunk being read
+        is waited for, as a generator cannot be closed while it runs in another thread,
+        then the stream is closed, releasing its response.
+        """
+        async with self._get_semaphore():
+            reading = None
+            try:
+                while True:
+                    reading = self._executor.submit(next, answers, _STREAM_DONE)
+                    answer = await asyncio.wrap_future(reading)
+                    reading = None
+                    if answer is _STREAM_DONE:
+                        break
+                    yield answer
+            finally:
+                if reading is not None:
+                    await asyncio.wait([asyncio.wrap_future(reading)])
+                close = getattr(answers, "close", None)
+                if close is not None:
+                    close()
+
+    async def ask_item(
+        self,
+        mode: QAMode,
+        prompt: str,
+        items: [AIItem],
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AIAnswer:
+        """
+        Ask the AI a question, see AI.ask_item.
+
+        :param mode:
+            This tells Box AI what type of request you will be making
+            “single_item_qa” - Ask a question about a single document
+            “multiple_item_qa” - Ask a question about a group of items.
+        :param prompt:
+            The question you wish to ask about your document or content.
+        :param items:
+            This is an array of AIItem objects that describe the file
+            or content you wish to add to your context.
+        :param cancel_token:
+            A CancelToken to abort the call.
+        :param timeout:
+            Seconds allowed for the whole call.
+
+        :returns:
+            An AIAnswer object containing the answer to your question.
+        """
+        return await self._call(self._ai.ask_item, mode, prompt, items, cancel_token=cancel_token, timeout=timeout)
+
+    def ask_item_streamed(
+        self,
+        mode: QAMode,
+        prompt: str,
+        items: [AIItem],
+        lean: bool = False,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AsyncIterator:
+        """
+        Ask the AI a question, streaming the answer, see AI.ask_item_streamed.
+
+        :param mode:
+            This tells Box AI what type of request you will be making
+            “single_item_qa” - Ask a question about a single document
+            “multiple_item_qa” - Ask a question about a group of items.
+        :param prompt:
+            The question you wish to ask about your document or content.
+        :param items:
+            This is an array of AIItem objects that describe the file
+            or content you wish to add to your context.
+        :param lean:
+            Yield AIAnswerDelta chunks instead of AIAnswer objects.
+        :param cancel_token:
+            A CancelToken to abort the call.
+        :param timeout:
+            Seconds allowed for the whole call.
+
+        :returns:
+            An async iterator of AIAnswer chunks.
+        """
+        return self._stream(
+            self._ai.ask_item_streamed(mode, prompt, items, lean=lean, cancel_token=cancel_token, timeout=timeout)
+        )
+
+    async def ask_text_gen(
+        self,
+        prompt: str,
+        item: AIItem,
+        dialogue_history: [AIAnswer] = None,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AIAnswer:
+        """
+        Ask the AI to generate text, see AI.ask_text_gen.
+
+        :param prompt:
+            The question you wish to ask about your document or content.
+        :param item:
+            The AIItem the text is generated for.
+        :param dialogue_history:
+            Dialogue history contains the previous prompts
+            and answers from the same item(s)
+        :param cancel_token:
+            A CancelToken to abort the call.
+        :param timeout:
+            Seconds allowed for the whole call.
+
+        :returns:
+            An AIAnswer object containing the answer to your question.
+        """
+        return await self._call(
+            self._ai.ask_text_gen, prompt, item, dialogue_history, cancel_token=cancel_token, timeout=timeout
+        )
+
+    def ask_text_gen_streamed(
+        self,
+        prompt: str,
+        item: AIItem,
+        dialogue_history: [AIAnswer] = None,
+        lean: bool = False,
+        cancel_token: CancelToken = None,
+        timeout: float = None,
+    ) -> AsyncIterator:
+        """
+        Ask the AI to generate text, streaming the answer, see AI.ask_text_gen_streamed.
+
+        :param prompt:
+            The question you wish to ask about your document or content.
+        :param item:
+            The AIItem the text is generated for.
+        :param dialogue_history:
+            Dialogue history contains the previous prompts
+            and answers from the same item(s)
+        :param lean:
+            Yield AIAnswerDelta chunks instead of AIAnswer objects.
+        :param cancel_token:
+            A CancelToken to abort the call.
+        :param timeout:
+            Seconds allowed for the whole call.
+
+        :returns:
+            An async iterator of AIAnswer chunks.
+        """
+        return self._stream(
+            self._ai.ask_text_gen_streamed(
+                prompt, item, dialogue_history, lean=lean, cancel_token=cancel_token, timeout=timeout
+            )
+        )
@@ -0,0 +1,176 @@
+""" box ai answer cache, keyed by question payload and item versions"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from app.box_ai_json import dumps_json
+
+
+def make_cache_key(ai_question_json: dict, item_versions: Iterable[str], user: str = None) -> str:
+    """
+    Builds a cache key from the question payload
+    (prompt, items, mode, dialogue history) and the
+    version (etag) of each item, so a new file version
+    is never answered from the cache
+
+    :param user:
+        The user the call is made for (the As-User id),
+        answers depend on their permissions so users never share an answer.
+    """
+    normalized = dumps_json(
+        {"question": ai_question_json, "versions": list(item_versions), "user": user}, sort_keys=True
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Base answer cache
+
+    Stores answers as their json dict representation,
+    subclasses implement the _get, _set and __len__ storage methods.
+
+    :param max_entries:
+        Maximum number of answers kept, least recently used are evicted first.
+    :param ttl:
+        Seconds an answer stays valid, None to keep answers until evicted.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """returns the cached answer json or None"""
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key: str, value: dict) -> None:
+        """stores an answer json"""
+        with self._lock:
+            self._set(key, value)
+
+    def stats(self) -> dict:
+        """hit/miss counters"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self),
+            }
+
+    def _expires_at(self) -> Optional[float]:
+        return None if self.ttl is None else time.time() + self.ttl
+
+    def _get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: dict) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class LRUAnswerCache(AnswerCache):
+    """in memory least recently used answer cache"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = None):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._entries = OrderedDict()
+
+    def _get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: str, value: dict) -> None:
+        self._entries[key] = (self._expires_at(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """on disk answer cache, shared between runs"""
+
+    def __init__(self, path: str = ".ai_cache.db", max_entries: int = 10000, ttl: float = None):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access)")
+        self._connection.commit()
+
+    def close(self) -> None:
+        """closes the database connection"""
+        with self._lock:
+            self._connection.close()
+
+    def _get(self, key: str) -> Optional[dict]:
+        row = self._connection.execute("SELECT value, expires_at FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            self._connection.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._connection.commit()
+            self.evictions += 1
+            return None
+
+        self._connection.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+        self._connection.commit()
+        return json.loads(value)
+
+    def _set(self, key: str, value: dict) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO answers (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, dumps_json(value), self._expires_at(), time.time()),
+        )
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self._connection.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+        self._connection.commit()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
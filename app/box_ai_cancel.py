@@ -0,0 +1,209 @@
+"""
+box ai call cancellation
+cancel tokens and per call deadlines, closing the response in flight
+"""
+
+from concurrent.futures import Future
+import logging
+import socket
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class AICancelledError(Exception):
+    """the call was cancelled before it completed"""
+
+
+class AIDeadlineExceeded(AICancelledError, TimeoutError):
+    """the call did not complete before its deadline"""
+
+
+class CancelToken:
+    """
+    Cancels the calls it is passed to, from any thread
+
+    Cancelling a call closes its response, releasing the pooled connection
+    even while a read is blocked, a call still waiting for the response
+    headers or for the file etag returns at once.
+    A token can be shared by several calls, e.g. every call of a client session.
+    """
+
+    def __init__(self) -> None:
+        self.error: Optional[AICancelledError] = None
+        self._callbacks = []
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel was called"""
+        return self._cancelled.is_set()
+
+    def cancel(self, error: AICancelledError = None) -> None:
+        """cancels the calls, only the first cancel has an effect"""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.error = error if error is not None else AICancelledError("call cancelled")
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("cancel callback failed")
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """calls callback on cancel, right away if already cancelled"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise self.error
+
+    def wait(self, seconds: float) -> bool:
+        """sleeps up to seconds, returning True early when cancelled"""
+        return self._cancelled.wait(seconds)
+
+
+def abort_response(request_response) -> None:
+    """
+    Closes a requests response from any thread.
+    The socket is shut down first so a read blocked on it returns at once,
+    then the closed connection goes back to the pool.
+    """
+    connection = getattr(request_response.raw, "_connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    request_response.close()
+
+
+class CallScope:
+    """
+    cancellation of a single call, from a cancel token and a deadline
+
+    A scope without token nor deadline is a no-op, shared by the plain calls.
+    """
+
+    def __init__(self, cancel_token: CancelToken = None, deadline: float = None) -> None:
+        self.deadline = deadline
+        self.cancellable = cancel_token is not None or deadline is not None
+        self._cancel_token = cancel_token
+        self._token = CancelToken() if self.cancellable else None
+        self._timer = None
+
+    def __enter__(self) -> "CallScope":
+        if not self.cancellable:
+            return self
+        if self._cancel_token is not None:
+            self._cancel_token.add_callback(self._cancel_from_token)
+        if self.deadline is not None:
+            self._timer = threading.Timer(max(0.0, self.remaining()), self._cancel_on_deadline)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if not self.cancellable:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._cancel_token is not None:
+            self._cancel_token.remove_callback(self._cancel_from_token)
+
+    def _cancel_from_token(self) -> None:
+        self._token.cancel(self._cancel_token.error)
+
+    def _cancel_on_deadline(self) -> None:
+        self._token.cancel(AIDeadlineExceeded("call deadline exceeded"))
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancellable and self._token.cancelled
+
+    def remaining(self) -> Optional[float]:
+        """seconds left before the deadline, None without deadline"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancellable:
+            if self.deadline is not None and self.remaining() <= 0:
+                self._token.cancel(AIDeadlineExceeded("call deadline exceeded"))
+            self._token.raise_if_cancelled()
+
+    def attach(self, request_response) -> None:
+        """aborts request_response when the call is cancelled"""
+        if self.cancellable:
+            self._token.add_callback(lambda: abort_response(request_response))
+
+    def call(self, function: Callable, *args: Any, abandon: Callable[[Any], None] = None, **kwargs: Any) -> Any:
+        """
+        Runs a blocking call, such as a request still waiting for its response headers,
+        returning (raising) as soon as the scope is cancelled.
+
+        The call runs on its own thread, a cancelled call is left to complete there
+        and abandon is called with its result, e.g. to close the late response.
+        """
+        if not self.cancellable:
+            return function(*args, **kwargs)
+        self.raise_if_cancelled()
+
+        future = Future()
+        settled = threading.Event()
+
+        def run() -> None:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except BaseException as error:  # pylint: disable=broad-except
+                future.set_exception(error)
+
+        future.add_done_callback(lambda _: settled.set())
+        self._token.add_callback(settled.set)
+        threading.Thread(target=run, name="box-ai-call", daemon=True).start()
+        try:
+            settled.wait()
+        finally:
+            self._token.remove_callback(settled.set)
+
+        if not future.done() or self.cancelled:
+
+            def abandon_result(done: Future) -> None:
+                if abandon is not None and done.exception() is None:
+                    abandon(done.result())
+
+            future.add_done_callback(abandon_result)
+            self.raise_if_cancelled()
+        return future.result()
+
+    def sleep(self, seconds: float) -> None:
+        """sleeps between retries, waking up (and raising) when cancelled"""
+        if not self.cancellable:
+            time.sleep(seconds)
+            return
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._token.wait(max(0.0, remaining))
+            self._token.cancel(AIDeadlineExceeded("call deadline exceeded"))
+        else:
+            self._token.wait(seconds)
+        self.raise_if_cancelled()
+
+
+NOT_CANCELLABLE = CallScope()
@@ -0,0 +1,214 @@
+""" box ai per call timings and instrumentation hooks"""
+
+import time
+from typing import Callable, Iterable, Iterator
+
+
+class AICallTimings:
+    """
+    timings of a single ai/ask call
+
+    Points in time are time.perf_counter() values, None when not reached.
+    started_at_ns is the wall clock start, for exporters.
+
+    The phases between two points:
+        started -> cache_checked: cache lookup, with the etag lookup of items without version
+        cache_checked -> serialized: question payload serialization
+        serialized -> dispatched: queueing, rate limiter waits and retry backoff
+        dispatched -> request_sent: session work, authorization header and token renewal
+        request_sent -> first_byte: connection setup, upload and server time
+        first_byte -> last_chunk: response body, answer chunks for streamed calls
+    Points of the request are those of its last attempt.
+    """
+
+    __slots__ = (
+        "mode",
+        "streamed",
+        "started_at_ns",
+        "started_at",
+        "cache_checked_at",
+        "serialized_at",
+        "dispatched_at",
+        "request_sent_at",
+        "first_byte_at",
+        "first_chunk_at",
+        "last_chunk_at",
+        "ended_at",
+        "response_elapsed",
+        "attempts",
+        "bytes_received",
+        "chunks_received",
+        "cache_hit",
+        "error",
+    )
+
+    def __init__(self, mode: str, streamed: bool):
+        self.mode = mode
+        self.streamed = streamed
+        self.started_at_ns = time.time_ns()
+        self.started_at = time.perf_counter()
+        self.cache_checked_at = None
+        self.serialized_at = None
+        self.dispatched_at = None
+        self.request_sent_at = None
+        # response headers received, before the body is read
+        self.first_byte_at = None
+        self.first_chunk_at = None
+        self.last_chunk_at = None
+        self.ended_at = None
+        # requests elapsed time, request sent to headers parsed, last attempt only
+        self.response_elapsed = None
+        # requests sent, retries included
+        self.attempts = 0
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.cache_hit = False
+        self.error = None
+
+    def mark_cache_checked(self) -> None:
+        """answer cache looked up"""
+        self.cache_checked_at = time.perf_counter()
+
+    def mark_serialized(self) -> None:
+        """question payload serialized"""
+        self.serialized_at = time.perf_counter()
+
+    def mark_dispatched(self) -> None:
+        """request handed to the session, once the rate limiter let it through"""
+        self.dispatched_at = time.perf_counter()
+
+    def on_response(self, request_response, *args, **kwargs) -> None:
+        """
+        requests response hook, called once the response headers are parsed
+        and before the body is read, the request went out elapsed seconds earlier
+        """
+        # pylint: disable=unused-argument
+        self.first_byte_at = time.perf_counter()
+        self.attempts += 1
+        elapsed = getattr(request_response, "elapsed", None)
+        if elapsed is not None:
+            self.response_elapsed = elapsed.total_seconds()
+            self.request_sent_at = self.first_byte_at - self.response_elapsed
+
+    def mark_chunk(self) -> None:
+        """an answer chunk was parsed"""
+        now = time.perf_counter()
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        self.last_chunk_at = now
+        self.chunks_received += 1
+
+    def count_bytes(self, byte_chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """passes the response body through, counting its bytes"""
+        for byte_chunk in byte_chunks:
+            self.bytes_received += len(byte_chunk)
+            yield byte_chunk
+
+    def _since_start(self, point: float):
+        return None if point is None else point - self.started_at
+
+    def to_json(self) -> dict:
+        """points as seconds since the call started"""
+        return {
+            "mode": self.mode,
+            "streamed": self.streamed,
+            "cache_checked": self._since_start(self.cache_checked_at),
+            "serialized": self._since_start(self.serialized_at),
+            "dispatched": self._since_start(self.dispatched_at),
+            "request_sent": self._since_start(self.request_sent_at),
+            "first_byte": self._since_start(self.first_byte_at),
+            "first_chunk": self._since_start(self.first_chunk_at),
+            "last_chunk": self._since_start(self.last_chunk_at),
+            "total": self._since_start(self.ended_at),
+            "response_elapsed": self.response_elapsed,
+            "attempts": self.attempts,
+            "bytes_received": self.bytes_received,
+            "chunks_received": self.chunks_received,
+            "cache_hit": self.cache_hit,
+            "error": None if self.error is None else repr(self.error),
+        }
+
+
+class AIInstrumentation:
+    """receives the timings of every AI call, does nothing by default"""
+
+    def on_call_end(self, timings: AICallTimings) -> None:
+        """called once per call, when it completes, fails or is abandoned"""
+
+
+class CallbackInstrumentation(AIInstrumentation):
+    """forwards the timings to a callback"""
+
+    def __init__(self, callback: Callable[[AICallTimings], None]):
+        self.callback = callback
+
+    def on_call_end(self, timings: AICallTimings) -> None:
+        self.callback(timings)
+
+
+class OpenTelemetryInstrumentation(AIInstrumentation):
+    """
+    records each call as an OpenTelemetry span,
+    with an event for each point reached
+
+    Requires the opentelemetry-api package.
+    """
+
+    EVENTS = (
+        "cache_checked_at",
+        "serialized_at",
+        "dispatched_at",
+        "request_sent_at",
+        "first_byte_at",
+        "first_chunk_at",
+        "last_chunk_at",
+    )
+
+    def __init__(self, tracer=None, span_name: str = "box_ai.ask"):
+        if tracer is None:
+            # optional dependency, imported on use to keep the ai client import cheap
+            try:
+                from opentelemetry import trace  # pylint: disable=import-outside-toplevel
+            except ImportError as error:
+                raise ImportError("OpenTelemetryInstrumentation requires the opentelemetry-api package") from error
+            tracer = trace.get_tracer(__name__)
+        self.tracer = tracer
+        self.span_name = span_name
+
+    def _ns(self, timings: AICallTimings, point: float) -> int:
+        return timings.started_at_ns + int((point - timings.started_at) * 1e9)
+
+    def on_call_end(self, timings: AICallTimings) -> None:
+        span = self.tracer.start_span(self.span_name, start_time=timings.started_at_ns)
+        span.set_attribute("box_ai.mode", timings.mode)
+        span.set_attribute("box_ai.streamed", timings.streamed)
+        span.set_attribute("box_ai.cache_hit", timings.cache_hit)
+        span.set_attribute("box_ai.bytes_received", timings.bytes_received)
+        span.set_attribute("box_ai.chunks_received", timings.chunks_received)
+        span.set_attribute("box_ai.attempts", timings.attempts)
+        for event in self.EVENTS:
+            point = getattr(timings, event)
+            if point is not None:
+                span.add_event(event[: -len("_at")], timestamp=self._ns(timings, point))
+        if timings.error is not None:
+            span.record_exception(timings.error)
+        span.end(end_time=self._ns(timings, timings.ended_at))
+
+
+class InstrumentedCall:
+    """context of an instrumented call, reports the timings on exit"""
+
+    __slots__ = ("instrumentation", "timings")
+
+    def __init__(self, instrumentation: AIInstrumentation, timings: AICallTimings):
+        self.instrumentation = instrumentation
+        self.timings = timings
+
+    def __enter__(self) -> AICallTimings:
+        return self.timings
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.timings.ended_at = time.perf_counter()
+        if exc_value is not None and not isinstance(exc_value, GeneratorExit):
+            self.timings.error = exc_value
+        self.instrumentation.on_call_end(self.timings)
@@ -0,0 +1,34 @@
+""" json serialization shared by the ai requests, the cache keys and the sqlite answer cache"""
+
+from datetime import date, datetime
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def json_default(value: Any) -> Any:
+    """
+    Encodes the values json does not know,
+    datetimes as ISO 8601 (2023-10-18T10:00:00-07:00) and anything else as str
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps_json(value: Any, sort_keys: bool = False) -> str:
+    """
+    Serializes to compact json, with orjson when installed.
+    Both paths encode through json_default, so they give the same text.
+    """
+    if orjson is not None:
+        # datetimes are passed to json_default instead of orjson's own encoder
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, default=json_default, option=option).decode("utf-8")
+    return json.dumps(value, default=json_default, sort_keys=sort_keys, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,209 @@
+""" box ai rate limiting and retry scheduling"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket
+
+    :param rate:
+        Tokens added per second.
+    :param capacity:
+        Maximum burst, defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Blocks until the tokens are available.
+        Returns the number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Holds every caller back for the given number of seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+
+    def set_rate(self, rate: float) -> None:
+        """Changes the refill rate, keeping the tokens already earned"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class RateLimiter:
+    """
+    Adaptive rate limiter shared by every AI request of the process
+
+    Each request takes a token from the global bucket and,
+    when a budget is configured for its mode, from the mode bucket.
+    Throttled requests halve the rate of their bucket and pause it
+    for the Retry-After time, successful ones slowly bring the
+    rate back up to the configured budget.
+
+    :param rate:
+        Global requests per second.
+    :param budgets:
+        Requests per second by mode value,
+        e.g. {"single_item_qa": 5, "text_gen": 2}
+    :param min_rate:
+        The rate never drops below this value.
+    :param recovery:
+        Fraction of the budget given back on each success.
+    """
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        budgets: Dict[str, float] = None,
+        min_rate: float = 0.5,
+        recovery: float = 0.05,
+    ):
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self._budgets = {None: rate}
+        self._buckets = {None: TokenBucket(rate)}
+        for mode, budget in (budgets or {}).items():
+            self._budgets[mode] = budget
+            self._buckets[mode] = TokenBucket(budget)
+
+    def _mode_buckets(self, mode: str):
+        buckets = [(None, self._buckets[None])]
+        if mode in self._buckets:
+            buckets.insert(0, (mode, self._buckets[mode]))
+        return buckets
+
+    def rate(self, mode: str = None) -> float:
+        """current rate for the mode, or the global rate"""
+        return self._buckets.get(mode, self._buckets[None]).rate
+
+    def acquire(self, mode: str = None) -> float:
+        """Blocks until the request is allowed, returns the seconds waited"""
+        return sum(bucket.acquire() for _, bucket in self._mode_buckets(mode))
+
+    def on_success(self, mode: str = None) -> None:
+        """additive increase back towards the budget"""
+        for key, bucket in self._mode_buckets(mode):
+            budget = self._budgets[key]
+            if bucket.rate < budget:
+                bucket.set_rate(min(budget, bucket.rate + budget * self.recovery))
+
+    def on_throttle(self, mode: str = None, retry_after: float = None) -> None:
+        """multiplicative decrease, and pause for the Retry-After time"""
+        for _, bucket in self._mode_buckets(mode):
+            bucket.set_rate(max(self.min_rate, bucket.rate / 2))
+            if retry_after:
+                bucket.pause(retry_after)
+
+
+class RetryPolicy:
+    """
+    Retries throttled and failed requests
+    with jittered exponential backoff
+
+    :param max_attempts:
+        Total attempts, including the first one.
+    :param base_delay:
+        Delay cap of the first retry, doubled on each attempt.
+    :param max_delay:
+        Upper limit of any computed delay.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        retry_statuses: frozenset = RETRY_STATUSES,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+
+    def should_retry(self, status: int, attempt: int) -> bool:
+        """attempt is zero based"""
+        return status in self.retry_statuses and attempt + 1 < self.max_attempts
+
+    def get_delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Full jitter backoff, never shorter than the
+        Retry-After time sent by the server
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if retry_after is not None:
+            return min(self.max_delay, retry_after) + backoff * 0.1
+        return backoff
+
+
+def parse_retry_after(headers: Optional[dict]) -> Optional[float]:
+    """Retry-After header as seconds, either delta seconds or an http date"""
+    if not headers:
+        return None
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_SHARED_RATE_LIMITER = None
+_SHARED_RATE_LIMITER_LOCK = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Returns the process wide rate limiter, creating it with defaults"""
+    global _SHARED_RATE_LIMITER  # pylint: disable=global-statement
+    with _SHARED_RATE_LIMITER_LOCK:
+        if _SHARED_RATE_LIMITER is None:
+            _SHARED_RATE_LIMITER = RateLimiter()
+        return _SHARED_RATE_LIMITER
+
+
+def set_shared_rate_limiter(rate_limiter: RateLimiter) -> None:
+    """Replaces the process wide rate limiter"""
+    global _SHARED_RATE_LIMITER  # pylint: disable=global-statement
+    with _SHARED_RATE_LIMITER_LOCK:
+        _SHARED_RATE_LIMITER = rate_limiter
@@ -0,0 +1,115 @@
+""" box ai lean streaming, incremental NDJSON / SSE parsing"""
+
+import json
+from typing import Callable, Iterable, Iterator
+
+# frames made only of these keys need no smart object translation
+PLAIN_ANSWER_KEYS = frozenset({"answer", "created_at", "completion_reason"})
+
+_SSE_FIELD_PREFIXES = (b"event:", b"id:", b"retry:", b":")
+
+# decodes str directly, json.loads would sniff the encoding of every frame
+_decode_json = json.JSONDecoder().decode
+
+
+class AIAnswerDelta:
+    """
+    lightweight streamed answer chunk
+
+    Unlike AIAnswer it does not carry the prompt,
+    use AIAnswer.from_deltas to assemble the full answer.
+    """
+
+    __slots__ = ("answer", "created_at", "completion_reason")
+
+    def __init__(self, answer: str, created_at: str = None, completion_reason: str = None):
+        self.answer = answer
+        self.created_at = created_at
+        self.completion_reason = completion_reason
+
+    def __repr__(self) -> str:
+        return f"AIAnswerDelta({self.answer!r}, completion_reason={self.completion_reason!r})"
+
+
+class StreamParser:
+    """
+    Incremental frame parser
+
+    Bytes are fed as they arrive from the network, complete
+    frames are decoded as soon as their line ends. Handles
+    newline delimited json and server sent events (data: lines).
+    """
+
+    def __init__(self):
+        # the unterminated tail of the frame being received, in chunks
+        self._tail = []
+
+    def feed(self, data: bytes) -> Iterator[dict]:
+        """decodes the frames completed by data, only data is searched for line ends"""
+        if b"\n" not in data:
+            if data:
+                self._tail.append(data)
+            return
+        lines = data.split(b"\n")
+        if self._tail:
+            self._tail.append(lines[0])
+            lines[0] = b"".join(self._tail)
+        last = lines.pop()
+        self._tail = [last] if last else []
+
+        for line in lines:
+            frame = self._decode(line)
+            if frame is not None:
+                yield frame
+
+    def close(self) -> Iterator[dict]:
+        """decodes a trailing frame without a line end"""
+        line = b"".join(self._tail)
+        self._tail = []
+        frame = self._decode(line)
+        if frame is not None:
+            yield frame
+
+    @staticmethod
+    def _decode(line: bytes):
+        if line[:1] == b"{":
+            # a plain ndjson frame, a trailing \r is skipped by the decoder
+            return _decode_json(line.decode("utf-8"))
+        line = line.strip()
+        if not line:
+            return None
+        if line.startswith(b"data:"):
+            line = line[5:].lstrip()
+            if line == b"[DONE]":
+                return None
+        elif line.startswith(_SSE_FIELD_PREFIXES):
+            return None
+        return _decode_json(line.decode("utf-8"))
+
+
+def iter_answer_deltas(
+    byte_chunks: Iterable[bytes],
+    translate: Callable[[dict], dict] = None,
+) -> Iterator[AIAnswerDelta]:
+    """
+    Parses a streamed ai/ask response body into AIAnswerDelta objects.
+
+    :param byte_chunks:
+        The response body, in chunks of any size.
+    :param translate:
+        Called for frames that carry more than a plain answer,
+        typically the boxsdk translator.
+    """
+    parser = StreamParser()
+
+    def to_delta(frame: dict) -> AIAnswerDelta:
+        if translate is not None and not frame.keys() <= PLAIN_ANSWER_KEYS:
+            frame = translate(frame)
+        return AIAnswerDelta(frame.get("answer", ""), frame.get("created_at"), frame.get("completion_reason"))
+
+    for byte_chunk in byte_chunks:
+        for frame in parser.feed(byte_chunk):
+            yield to_delta(frame)
+
+    for frame in parser.close():
+        yield to_delta(frame)
@@ -3,27 +3,73 @@ Handles the box client object creation
 orchestrates the authentication process
 """
 
+import threading
+from typing import TYPE_CHECKING
+
 from boxsdk import Client
-from app.box_oauth import oauth_from_previous
-from app.config import AppConfig
-from app.oaut_callback import callback_handle_request, open_browser
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    from app.config import AppConfig
+    from app.token_manager import TokenManager
+
+_POOL_LOCK = threading.Lock()
 
 
-def get_client(config: AppConfig) -> Client:
-    """Returns a boxsdk Client object"""
-    oauth = oauth_from_previous()
+def get_client(config: "AppConfig", token_manager: "TokenManager" = None) -> Client:
+    """
+    Returns a boxsdk Client object
+    The tokens are refreshed in the background before they expire
+    """
+    # the interactive oauth flow is only imported by the processes using it,
+    # the ai client path only needs configure_connection_pool
+    from app.oaut_callback import callback_handle_request, open_browser  # pylint: disable=import-outside-toplevel
+    from app.token_manager import TokenManager  # pylint: disable=import-outside-toplevel
+
+    token_manager = token_manager or TokenManager(config)
 
     # do we need to authorize the app?
-    if not oauth.access_token:
-        auth_url, csrf_token = oauth.get_authorization_url(config.redirect_uri)
+    if not token_manager.access_token:
+        auth_url, csrf_token = token_manager.oauth.get_authorization_url(config.redirect_uri)
         open_browser(auth_url)
         callback_handle_request(config, csrf_token)
+        token_manager.reload()
 
-    oauth = oauth_from_previous()
-
-    if not oauth.access_token:
+    if not token_manager.access_token:
         raise RuntimeError("Unable to authenticate")
 
-    oauth.refresh(oauth.access_token)
+    # only refreshes when the stored token is about to expire
+    token_manager.ensure_fresh()
+    token_manager.start()
+
+    return Client(token_manager.oauth)
+
+
+def configure_connection_pool(client: Client, pool_size: int = 10) -> Client:
+    """
+    Sizes the keep-alive connection pool of the client network layer
+    so that up to pool_size concurrent requests reuse open connections
+    instead of opening (and discarding) a new one per request.
+
+    The pool only grows: when the mounted adapters already hold pool_size
+    connections they are kept, with their open connections, so the client
+    can be configured by every caller (AsyncAI, ask_many, the service factory).
+    Growing it replaces the adapters, best done when the client is built.
+    """
+    # the default boxsdk network layer wraps a requests.Session
+    requests_session = getattr(client.session._network_layer, "_session", None)
+    if requests_session is None:
+        return client
+
+    with _POOL_LOCK:
+        current_size = min(
+            getattr(requests_session.get_adapter(prefix), "_pool_maxsize", 0) for prefix in ("https://", "http://")
+        )
+        if current_size >= pool_size:
+            return client
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        requests_session.mount("https://", adapter)
+        requests_session.mount("http://", adapter)
 
-    return Client(oauth)
+    return client
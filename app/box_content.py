@@ -1,9 +1,21 @@
 """handle box content management to list files and navigate folders"""
-from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import queue
+import threading
+from typing import Iterable, Iterator, List, Tuple
 
 from boxsdk import Client
 from boxsdk.object.item import Item
 
+CRAWL_FIELDS = ["id", "type", "name", "size", "modified_at", "etag", "parent"]
+CRAWL_PAGE_SIZE = 1000
+# fields of a folder view, the first page of children comes with the folder
+FOLDER_VIEW_FIELDS = ["id", "type", "name", "parent", "path_collection", "item_collection"]
+FOLDER_VIEW_ITEM_FIELDS = ["id", "type", "name"]
+
+_CRAWL_DONE = object()
+
 
 def get_folder_items(client: Client, folder_id: str = "0") -> Iterable[Item]:
     """get folder items"""
@@ -18,3 +30,225 @@ def get_folder_items(client: Client, folder_id: str = "0") -> Iterable[Item]:
         files_folders.append(item)
 
     return files_folders
+
+
+class FolderViewItem:
+    """id, type and name of a folder child"""
+
+    __slots__ = ("id", "type", "name")
+
+    def __init__(self, item_id: str, item_type: str, name: str) -> None:
+        self.id = item_id  # pylint: disable=invalid-name
+        self.type = item_type
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"FolderViewItem({self.type} {self.id} {self.name})"
+
+
+class FolderView:
+    """
+    a folder with its children and ancestry
+
+    :param ancestors:
+        (id, name) of the folders above, from the root.
+    """
+
+    __slots__ = ("folder_id", "name", "parent_id", "ancestors", "items")
+
+    def __init__(
+        self,
+        folder_id: str,
+        name: str,
+        parent_id: str,
+        ancestors: Tuple[Tuple[str, str], ...],
+        items: List[FolderViewItem],
+    ) -> None:
+        self.folder_id = folder_id
+        self.name = name
+        self.parent_id = parent_id
+        self.ancestors = ancestors
+        self.items = items
+
+    @property
+    def sub_folder_ids(self) -> List[str]:
+        return [item.id for item in self.items if item.type == "folder"]
+
+    @property
+    def path(self) -> str:
+        return "/".join([name for _, name in self.ancestors] + [self.name])
+
+
+def _view_items(entries) -> List[FolderViewItem]:
+    return [
+        FolderViewItem(entry["id"], entry["type"], entry["name"]) for entry in entries if entry["type"] != "web_link"
+    ]
+
+
+def get_folder_view(client: Client, folder_id: str = "0", page_size: int = CRAWL_PAGE_SIZE) -> FolderView:
+    """
+    Gets a folder, its parent, ancestors and children in one request
+    restricted to the view fields, the children beyond the first page
+    of the item collection are listed with the item fields only.
+    Web links are skipped, as in get_folder_items.
+    """
+    folder = client.folder(folder_id=folder_id).get(fields=FOLDER_VIEW_FIELDS)
+    collection = folder.item_collection
+    entries = list(collection["entries"])
+    if collection.get("total_count", len(entries)) > len(entries):
+        entries.extend(
+            client.folder(folder_id=folder_id).get_items(
+                limit=page_size, offset=len(entries), fields=FOLDER_VIEW_ITEM_FIELDS
+            )
+        )
+
+    ancestors = tuple((entry["id"], entry["name"]) for entry in folder.path_collection["entries"])
+    parent = folder.parent
+    return FolderView(
+        folder_id=folder.id,
+        name=folder.name,
+        parent_id=parent["id"] if parent is not None else "0",
+        ancestors=ancestors,
+        items=_view_items(entries),
+    )
+
+
+def _item_field(item: Item, field: str):
+    return item[field] if field in item else None
+
+
+class CrawlFilter:
+    """
+    file filters applied by the crawler before yielding
+
+    :param extensions:
+        File extensions to keep, e.g. ["pdf", "docx"], case insensitive.
+    :param min_size:
+        Minimum file size in bytes.
+    :param max_size:
+        Maximum file size in bytes.
+    :param modified_after:
+        Only files modified after this datetime, naive datetimes are UTC.
+    """
+
+    def __init__(
+        self,
+        extensions: Iterable[str] = None,
+        min_size: int = None,
+        max_size: int = None,
+        modified_after: datetime = None,
+    ):
+        self.extensions = None
+        if extensions is not None:
+            self.extensions = {extension.lower().lstrip(".") for extension in extensions}
+        self.min_size = min_size
+        self.max_size = max_size
+        if modified_after is not None and modified_after.tzinfo is None:
+            modified_after = modified_after.replace(tzinfo=timezone.utc)
+        self.modified_after = modified_after
+
+    def __call__(self, item: Item) -> bool:
+        if self.extensions is not None:
+            name = _item_field(item, "name") or ""
+            extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+            if extension not in self.extensions:
+                return False
+
+        if self.min_size is not None or self.max_size is not None:
+            size = _item_field(item, "size") or 0
+            if self.min_size is not None and size < self.min_size:
+                return False
+            if self.max_size is not None and size > self.max_size:
+                return False
+
+        if self.modified_after is not None:
+            modified_at = _item_field(item, "modified_at")
+            if modified_at is None or datetime.fromisoformat(modified_at) <= self.modified_after:
+                return False
+
+        return True
+
+
+def crawl_folder(
+    client: Client,
+    folder_id: str = "0",
+    item_filter: CrawlFilter = None,
+    max_workers: int = 8,
+    page_size: int = CRAWL_PAGE_SIZE,
+    fields: Iterable[str] = None,
+    include_folders: bool = False,
+) -> Iterator[Item]:
+    """
+    Walks a folder tree listing folders in parallel,
+    yielding files as soon as their folder page arrives.
+
+    Only the crawl fields are requested, with large pages and
+    marker based paging. Files are filtered before they are yielded.
+
+    :param item_filter:
+        A CrawlFilter, or any callable taking an item and returning a bool.
+    :param max_workers:
+        Maximum number of folders listed at the same time.
+    :param include_folders:
+        Also yield the sub folders found, unfiltered.
+    """
+    fields = list(fields) if fields is not None else CRAWL_FIELDS
+    # the consumer pace bounds how far ahead the crawl runs
+    found = queue.Queue(maxsize=page_size * 2)
+    stopped = threading.Event()
+    pending_lock = threading.Lock()
+    pending = [0]
+
+    def put(value) -> bool:
+        while not stopped.is_set():
+            try:
+                found.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def submit(executor: ThreadPoolExecutor, sub_folder_id: str) -> None:
+        with pending_lock:
+            pending[0] += 1
+        executor.submit(list_folder, executor, sub_folder_id)
+
+    def list_folder(executor: ThreadPoolExecutor, current_folder_id: str) -> None:
+        try:
+            items = client.folder(folder_id=current_folder_id).get_items(
+                limit=page_size,
+                use_marker=True,
+                fields=fields,
+            )
+            for item in items:
+                if stopped.is_set():
+                    return
+                if item.type == "folder":
+                    submit(executor, item.id)
+                    if include_folders and not put(item):
+                        return
+                elif item.type == "file":
+                    if (item_filter is None or item_filter(item)) and not put(item):
+                        return
+        except Exception as error:  # pylint: disable=broad-except
+            put(error)
+        finally:
+            with pending_lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                put(_CRAWL_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="box-crawl")
+    try:
+        submit(executor, folder_id)
+        while True:
+            value = found.get()
+            if value is _CRAWL_DONE:
+                return
+            if isinstance(value, Exception):
+                raise value
+            yield value
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
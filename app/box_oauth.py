@@ -1,9 +1,17 @@
 """ Manage oAuth2 for Box"""
 from datetime import datetime, timedelta
 import json
+import os
 import os.path
+import tempfile
+from typing import Optional
+
 from boxsdk import OAuth2
-from app.config import AppConfig
+from app.config import AppConfig, get_config
+
+TOKEN_FILE = ".oauth.json"
+ACCESS_TOKEN_TTL = timedelta(minutes=60)
+REFRESH_TOKEN_TTL = timedelta(days=60)
 
 
 def oauth_from_config(config: AppConfig) -> OAuth2:
@@ -18,39 +26,66 @@ def oauth_from_config(config: AppConfig) -> OAuth2:
     )
 
 
-def store_tokens(access_token: str, refresh_token: str):
-    """Stores the access and refresh tokens in a file"""
-    access_token_expires_on = datetime.today() + timedelta(minutes=60)
-    refresh_token_expires_on = datetime.today() + timedelta(days=60)
-    oauth_json = {
+def tokens_json(access_token: str, refresh_token: str) -> dict:
+    """The token file content, with the expiry dates of freshly issued tokens"""
+    access_token_expires_on = datetime.today() + ACCESS_TOKEN_TTL
+    refresh_token_expires_on = datetime.today() + REFRESH_TOKEN_TTL
+    return {
         "access_token": access_token,
         "access_token_expires_on": str(access_token_expires_on),
         "refresh_token": refresh_token,
         "refresh_token_expires_on": str(refresh_token_expires_on),
     }
-    with open(".oauth.json", "w", encoding="UTF-8") as file:
-        file.write(json.dumps(oauth_json, indent=4))
 
 
-def oauth_from_previous() -> OAuth2:
+def write_tokens_file(oauth_json: dict, path: str = TOKEN_FILE):
+    """
+    Writes the token file atomically, readers see
+    either the previous or the new tokens, never a partial file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".oauth.", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="UTF-8") as file:
+            file.write(json.dumps(oauth_json, indent=4))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_tokens_file(path: str = TOKEN_FILE) -> Optional[dict]:
+    """Reads the token file, None if there is none"""
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "r", encoding="UTF-8") as file:
+        return json.loads(file.read())
+
+
+def store_tokens(access_token: str, refresh_token: str):
+    """Stores the access and refresh tokens in a file"""
+    write_tokens_file(tokens_json(access_token, refresh_token))
+
+
+def oauth_from_previous(config: AppConfig = None) -> OAuth2:
     """
     Returns an OAuth2 object
     Instatiated from the .oauth.json file
     and the configurations
     """
+    config = config or get_config()
 
-    oauth = oauth_from_config(AppConfig())
-    if not os.path.isfile(".oauth.json"):
-        return oauth
-
-    with open(".oauth.json", "r", encoding="UTF-8") as file:
-        oauth_json = file.read()
-
-    oauth_dict = json.loads(oauth_json)
+    oauth_dict = read_tokens_file()
+    if oauth_dict is None:
+        return oauth_from_config(config)
 
     oauth = OAuth2(
-        client_id=AppConfig().client_id,
-        client_secret=AppConfig().client_secret,
+        client_id=config.client_id,
+        client_secret=config.client_secret,
         store_tokens=store_tokens,
         access_token=oauth_dict.get("access_token"),
         refresh_token=oauth_dict.get("refresh_token"),
@@ -65,5 +100,5 @@ def oauth_authenticate(code: str):
     from using the code obtained from the first leg
     of the oAuth2 process
     """
-    oauth = oauth_from_config(AppConfig())
+    oauth = oauth_from_config(get_config())
     oauth.authenticate(code)
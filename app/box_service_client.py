@@ -0,0 +1,124 @@
+"""
+Server to server (JWT / CCG) clients for headless processes
+one pooled http session and one service token shared by every as-user client
+"""
+
+from collections import OrderedDict
+import threading
+from typing import Optional
+
+from boxsdk import CCGAuth, Client, JWTAuth
+from boxsdk.auth.server_auth import ServerAuth
+
+from app.box_client import configure_connection_pool
+
+JWT_CONFIG_FILE = ".jwt.config.json"
+
+
+class ServiceClientFactory:
+    """
+    Builds boxsdk clients for a service account
+
+    Every client shares the network layer (and its keep-alive pool)
+    and the service account token of the base client,
+    as-user clients only add the As-User header to the requests,
+    so serving a new user costs no authentication round trip.
+
+    :param auth:
+        A JWTAuth or CCGAuth object.
+    :param pool_size:
+        Keep-alive connections kept open by the shared http session.
+    :param max_user_clients:
+        As-user clients kept, the least recently used are dropped first.
+    """
+
+    def __init__(self, auth: ServerAuth, pool_size: int = 10, max_user_clients: int = 1000) -> None:
+        self.auth = auth
+        self.client = configure_connection_pool(Client(auth), pool_size)
+        self.max_user_clients = max_user_clients
+        # user id -> as-user client, least recently used first
+        self._user_clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_jwt_settings(
+        cls, settings_file: str = JWT_CONFIG_FILE, pool_size: int = 10, max_user_clients: int = 1000
+    ) -> "ServiceClientFactory":
+        """factory from a JWT app settings file downloaded from the developer console"""
+        return cls(JWTAuth.from_settings_file(settings_file), pool_size=pool_size, max_user_clients=max_user_clients)
+
+    @classmethod
+    def from_ccg(
+        cls,
+        client_id: str,
+        client_secret: str,
+        enterprise_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        pool_size: int = 10,
+        max_user_clients: int = 1000,
+    ) -> "ServiceClientFactory":
+        """factory for a client credentials grant app, as the enterprise service account or as a user"""
+        auth = CCGAuth(
+            client_id=client_id,
+            client_secret=client_secret,
+            enterprise_id=enterprise_id,
+            user=user_id,
+        )
+        return cls(auth, pool_size=pool_size, max_user_clients=max_user_clients)
+
+    def warm_up(self) -> str:
+        """
+        Fetches the service token ahead of the first request,
+        then it is only fetched again when boxsdk sees it expire
+        """
+        return self.auth.refresh(None)[0]
+
+    def get_client(self, user_id: Optional[str] = None) -> Client:
+        """
+        Returns the service account client,
+        or a cached client acting as user_id
+        """
+        if user_id is None:
+            return self.client
+
+        with self._lock:
+            client = self._user_clients.get(user_id)
+            if client is not None:
+                self._user_clients.move_to_end(user_id)
+                return client
+            client = self.client.as_user(self.client.user(user_id))
+            self._user_clients[user_id] = client
+            while len(self._user_clients) > self.max_user_clients:
+                self._user_clients.popitem(last=False)
+            return client
+
+    def forget_user(self, user_id: str) -> None:
+        """drops the cached client of user_id"""
+        with self._lock:
+            self._user_clients.pop(user_id, None)
+
+
+_SHARED_FACTORY: Optional[ServiceClientFactory] = None
+_SHARED_FACTORY_LOCK = threading.Lock()
+
+
+def get_service_client_factory(settings_file: str = JWT_CONFIG_FILE, warm_up: bool = True) -> ServiceClientFactory:
+    """
+    Returns the process wide factory, creating it from the JWT settings file
+    and fetching its token on first use
+    """
+    global _SHARED_FACTORY  # pylint: disable=global-statement
+    with _SHARED_FACTORY_LOCK:
+        if _SHARED_FACTORY is None:
+            factory = ServiceClientFactory.from_jwt_settings(settings_file)
+            if warm_up:
+                factory.warm_up()
+            _SHARED_FACTORY = factory
+        return _SHARED_FACTORY
+
+
+def set_service_client_factory(factory: Optional[ServiceClientFactory]) -> None:
+    """Replaces the process wide factory"""
+    global _SHARED_FACTORY  # pylint: disable=global-statement
+    with _SHARED_FACTORY_LOCK:
+        _SHARED_FACTORY = factory
@@ -1,4 +1,5 @@
 """ Application configurations """
+from functools import lru_cache
 import os
 from dotenv import load_dotenv
 
@@ -16,3 +17,12 @@ class AppConfig:
 
     def __repr__(self) -> str:
         return f"AppConfig({self.__dict__})"
+
+
+@lru_cache(maxsize=None)
+def get_config() -> AppConfig:
+    """
+    Returns the application configuration,
+    reading the .env file and the environment only on the first call
+    """
+    return AppConfig()
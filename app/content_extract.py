@@ -0,0 +1,338 @@
+"""
+local content extraction
+downloads files in chunks, extracts and segments their text
+to feed AIItem.optional_document_content, cached on disk by file version
+"""
+
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+from boxsdk import Client
+
+from app.box_ai import AIItem
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# downloads larger than this are spooled to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+MAX_SEGMENT_CHARS = 4000
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b\ufeff]")
+
+
+class UnsupportedContentError(Exception):
+    """no text extractor for the file type, or its optional dependency is missing"""
+
+
+def _decode(stream: IO[bytes]) -> str:
+    data = stream.read()
+    # utf-8-sig drops the byte order mark some editors write
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def extract_plain_text(stream: IO[bytes]) -> str:
+    """txt and md files"""
+    return _decode(stream)
+
+
+def extract_csv(stream: IO[bytes]) -> str:
+    """one line per row, cells separated by a pipe"""
+    reader = csv.reader(io.StringIO(_decode(stream)))
+    return "\n".join(" | ".join(cell.strip() for cell in row) for row in reader if any(row))
+
+
+def extract_docx(stream: IO[bytes]) -> str:
+    """paragraph text of word/document.xml, read without loading the whole xml tree"""
+    paragraphs = []
+    parts = []
+    with zipfile.ZipFile(stream) as archive, archive.open("word/document.xml") as document:
+        for _, element in ET.iterparse(document, events=("end",)):
+            tag = element.tag
+            if tag == f"{_WORD_NAMESPACE}t" and element.text:
+                parts.append(element.text)
+            elif tag == f"{_WORD_NAMESPACE}tab":
+                parts.append("\t")
+            elif tag in (f"{_WORD_NAMESPACE}br", f"{_WORD_NAMESPACE}cr"):
+                parts.append("\n")
+            elif tag == f"{_WORD_NAMESPACE}p":
+                paragraphs.append("".join(parts))
+                parts = []
+                element.clear()
+    return "\n\n".join(paragraphs)
+
+
+def extract_pdf(stream: IO[bytes]) -> str:
+    """
+    Page text of a pdf file.
+
+    Requires the pypdf package.
+    """
+    try:
+        from pypdf import PdfReader  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise UnsupportedContentError("pdf extraction requires the pypdf package") from error
+
+    return "\n\n".join(page.extract_text() or "" for page in PdfReader(stream).pages)
+
+
+EXTRACTORS: Dict[str, Callable[[IO[bytes]], str]] = {
+    "txt": extract_plain_text,
+    "md": extract_plain_text,
+    "csv": extract_csv,
+    "docx": extract_docx,
+    "pdf": extract_pdf,
+}
+
+
+def get_extension(file_name: str) -> str:
+    return os.path.splitext(file_name or "")[1].lower().lstrip(".")
+
+
+def normalize_text(text: str) -> str:
+    """unicode NFKC, unix line ends, no control characters, collapsed spaces and blank lines"""
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL_CHARS.sub("", text)
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def segment_text(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[Tuple[int, int]]:
+    """
+    Splits normalized text into segments of at most max_chars,
+    at paragraph boundaries, then at sentence ends, then anywhere.
+
+    :returns:
+        (start, end) character offsets of each segment.
+    """
+    if max_chars < 1:
+        raise ValueError("max_chars must be at least 1")
+
+    pieces = []
+    for paragraph in re.finditer(r"[^\n]+(?:\n(?!\n)[^\n]*)*", text):
+        start, end = paragraph.span()
+        if end - start <= max_chars:
+            pieces.append((start, end))
+            continue
+        sentence_start = start
+        for sentence_end in _SENTENCE_END.finditer(text, start, end):
+            pieces.append((sentence_start, sentence_end.start()))
+            sentence_start = sentence_end.end()
+        pieces.append((sentence_start, end))
+
+    segments = []
+    current = None
+    for start, end in pieces:
+        # a sentence longer than a segment is cut
+        while end - start > max_chars:
+            if current is not None:
+                segments.append(current)
+                current = None
+            segments.append((start, start + max_chars))
+            start += max_chars
+        if current is not None and end - current[0] <= max_chars:
+            current = (current[0], end)
+        else:
+            if current is not None:
+                segments.append(current)
+            current = (start, end)
+    if current is not None:
+        segments.append(current)
+    return segments
+
+
+class ExtractedText:
+    """
+    extracted text of a file version, memory mapped from the cache
+
+    Segments are decoded from the mapping on access,
+    so the whole text is only held in memory when asked for.
+    """
+
+    def __init__(self, file_id: str, version: str, path: str, segments: List[Tuple[int, int]]) -> None:
+        self.file_id = file_id
+        self.version = version
+        # (start, end) byte offsets in the cached utf-8 file
+        self.offsets = segments
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        size = os.fstat(self._file.fileno()).st_size
+        # empty files cannot be mapped
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @property
+    def text(self) -> str:
+        return self._buffer[:].decode("utf-8")
+
+    def segment(self, index: int) -> str:
+        start, end = self.offsets[index]
+        return self._buffer[start:end].decode("utf-8")
+
+    @property
+    def segments(self) -> List[str]:
+        return [self.segment(index) for index in range(len(self.offsets))]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._file.close()
+
+    def __enter__(self) -> "ExtractedText":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ExtractionCache:
+    """
+    Extracted texts on disk, one utf-8 file and one segment index per file version.
+    Writing a new version of a file removes the previous ones.
+
+    :param path:
+        Cache directory, created when missing.
+    """
+
+    def __init__(self, path: str = ".extract_cache") -> None:
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _base_path(self, file_id: str, version: str) -> str:
+        version_hash = hashlib.sha1(str(version).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.path, f"{file_id}_{version_hash}")
+
+    def get(self, file_id: str, version: str) -> Optional[ExtractedText]:
+        base_path = self._base_path(file_id, version)
+        try:
+            with open(f"{base_path}.json", "r", encoding="UTF-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return ExtractedText(file_id, version, f"{base_path}.txt", [tuple(offsets) for offsets in index["segments"]])
+
+    def set(self, file_id: str, version: str, text: str, segments: List[Tuple[int, int]]) -> ExtractedText:
+        """stores text, segments are character offsets and are stored as byte offsets"""
+        data = text.encode("utf-8")
+        byte_segments = _to_byte_offsets(text, segments)
+        base_path = self._base_path(file_id, version)
+        with self._lock:
+            for name in os.listdir(self.path):
+                if name.startswith(f"{file_id}_") and not name.startswith(os.path.basename(base_path)):
+                    os.remove(os.path.join(self.path, name))
+            _write_atomic(f"{base_path}.txt", data)
+            # the index is written last, a text without index is never read
+            _write_atomic(
+                f"{base_path}.json",
+                json.dumps({"file_id": file_id, "version": version, "segments": byte_segments}).encode("utf-8"),
+            )
+        return ExtractedText(file_id, version, f"{base_path}.txt", [tuple(offsets) for offsets in byte_segments])
+
+
+def _to_byte_offsets(text: str, segments: List[Tuple[int, int]]) -> List[List[int]]:
+    byte_segments = []
+    position = 0
+    byte_position = 0
+    for start, end in segments:
+        byte_start = byte_position + len(text[position:start].encode("utf-8"))
+        byte_end = byte_start + len(text[start:end].encode("utf-8"))
+        byte_segments.append([byte_start, byte_end])
+        position, byte_position = end, byte_end
+    return byte_segments
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class ContentExtractor:
+    """
+    Extracts the text of Box files, for AIItem.optional_document_content
+
+    :param cache:
+        An ExtractionCache, files already extracted at their current
+        version are neither downloaded nor parsed again.
+    :param max_segment_chars:
+        Maximum size of a segment.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        cache: ExtractionCache = None,
+        max_segment_chars: int = MAX_SEGMENT_CHARS,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> None:
+        self.client = client
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.max_segment_chars = max_segment_chars
+        self.chunk_size = chunk_size
+
+    def extract(self, file_id: str, version: str = None, file_name: str = None) -> ExtractedText:
+        """
+        Returns the extracted text of the file,
+        looking up its version (etag) and name when not given
+        """
+        if version is None or file_name is None:
+            file_info = self.client.file(file_id).get(fields=["etag", "name"])
+            version = version if version is not None else file_info.etag
+            file_name = file_name if file_name is not None else file_info.name
+
+        extracted = self.cache.get(file_id, version)
+        if extracted is not None:
+            return extracted
+
+        extractor = EXTRACTORS.get(get_extension(file_name))
+        if extractor is None:
+            raise UnsupportedContentError(f"no text extractor for {file_name}")
+
+        with self.download(file_id) as stream:
+            text = normalize_text(extractor(stream))
+        return self.cache.set(file_id, version, text, segment_text(text, self.max_segment_chars))
+
+    def download(self, file_id: str) -> IO[bytes]:
+        """the file content, read in chunks into a spooled temporary file"""
+        stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)  # pylint: disable=consider-using-with
+        box_response = self.client.session.get(
+            self.client.file(file_id).get_url("content"), expect_json_response=False, stream=True
+        )
+        request_response = box_response.network_response.request_response
+        try:
+            for chunk in request_response.iter_content(chunk_size=self.chunk_size):
+                stream.write(chunk)
+        finally:
+            request_response.close()
+        stream.seek(0)
+        return stream
+
+    def get_ai_item(self, file_id: str, segment: int = None, version: str = None, file_name: str = None) -> AIItem:
+        """an AIItem with the extracted text, or a single segment of it, as content"""
+        with self.extract(file_id, version, file_name) as extracted:
+            content = extracted.text if segment is None else extracted.segment(segment)
+            return AIItem(file_id, "file", optional_document_content=content, version=extracted.version)
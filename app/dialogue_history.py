@@ -0,0 +1,176 @@
+""" token budgeted dialogue history for text_gen conversations"""
+
+from typing import Iterator, List
+
+from app.box_ai import AI, AIAnswer, AIItem
+from app.box_ai_json import dumps_json
+
+SUMMARY_PROMPT = "Summarize our conversation so far, keeping every fact, name and decision."
+SUMMARY_TURN_PROMPT = "Summary of the earlier conversation"
+
+
+def estimate_tokens(text: str) -> int:
+    """rough token count, about 4 characters per token"""
+    return len(text or "") // 4 + 1
+
+
+class DialogueTurn:
+    """an answer with its json computed once"""
+
+    __slots__ = ("answer", "json", "serialized", "tokens")
+
+    def __init__(self, answer: AIAnswer):
+        self.answer = answer
+        self.json = answer.to_json()
+        self.serialized = dumps_json(self.json)
+        self.tokens = estimate_tokens(answer.prompt) + estimate_tokens(answer.answer)
+
+
+class HistoryPolicy:
+    """decides which turns are kept once the history is over budget"""
+
+    def compact(self, turns: List[DialogueTurn], max_tokens: int) -> List[DialogueTurn]:
+        """returns the turns to keep"""
+        raise NotImplementedError
+
+
+def _total_tokens(turns: List[DialogueTurn]) -> int:
+    return sum(turn.tokens for turn in turns)
+
+
+class SlidingWindowPolicy(HistoryPolicy):
+    """drops the oldest turns, always keeping the latest one"""
+
+    def compact(self, turns: List[DialogueTurn], max_tokens: int) -> List[DialogueTurn]:
+        turns = list(turns)
+        tokens = _total_tokens(turns)
+        while len(turns) > 1 and tokens > max_tokens:
+            tokens -= turns.pop(0).tokens
+        return turns
+
+
+class KeepFirstLastPolicy(HistoryPolicy):
+    """
+    keeps the first turn, usually setting the context of the conversation,
+    and the last N turns, then drops from the middle to fit the budget
+    """
+
+    def __init__(self, last: int = 4):
+        if last < 1:
+            raise ValueError("last must be at least 1")
+        self.last = last
+
+    def compact(self, turns: List[DialogueTurn], max_tokens: int) -> List[DialogueTurn]:
+        if len(turns) <= self.last + 1:
+            first, recent = [], list(turns)
+        else:
+            first, recent = [turns[0]], list(turns[-self.last :])
+
+        tokens = _total_tokens(first) + _total_tokens(recent)
+        while len(recent) > 1 and tokens > max_tokens:
+            tokens -= recent.pop(0).tokens
+        return first + recent
+
+
+class SummarizePolicy(HistoryPolicy):
+    """
+    replaces the older turns by a summary written by a text_gen call,
+    keeping the last N turns verbatim
+
+    :param ai:
+        The AI used for the summary call.
+    :param item:
+        The item the conversation is about.
+    """
+
+    def __init__(self, ai: AI, item: AIItem, keep_last: int = 2):
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        self.ai = ai
+        self.item = item
+        self.keep_last = keep_last
+        self._fallback = SlidingWindowPolicy()
+
+    def compact(self, turns: List[DialogueTurn], max_tokens: int) -> List[DialogueTurn]:
+        older, recent = turns[: -self.keep_last], turns[-self.keep_last :]
+        if not older:
+            return self._fallback.compact(turns, max_tokens)
+
+        summary = self.ai.ask_text_gen(
+            prompt=SUMMARY_PROMPT,
+            item=self.item,
+            dialogue_history=[turn.answer for turn in older],
+        )
+        summary.prompt = SUMMARY_TURN_PROMPT
+        compacted = [DialogueTurn(summary)] + list(recent)
+
+        # the summary itself may not fit
+        return self._fallback.compact(compacted, max_tokens)
+
+
+class DialogueHistory:
+    """
+    dialogue history with an approximate token budget
+
+    Each answer is serialized once when appended,
+    AIQuestion.to_json reuses the cached json of every turn.
+
+    :param max_tokens:
+        Approximate budget for the whole history.
+    :param policy:
+        How the history is compacted once over budget,
+        defaults to a sliding window.
+    """
+
+    def __init__(self, max_tokens: int = 4000, policy: HistoryPolicy = None):
+        self.max_tokens = max_tokens
+        self.policy = policy if policy is not None else SlidingWindowPolicy()
+        self._turns: List[DialogueTurn] = []
+        self._tokens = 0
+        self._serialized = None
+
+    def append(self, answer: AIAnswer) -> None:
+        """
+        adds a turn, compacting the history if over budget,
+        the history is left unchanged when the compaction fails
+        """
+        turn = DialogueTurn(answer)
+
+        if self._tokens + turn.tokens > self.max_tokens:
+            turns = self.policy.compact(self._turns + [turn], self.max_tokens)
+            self._turns = turns
+            self._tokens = _total_tokens(turns)
+            self._serialized = None
+            return
+
+        self._turns.append(turn)
+        self._tokens += turn.tokens
+        if self._serialized is not None:
+            self._serialized.append(turn.serialized)
+
+    def clear(self) -> None:
+        """forgets every turn"""
+        self._turns = []
+        self._tokens = 0
+        self._serialized = None
+
+    @property
+    def tokens(self) -> int:
+        """approximate token count of the history"""
+        return self._tokens
+
+    def to_json(self) -> List[dict]:
+        """json of every turn, as cached when appended"""
+        return [turn.json for turn in self._turns]
+
+    def to_json_str(self) -> str:
+        """the serialized history, joined from the cached turns"""
+        if self._serialized is None:
+            self._serialized = [turn.serialized for turn in self._turns]
+        return "[" + ", ".join(self._serialized) + "]"
+
+    def __iter__(self) -> Iterator[AIAnswer]:
+        return (turn.answer for turn in self._turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
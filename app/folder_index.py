@@ -0,0 +1,256 @@
+"""
+local index of folder listings
+populated once per folder and kept current from the box events stream
+"""
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+from boxsdk import Client
+
+INDEX_FIELDS = ["id", "type", "name", "etag", "size", "modified_at", "parent"]
+INDEX_PAGE_SIZE = 1000
+EVENTS_PAGE_SIZE = 500
+
+# events that (re)place an item in a folder
+UPSERT_EVENTS = frozenset(
+    {
+        "ITEM_CREATE",
+        "ITEM_UPLOAD",
+        "ITEM_COPY",
+        "ITEM_MOVE",
+        "ITEM_RENAME",
+        "ITEM_MODIFY",
+        "ITEM_UNDELETE_VIA_TRASH",
+    }
+)
+# events that remove an item (and its sub tree) from the index
+REMOVE_EVENTS = frozenset({"ITEM_TRASH"})
+
+
+def _get(obj, key: str):
+    """field of a raw json dict or of a boxsdk api object"""
+    if obj is None:
+        return None
+    return obj[key] if key in obj else None
+
+
+class IndexedItem:
+    """item served from the local index"""
+
+    def __init__(self, item_id: str, item_type: str, name: str, parent_id: str, etag: str = None):
+        self.id = item_id  # pylint: disable=invalid-name
+        self.type = item_type
+        self.name = name
+        self.parent_id = parent_id
+        self.etag = etag
+
+    def __repr__(self) -> str:
+        return f"IndexedItem({self.type} {self.id} {self.name})"
+
+
+class FolderIndex:
+    """
+    SQLite index of folder contents
+
+    Folders are listed from the API the first time they are read,
+    afterwards changes are applied from the events stream,
+    starting at the position recorded before the first listing.
+    """
+
+    def __init__(self, client: Client, path: str = ".folder_index.db", sync_interval: float = 30):
+        self.client = client
+        self.path = path
+        self.sync_interval = sync_interval
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                parent_id TEXT,
+                etag TEXT
+            );
+            CREATE INDEX IF NOT EXISTS items_parent_id ON items (parent_id);
+            CREATE TABLE IF NOT EXISTS folders (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self._connection.commit()
+
+    def close(self) -> None:
+        """closes the database connection"""
+        with self._lock:
+            self._connection.close()
+
+    @property
+    def stream_position(self) -> Optional[str]:
+        """events stream position the index is current to"""
+        row = self._connection.execute("SELECT value FROM state WHERE key = 'stream_position'").fetchone()
+        return row[0] if row else None
+
+    def _set_stream_position(self, stream_position) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES ('stream_position', ?)",
+            (str(stream_position),),
+        )
+
+    def is_synced(self, folder_id: str) -> bool:
+        """True when the folder listing is in the index"""
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM folders WHERE id = ?", (folder_id,)).fetchone()
+            return row is not None
+
+    def sync_folder(self, folder_id: str) -> None:
+        """lists the folder from the API into the index"""
+        with self._lock:
+            if self.stream_position is None:
+                # changes made while listing are replayed from the events
+                self._set_stream_position(self.client.events().get_latest_stream_position())
+
+        folder = self.client.folder(folder_id=folder_id).get(fields=["id", "name", "parent"])
+        parent_id = _get(_get(folder, "parent"), "id")
+        items = self.client.folder(folder_id=folder_id).get_items(
+            limit=INDEX_PAGE_SIZE,
+            use_marker=True,
+            fields=INDEX_FIELDS,
+        )
+        rows = [
+            (item.id, item.type, _get(item, "name"), folder_id, _get(item, "etag"))
+            for item in items
+            if item.type != "web_link"
+        ]
+
+        with self._lock:
+            self._connection.execute("DELETE FROM items WHERE parent_id = ?", (folder_id,))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO items (id, type, name, parent_id, etag) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO folders (id, parent_id) VALUES (?, ?)",
+                (folder_id, parent_id),
+            )
+            self._connection.commit()
+
+    def get_items(self, folder_id: str) -> List[IndexedItem]:
+        """folder contents, folders first then files, by name"""
+        if not self.is_synced(folder_id):
+            self.sync_folder(folder_id)
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, type, name, parent_id, etag FROM items WHERE parent_id = ?"
+                " ORDER BY type != 'folder', name COLLATE NOCASE",
+                (folder_id,),
+            ).fetchall()
+        return [IndexedItem(*row) for row in rows]
+
+    def get_parent_id(self, folder_id: str) -> Optional[str]:
+        """parent of an indexed folder, None for the root"""
+        if not self.is_synced(folder_id):
+            self.sync_folder(folder_id)
+
+        with self._lock:
+            row = self._connection.execute("SELECT parent_id FROM folders WHERE id = ?", (folder_id,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Applies the pending events, at most once per sync_interval
+        unless forced. Returns the number of events applied.
+        """
+        if not force and time.monotonic() - self._last_sync < self.sync_interval:
+            return 0
+        return self.sync_events()
+
+    def sync_events(self) -> int:
+        """Reads the events stream from the recorded position to its end"""
+        with self._lock:
+            stream_position = self.stream_position
+        if stream_position is None:
+            return 0
+
+        applied = 0
+        events = self.client.events()
+        while True:
+            response = events.get_events(limit=EVENTS_PAGE_SIZE, stream_position=stream_position)
+            entries = response["entries"]
+            next_stream_position = response["next_stream_position"]
+            applied += self.apply_events(entries, next_stream_position)
+            # box may return a short page before the end of the stream,
+            # it is drained once a page is empty or the position stops moving
+            if not entries or str(next_stream_position) == str(stream_position):
+                break
+            stream_position = next_stream_position
+
+        self._last_sync = time.monotonic()
+        return applied
+
+    def apply_events(self, events: Iterable, stream_position=None) -> int:
+        """
+        Applies events to the indexed folders.
+        Events are raw json dicts or boxsdk Event objects.
+        """
+        applied = 0
+        with self._lock:
+            for event in events:
+                if self._apply_event(event):
+                    applied += 1
+            if stream_position is not None:
+                self._set_stream_position(stream_position)
+            self._connection.commit()
+        return applied
+
+    def _apply_event(self, event) -> bool:
+        event_type = _get(event, "event_type")
+        source = _get(event, "source")
+        item_id = _get(source, "id")
+        item_type = _get(source, "type")
+        if item_id is None or item_type not in ("file", "folder"):
+            return False
+
+        if event_type in REMOVE_EVENTS:
+            self._remove(item_id)
+            return True
+
+        if event_type not in UPSERT_EVENTS:
+            return False
+
+        parent_id = _get(_get(source, "parent"), "id")
+        if parent_id is not None and self._is_synced(parent_id):
+            self._connection.execute(
+                "INSERT OR REPLACE INTO items (id, type, name, parent_id, etag) VALUES (?, ?, ?, ?, ?)",
+                (item_id, item_type, _get(source, "name"), parent_id, _get(source, "etag")),
+            )
+            if item_type == "folder":
+                self._connection.execute("UPDATE folders SET parent_id = ? WHERE id = ?", (parent_id, item_id))
+        else:
+            # moved somewhere we do not index
+            self._connection.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        return True
+
+    def _is_synced(self, folder_id: str) -> bool:
+        return self._connection.execute("SELECT 1 FROM folders WHERE id = ?", (folder_id,)).fetchone() is not None
+
+    def _remove(self, item_id: str) -> None:
+        folder_ids = [item_id]
+        while folder_ids:
+            current = folder_ids.pop()
+            children = self._connection.execute(
+                "SELECT id FROM items WHERE parent_id = ? AND type = 'folder'", (current,)
+            ).fetchall()
+            folder_ids.extend(child for (child,) in children)
+            self._connection.execute("DELETE FROM items WHERE parent_id = ?", (current,))
+            self._connection.execute("DELETE FROM folders WHERE id = ?", (current,))
+        self._connection.execute("DELETE FROM items WHERE id = ?", (item_id,))
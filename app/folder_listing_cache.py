@@ -0,0 +1,130 @@
+"""
+folder listing cache
+keeps recent folder listings and lists the sub folders ahead of navigation
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+from boxsdk import Client
+
+from app.box_content import FolderView, get_folder_view
+
+
+class FolderListingCache:
+    """
+    In memory least recently used folder listings, expiring after ttl seconds
+
+    Listings are fetched at most once at a time per folder,
+    a folder opened while its prefetch is in flight waits for it.
+
+    :param max_entries:
+        Maximum number of listings kept.
+    :param ttl:
+        Seconds a listing stays valid, None to keep listings until evicted or invalidated.
+    :param max_workers:
+        Maximum number of folders prefetched at the same time.
+    :param max_prefetch:
+        Maximum number of sub folders prefetched per listing, the first ones listed.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        max_entries: int = 256,
+        ttl: float = 300,
+        max_workers: int = 4,
+        max_prefetch: int = 16,
+    ) -> None:
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_prefetch = max_prefetch
+        self.hits = 0
+        self.misses = 0
+        # folder id -> (expires at, future of the FolderView)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="box-folder-prefetch")
+
+    def get(self, folder_id: str) -> FolderView:
+        """the folder listing, from the cache when still valid"""
+        future, owner = self._lookup(folder_id, count=True)
+        if owner:
+            self._fetch(future, folder_id)
+        return future.result()
+
+    def prefetch(self, folder_id: str) -> None:
+        """lists the folder in the background unless it is cached"""
+        future, owner = self._lookup(folder_id)
+        if owner:
+            self._executor.submit(self._fetch, future, folder_id)
+
+    def prefetch_sub_folders(self, listing: FolderView) -> None:
+        """lists the first max_prefetch sub folders of a listing in the background"""
+        for sub_folder_id in listing.sub_folder_ids[: self.max_prefetch]:
+            self.prefetch(sub_folder_id)
+
+    def invalidate(self, folder_id: str = None) -> None:
+        """drops a listing, or every listing without folder_id"""
+        with self._lock:
+            if folder_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(folder_id, None)
+
+    def _lookup(self, folder_id: str, count: bool = False):
+        """
+        Returns the future of the listing and whether the caller must fetch it,
+        a new entry is added for a missing or expired listing
+        """
+        with self._lock:
+            entry = self._entries.get(folder_id)
+            if entry is not None:
+                expires_at, future = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(folder_id)
+                    if count:
+                        self.hits += 1
+                    return future, False
+            if count:
+                self.misses += 1
+            future = Future()
+            expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+            self._entries[folder_id] = (expires_at, future)
+            self._entries.move_to_end(folder_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return future, True
+
+    def _fetch(self, future: Future, folder_id: str) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(get_folder_view(self.client, folder_id))
+        except Exception as error:  # pylint: disable=broad-except
+            # failures are not cached
+            with self._lock:
+                entry = self._entries.get(folder_id)
+                if entry is not None and entry[1] is future:
+                    del self._entries[folder_id]
+            future.set_exception(error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def close(self) -> None:
+        """stops the prefetches not started yet"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for folder_id, (_, future) in list(self._entries.items()):
+                if future.cancel():
+                    del self._entries[folder_id]
+
+    def __enter__(self) -> "FolderListingCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,85 @@
+"""
+speculative answer prefetch
+asks the usual opening questions about a file in the background,
+so they are answered from the cache
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+from typing import Iterable, List
+
+from app.box_ai import AI, AIItem, QAMode
+
+DEFAULT_PREFETCH_PROMPTS = (
+    "Summarize this document.",
+    "What are the key dates in this document?",
+    "What are the action items in this document?",
+)
+
+
+class AnswerPrefetcher:
+    """
+    Warms the answer cache of an AI with a set of questions
+    as soon as a file is selected.
+
+    The questions are asked exactly as ask_item would ask them,
+    so asking one of them afterwards is a cache hit,
+    or joins the call in flight when the AI has a single_flight.
+
+    :param box_ai:
+        The AI to warm up, it must have a cache.
+    :param prompts:
+        The questions asked about every prefetched item.
+    :param max_workers:
+        Maximum number of prefetch questions in flight.
+    """
+
+    def __init__(self, box_ai: AI, prompts: Iterable[str] = DEFAULT_PREFETCH_PROMPTS, max_workers: int = 3) -> None:
+        if box_ai.cache is None:
+            raise ValueError("prefetching requires an AI with an answer cache")
+        self.box_ai = box_ai
+        self.prompts = tuple(prompts)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="box-ai-prefetch")
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+
+    def prefetch(self, item: AIItem) -> List[Future]:
+        """
+        Asks the prompts about item in the background,
+        cancelling the prefetches of the previous item not started yet.
+        Returns without any request, so it can be called from the UI thread.
+
+        :returns:
+            A future per prompt, resolving to its AIAnswer.
+        """
+        self.cancel()
+        # the version is looked up by the workers, not by the caller,
+        # concurrent lookups of the same file share one request
+        with self._lock:
+            self._futures = [self._executor.submit(self._ask, prompt, item) for prompt in self.prompts]
+            return list(self._futures)
+
+    def _ask(self, prompt: str, item: AIItem):
+        try:
+            return self.box_ai.ask_item(QAMode.SINGLE_ITEM_QA, prompt, [item])
+        except Exception:
+            logging.warning("prefetch of %r failed", prompt, exc_info=True)
+            raise
+
+    def cancel(self) -> None:
+        """drops the prefetches not started yet, the ones in flight complete"""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.cancel()
+
+    def close(self) -> None:
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self) -> "AnswerPrefetcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
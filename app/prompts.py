@@ -1,10 +1,19 @@
 """ prompts presented to user for interactive demo """
-from InquirerPy import inquirer
-from InquirerPy.base.control import Choice
+from typing import TYPE_CHECKING
 
 from boxsdk import Client
 
-from app.box_content import get_folder_items
+from app.box_content import get_folder_view
+from app.folder_index import FolderIndex
+from app.folder_listing_cache import FolderListingCache
+
+# InquirerPy (and prompt_toolkit) are only imported once a prompt is shown
+if TYPE_CHECKING:
+    from InquirerPy.base.control import Choice
+
+
+# choice id of the Refresh entry, listing the current folder again
+REFRESH_ID = "-8"
 
 
 class SimpleItem:
@@ -20,14 +29,30 @@ class SimpleItem:
         return f"{self.item_type} {self.item_id} {self.item_name} {self.parent_folder_id}"
 
 
-def get_choices_by_folder(client: Client, folder_id: str) -> [Choice]:
-    """build choices from folder items"""
-    items = get_folder_items(client, folder_id)
-    current_folder = client.folder(folder_id=folder_id).get()
-    if current_folder.parent is not None:
-        parent_folder_id = current_folder.parent.id
+def get_choices_by_folder(
+    client: Client,
+    folder_id: str,
+    folder_index: FolderIndex = None,
+    listing_cache: FolderListingCache = None,
+) -> ["Choice"]:
+    """
+    build choices from folder items, served from the local index if any,
+    or from the listing cache, prefetching the sub folders
+    """
+    from InquirerPy.base.control import Choice  # pylint: disable=import-outside-toplevel
+
+    if folder_index is not None:
+        items = folder_index.get_items(folder_id)
+        parent_folder_id = folder_index.get_parent_id(folder_id) or "0"
+    elif listing_cache is not None:
+        listing = listing_cache.get(folder_id)
+        listing_cache.prefetch_sub_folders(listing)
+        items = listing.items
+        parent_folder_id = listing.parent_id
     else:
-        parent_folder_id = "0"
+        folder_view = get_folder_view(client, folder_id)
+        items = folder_view.items
+        parent_folder_id = folder_view.parent_id
 
     choices = []
 
@@ -55,35 +80,71 @@ def get_choices_by_folder(client: Client, folder_id: str) -> [Choice]:
                 )
             )
 
+    if folder_index is not None or listing_cache is not None:
+        choices.append(Choice(SimpleItem(REFRESH_ID, "folder", "Refresh", parent_folder_id), name="Refresh"))
     choices.append(Choice(SimpleItem("-9", "folder", "Exit", parent_folder_id), name="Exit"))
     return choices
 
 
-def select_file(client: Client, current_folder: str = "0") -> SimpleItem:
-    """main menu"""
+def refresh_folder(folder_id: str, folder_index: FolderIndex = None, listing_cache: FolderListingCache = None) -> None:
+    """lists the folder again, in the folder index and in the listing cache"""
+    if folder_index is not None:
+        folder_index.sync_folder(folder_id)
+    if listing_cache is not None:
+        listing_cache.invalidate(folder_id)
+
 
-    while True:
-        choices = get_choices_by_folder(client, current_folder)
+def select_file(
+    client: Client,
+    current_folder: str = "0",
+    folder_index: FolderIndex = None,
+    listing_cache: FolderListingCache = None,
+) -> SimpleItem:
+    """
+    main menu
 
-        selection = inquirer.select(
-            message="Select a file or folder:",
-            choices=choices,
-            default=None,
-        ).execute()
+    Without a folder index, listings are kept in listing_cache,
+    or in a cache created for this menu.
+    """
+    from InquirerPy import inquirer  # pylint: disable=import-outside-toplevel
 
-        # print(f"Selection: {selection}")
+    owned_cache = None
+    if folder_index is None and listing_cache is None:
+        listing_cache = owned_cache = FolderListingCache(client)
+    try:
+        while True:
+            if folder_index is not None:
+                folder_index.refresh()
+            choices = get_choices_by_folder(client, current_folder, folder_index, listing_cache)
 
-        if selection.item_id == "-9":
-            exit(0)
+            selection = inquirer.select(
+                message="Select a file or folder:",
+                choices=choices,
+                default=None,
+            ).execute()
 
-        if selection.item_type == "folder":
-            current_folder = selection.item_id
+            # print(f"Selection: {selection}")
 
-        if selection.item_type == "file":
-            # print(f"File: {selection.item_name}")
-            return selection
+            if selection.item_id == "-9":
+                exit(0)
+
+            if selection.item_id == REFRESH_ID:
+                refresh_folder(current_folder, folder_index, listing_cache)
+                continue
+
+            if selection.item_type == "folder":
+                current_folder = selection.item_id
+
+            if selection.item_type == "file":
+                # print(f"File: {selection.item_name}")
+                return selection
+    finally:
+        if owned_cache is not None:
+            owned_cache.close()
 
 
 def get_manual_context(prompt: str) -> str:
     """file context prompt"""
+    from InquirerPy import inquirer  # pylint: disable=import-outside-toplevel
+
     return inquirer.text(message=prompt).execute()
@@ -0,0 +1,285 @@
+"""
+local retrieval index
+ranks files by relevance to a prompt (BM25, optional hashed embeddings)
+to pick the items sent to multiple_item_qa
+"""
+
+from collections import Counter
+import hashlib
+import logging
+import math
+import re
+import sqlite3
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from boxsdk import Client
+
+from app.box_ai import AI, MULTIPLE_ITEM_QA_MAX_ITEMS, AIAnswer, AIItem, QAMode
+from app.box_content import crawl_folder
+from app.content_extract import EXTRACTORS, ContentExtractor, UnsupportedContentError, get_extension
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+_TOKEN = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what when "
+    "where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """lowercase words, without stop words and single characters"""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOP_WORDS]
+
+
+def hashed_embedding(tokens: Iterable[str], dimensions: int):
+    """
+    Bag of words folded into dimensions by feature hashing,
+    log weighted and L2 normalized. Requires numpy.
+    """
+    vector = numpy.zeros(dimensions, dtype=numpy.float32)
+    for token, count in Counter(tokens).items():
+        digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+        # the sign bit spreads the collisions around zero
+        sign = 1.0 if digest & 1 else -1.0
+        vector[(digest >> 1) % dimensions] += sign * (1.0 + math.log(count))
+    norm = numpy.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class RetrievalIndex:
+    """
+    SQLite backed BM25 index of item text and names
+
+    Items are (re)indexed only when their version changes,
+    so indexing a folder again only extracts the new and modified files.
+
+    :param path:
+        SQLite database file, ":memory:" for a throw away index.
+    :param embedding_weight:
+        Share of the hashed embedding similarity in the score, between 0 and 1.
+        0 uses BM25 only, more requires numpy.
+    :param dimensions:
+        Size of the hashed embeddings.
+    """
+
+    def __init__(
+        self,
+        path: str = ".retrieval_index.db",
+        k1: float = 1.5,
+        b: float = 0.75,
+        embedding_weight: float = 0.0,
+        dimensions: int = 256,
+    ):
+        if embedding_weight and numpy is None:
+            raise ImportError("embeddings require the numpy package")
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.embedding_weight = embedding_weight
+        self.dimensions = dimensions
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                name TEXT,
+                version TEXT,
+                length INTEGER NOT NULL,
+                embedding BLOB,
+                root TEXT
+            );
+            CREATE INDEX IF NOT EXISTS documents_root ON documents (root);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                id TEXT NOT NULL,
+                frequency INTEGER NOT NULL,
+                PRIMARY KEY (term, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_id ON postings (id);
+            """
+        )
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_version(self, item_id: str) -> Optional[str]:
+        """indexed version of the item, None when not indexed"""
+        with self._lock:
+            row = self._connection.execute("SELECT version FROM documents WHERE id = ?", (item_id,)).fetchone()
+        return row[0] if row else None
+
+    def add(
+        self,
+        item_id: str,
+        text: str,
+        name: str = None,
+        version: str = None,
+        item_type: str = "file",
+        root: str = None,
+    ) -> bool:
+        """
+        Indexes (or re-indexes) an item, the name counts as part of the text.
+        Returns False when this version of the item is already indexed.
+
+        :param root:
+            The folder crawled to find the item, see index_folder.
+        """
+        if version is not None and self.get_version(item_id) == version:
+            return False
+
+        tokens = tokenize(name or "") + tokenize(text or "")
+        frequencies = Counter(tokens)
+        embedding = None
+        if self.embedding_weight:
+            embedding = hashed_embedding(tokens, self.dimensions).tobytes()
+
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM postings WHERE id = ?", (item_id,))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO documents (id, type, name, version, length, embedding, root) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item_id, item_type, name, version, len(tokens), embedding, root),
+            )
+            self._connection.executemany(
+                "INSERT INTO postings (term, id, frequency) VALUES (?, ?, ?)",
+                [(term, item_id, frequency) for term, frequency in frequencies.items()],
+            )
+        return True
+
+    def remove(self, item_id: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM postings WHERE id = ?", (item_id,))
+            self._connection.execute("DELETE FROM documents WHERE id = ?", (item_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def search(self, prompt: str, k: int = 10) -> List[Tuple[str, float]]:
+        """(item id, score) of the k most relevant items, best first"""
+        terms = set(tokenize(prompt))
+        with self._lock:
+            count, total_length = self._connection.execute("SELECT COUNT(*), SUM(length) FROM documents").fetchone()
+            if not count:
+                return []
+            average_length = (total_length or 0) / count or 1.0
+
+            scores = Counter()
+            for term in terms:
+                postings = self._connection.execute(
+                    "SELECT postings.id, postings.frequency, documents.length FROM postings "
+                    "JOIN documents ON documents.id = postings.id WHERE postings.term = ?",
+                    (term,),
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for item_id, frequency, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[item_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            if self.embedding_weight:
+                scores = self._blend_embeddings(prompt, scores)
+
+        ranked = sorted(scores.items(), key=lambda score: (-score[1], score[0]))
+        return [(item_id, score) for item_id, score in ranked[:k] if score > 0]
+
+    def _blend_embeddings(self, prompt: str, scores: Counter) -> Counter:
+        """BM25 scaled to [0, 1] blended with the cosine similarity of the hashed embeddings"""
+        query = hashed_embedding(tokenize(prompt), self.dimensions)
+        best = max(scores.values(), default=0) or 1.0
+        blended = Counter()
+        for item_id, embedding in self._connection.execute("SELECT id, embedding FROM documents"):
+            similarity = 0.0
+            if embedding is not None:
+                similarity = max(0.0, float(numpy.frombuffer(embedding, dtype=numpy.float32) @ query))
+            score = (1 - self.embedding_weight) * scores.get(item_id, 0) / best + self.embedding_weight * similarity
+            if score > 0:
+                blended[item_id] = score
+        return blended
+
+    def select_items(self, prompt: str, k: int = MULTIPLE_ITEM_QA_MAX_ITEMS) -> List[AIItem]:
+        """AIItems of the k most relevant items, with their indexed version"""
+        ranked = self.search(prompt, k)
+        if not ranked:
+            return []
+        ids = [item_id for item_id, _ in ranked]
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT id, type, version FROM documents WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        documents = {item_id: (item_type, version) for item_id, item_type, version in rows}
+        return [AIItem(item_id, documents[item_id][0], version=documents[item_id][1]) for item_id in ids]
+
+    def ask(self, box_ai: AI, prompt: str, k: int = MULTIPLE_ITEM_QA_MAX_ITEMS) -> AIAnswer:
+        """asks the prompt about the k most relevant items only"""
+        items = self.select_items(prompt, k)
+        if not items:
+            raise LookupError(f"no indexed item matches {prompt!r}")
+        mode = QAMode.SINGLE_ITEM_QA if len(items) == 1 else QAMode.MULTIPLE_ITEM_QA
+        return box_ai.ask_item(mode, prompt, items)
+
+    def index_folder(
+        self,
+        client: Client,
+        folder_id: str = "0",
+        extractor: ContentExtractor = None,
+        item_filter: Callable = None,
+        max_workers: int = 8,
+    ) -> int:
+        """
+        Indexes the files of a folder tree, by name,
+        and by text when an extractor supports the file type.
+        Only the files whose etag changed are extracted again.
+
+        A file that cannot be read (corrupt, download error) is logged and skipped,
+        it is tried again on the next run. Once the whole tree is crawled,
+        the files indexed from this folder and no longer found in it are removed.
+
+        :returns:
+            The number of files (re)indexed.
+        """
+        indexed = 0
+        seen = set()
+        for item in crawl_folder(client, folder_id, item_filter=item_filter, max_workers=max_workers):
+            seen.add(item.id)
+            version = getattr(item, "etag", None)
+            if version is not None and self.get_version(item.id) == version:
+                continue
+            try:
+                text = self._extract_text(extractor, item, version)
+            except Exception:  # pylint: disable=broad-except
+                logging.warning("skipping %s (%s), its text could not be extracted", item.name, item.id, exc_info=True)
+                continue
+            self.add(item.id, text, name=item.name, version=version, item_type=item.type, root=folder_id)
+            indexed += 1
+
+        self._prune(folder_id, seen)
+        return indexed
+
+    @staticmethod
+    def _extract_text(extractor: ContentExtractor, item, version: str) -> str:
+        """the file text, empty when there is no extractor for its type"""
+        if extractor is None or get_extension(item.name) not in EXTRACTORS:
+            return ""
+        try:
+            with extractor.extract(item.id, version, item.name) as extracted:
+                return extracted.text
+        except UnsupportedContentError:
+            # e.g. the optional pdf dependency is missing, the name is still indexed
+            return ""
+
+    def _prune(self, root: str, seen: set) -> None:
+        """removes the items indexed from root that were not seen, deleted or moved away"""
+        with self._lock:
+            ids = [row[0] for row in self._connection.execute("SELECT id FROM documents WHERE root = ?", (root,))]
+        for item_id in ids:
+            if item_id not in seen:
+                self.remove(item_id)
@@ -0,0 +1,185 @@
+"""
+single-flight request coalescing
+concurrent calls with the same key share one upstream call
+"""
+
+import threading
+from typing import Callable, Hashable, Iterator
+
+
+class _Call:
+    """an upstream call in flight and its outcome"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _SharedStream:
+    """
+    an upstream stream in flight, replayed to every subscriber
+
+    Whichever subscriber is ahead pulls the next chunk from upstream,
+    the others read it from the buffer, so no extra thread is needed.
+    """
+
+    def __init__(self, start: Callable[[], Iterator], on_done: Callable[[], None]) -> None:
+        self._start = start
+        self._on_done = on_done
+        self._upstream = None
+        self._chunks = []
+        self._done = False
+        self._error = None
+        self._subscribers = 0
+        self._lock = threading.Lock()
+        self._pull_lock = threading.Lock()
+
+    def subscribe(self) -> Iterator:
+        with self._lock:
+            self._subscribers += 1
+        return self._iter()
+
+    def _iter(self) -> Iterator:
+        index = 0
+        finished = False
+        try:
+            while True:
+                with self._lock:
+                    if index < len(self._chunks):
+                        chunk = self._chunks[index]
+                    elif self._done:
+                        finished = True
+                        if self._error is not None:
+                            raise self._error
+                        return
+                    else:
+                        chunk = _PULL
+                if chunk is _PULL:
+                    self._pull(index)
+                    continue
+                index += 1
+                yield chunk
+        finally:
+            if not finished:
+                self._unsubscribe()
+
+    def _pull(self, index: int) -> None:
+        """reads the chunk at index from upstream, unless another subscriber already did"""
+        with self._pull_lock:
+            with self._lock:
+                if index < len(self._chunks) or self._done:
+                    return
+            try:
+                if self._upstream is None:
+                    self._upstream = iter(self._start())
+                chunk = next(self._upstream)
+            except StopIteration:
+                self._finish(None)
+                return
+            except Exception as error:  # pylint: disable=broad-except
+                self._finish(error)
+                return
+            with self._lock:
+                self._chunks.append(chunk)
+
+    def _finish(self, error: Exception) -> None:
+        with self._lock:
+            self._done = True
+            self._error = error
+        self._on_done()
+
+    def _unsubscribe(self) -> None:
+        """the last subscriber leaving early closes the upstream stream"""
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers > 0 or self._done:
+                return
+            self._done = True
+        self._on_done()
+        with self._pull_lock:
+            if self._upstream is not None and hasattr(self._upstream, "close"):
+                self._upstream.close()
+
+
+_PULL = object()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls
+
+    The first caller of a key runs the call, callers arriving
+    while it is in flight wait for its outcome (value or error).
+    Once the call completes the key is forgotten,
+    so the next caller starts a new call.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, call: Callable[[], object]) -> object:
+        """returns call(), shared with the concurrent callers of the same key"""
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Call()
+                self._calls[key] = flight
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = call()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            flight.done.set()
+        return flight.value
+
+    def do_stream(self, key: Hashable, start: Callable[[], Iterator]) -> Iterator:
+        """
+        Returns an iterator over the chunks of start(),
+        the upstream stream is shared with the concurrent subscribers of the same key
+        and every subscriber gets every chunk, from the first one.
+        Chunks are shared objects and must not be modified.
+        """
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = _SharedStream(start, lambda: self._forget_stream(key, stream))
+                self._streams[key] = stream
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            return stream.subscribe()
+
+    def _forget_stream(self, key: Hashable, stream: _SharedStream) -> None:
+        with self._lock:
+            if self._streams.get(key) is stream:
+                del self._streams[key]
+
+    def stats(self) -> dict:
+        """upstream calls and coalesced callers"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._streams),
+            }
@@ -0,0 +1,233 @@
+"""
+stream broadcaster
+fans out the chunks of one streamed answer to several consumers
+"""
+
+from collections import deque
+import threading
+from typing import Iterable, Iterator, List
+
+BLOCK = "block"
+DROP = "drop"
+
+_END = object()
+
+
+class _Failure:
+    """the error raised by the source, delivered in order after the chunks"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+
+class Subscription:
+    """
+    a consumer of a StreamBroadcaster, iterate it to read the chunks
+
+    :param max_queue:
+        Chunks kept for this consumer before the policy applies.
+    :param policy:
+        BLOCK makes the broadcaster (and so every consumer) wait for this consumer,
+        DROP skips the chunks arriving while the queue is full, counting them in dropped.
+    """
+
+    def __init__(self, broadcaster: "StreamBroadcaster", max_queue: int, policy: str, replayed: list) -> None:
+        if policy not in (BLOCK, DROP):
+            raise ValueError(f"unknown backpressure policy {policy!r}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.dropped = 0
+        # chunks sent before this consumer subscribed, and no longer in the replay buffer
+        self.missed = 0
+        self.closed = False
+        self._broadcaster = broadcaster
+        self._items = deque(replayed)
+        self._condition = threading.Condition()
+
+    def _offer(self, item, force: bool = False) -> None:
+        """queues a chunk, force is used for the end of stream which is never dropped"""
+        with self._condition:
+            if not force and self.policy == BLOCK:
+                while len(self._items) >= self.max_queue and not self.closed:
+                    self._condition.wait()
+            if self.closed:
+                return
+            if not force and len(self._items) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._items.append(item)
+            self._condition.notify_all()
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        with self._condition:
+            while not self._items:
+                if self.closed:
+                    raise StopIteration
+                self._condition.wait()
+            item = self._items.popleft()
+            self._condition.notify_all()
+
+        if item is _END:
+            self.close()
+            raise StopIteration
+        if isinstance(item, _Failure):
+            self.close()
+            raise item.error
+        return item
+
+    def close(self) -> None:
+        """stops reading, the broadcaster no longer waits for this consumer"""
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._items.clear()
+            self._condition.notify_all()
+        self._broadcaster._unsubscribe(self)
+
+
+class StreamBroadcaster:
+    """
+    Reads a stream on a background thread and delivers every chunk
+    to each subscriber as soon as it arrives.
+
+    The last replay_size chunks are kept in a ring buffer,
+    subscribers joining late start from there,
+    with at most their max_queue most recent chunks.
+
+    The source is read on the background thread, so it is only
+    stopped and closed there, once its next chunk arrives (or it ends):
+    a source waiting on the network stays open until then.
+
+    :param source:
+        The stream, e.g. AI.ask_item_streamed(..., lean=True).
+    :param max_queue:
+        Default per subscriber queue size.
+    :param policy:
+        Default backpressure policy, BLOCK or DROP.
+    :param replay_size:
+        Chunks kept for late subscribers, 0 to disable the replay.
+    :param close_when_idle:
+        Stop reading (and close) the source once every subscriber has left.
+    """
+
+    def __init__(
+        self,
+        source: Iterable,
+        max_queue: int = 64,
+        policy: str = BLOCK,
+        replay_size: int = 256,
+        close_when_idle: bool = True,
+    ) -> None:
+        self.source = source
+        self.max_queue = max_queue
+        self.policy = policy
+        self.close_when_idle = close_when_idle
+        self.sent = 0
+        self._ring = deque(maxlen=replay_size)
+        self._subscribers: List[Subscription] = []
+        self._end = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, max_queue: int = None, policy: str = None, replay: bool = True) -> Subscription:
+        """
+        adds a consumer, replaying the ring buffer unless replay is False
+
+        The replay is cut to the max_queue most recent chunks,
+        so a new queue never starts over its size, the older ones are counted in missed.
+        """
+        max_queue = max_queue if max_queue is not None else self.max_queue
+        with self._lock:
+            replayed = list(self._ring)[-max_queue:] if replay and max_queue > 0 else []
+            missed = self.sent - len(replayed)
+            if self._end is not None:
+                # the end of stream is never dropped
+                replayed.append(self._end)
+            subscription = Subscription(
+                self,
+                max_queue,
+                policy if policy is not None else self.policy,
+                replayed,
+            )
+            subscription.missed = missed
+            if self._end is None:
+                self._subscribers.append(subscription)
+            return subscription
+
+    def start(self) -> "StreamBroadcaster":
+        """starts reading the source, subscribe the first consumers before"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stream-broadcaster", daemon=True)
+                self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+        ends every subscription and stops reading the source,
+        which is closed by the reading thread once its next chunk arrives
+        """
+        self._stopped.set()
+        with self._lock:
+            subscriptions = list(self._subscribers)
+        for subscription in subscriptions:
+            subscription.close()
+
+    def join(self, timeout: float = None) -> None:
+        """waits for the source to be read to the end"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __enter__(self) -> "StreamBroadcaster":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        end = _END
+        try:
+            for chunk in self.source:
+                if self._stopped.is_set():
+                    break
+                with self._lock:
+                    self._ring.append(chunk)
+                    self.sent += 1
+                    subscriptions = list(self._subscribers)
+                for subscription in subscriptions:
+                    subscription._offer(chunk)
+        except Exception as error:  # pylint: disable=broad-except
+            end = _Failure(error)
+        finally:
+            close_source = getattr(self.source, "close", None)
+            if close_source is not None:
+                close_source()
+            with self._lock:
+                self._end = end
+                subscriptions = list(self._subscribers)
+                self._subscribers = []
+            for subscription in subscriptions:
+                subscription._offer(end, force=True)
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            idle = not self._subscribers and self._end is None
+        if idle and self.close_when_idle:
+            self._stopped.set()
+
+
+def broadcast(source: Iterable, consumers: int, **kwargs) -> List[Subscription]:
+    """subscribes consumers to a new broadcaster of source and starts it"""
+    broadcaster = StreamBroadcaster(source, **kwargs)
+    subscriptions = [broadcaster.subscribe() for _ in range(consumers)]
+    broadcaster.start()
+    return subscriptions
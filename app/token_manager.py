@@ -0,0 +1,159 @@
+"""
+Keeps the oAuth2 tokens in memory and refreshes them
+shortly before they expire, for every thread of the process
+"""
+from datetime import datetime, timedelta
+import logging
+import threading
+from typing import Optional, Tuple
+
+from boxsdk.auth.cooperatively_managed_oauth2 import CooperativelyManagedOAuth2
+
+from app.box_oauth import TOKEN_FILE, tokens_json
+from app.config import AppConfig
+from app.token_store import LockedFileTokenStore, TokenStore
+
+REFRESH_MARGIN = timedelta(minutes=5)
+# wait before retrying a failed background refresh
+RETRY_INTERVAL = 30
+
+
+class TokenManager:
+    """
+    oAuth2 token manager
+
+    The tokens are read from the token store once and kept in memory.
+    The store is only read again when another process changed it,
+    in which case its tokens are adopted instead of refreshing.
+
+    Refreshes are single flighted: the store lock is the boxsdk
+    refresh lock, so concurrent callers, in this or other processes,
+    wait on the refresh in progress and get its tokens.
+
+    :param store:
+        Where the tokens are shared, defaults to the locked token file.
+    :param refresh_margin:
+        How long before expiry the access token is refreshed.
+    """
+
+    def __init__(
+        self,
+        config: AppConfig,
+        token_path: str = TOKEN_FILE,
+        refresh_margin: timedelta = REFRESH_MARGIN,
+        store: TokenStore = None,
+    ):
+        self.config = config
+        self.store = store if store is not None else LockedFileTokenStore(token_path)
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._version = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._reload_if_changed()
+
+        self.oauth = CooperativelyManagedOAuth2(
+            retrieve_tokens=self._retrieve_tokens,
+            client_id=config.client_id,
+            client_secret=config.client_secret,
+            store_tokens=self._store_tokens,
+            access_token=self._tokens.get("access_token"),
+            refresh_token=self._tokens.get("refresh_token"),
+            refresh_lock=self.store.lock,
+        )
+
+    def _reload_if_changed(self) -> bool:
+        with self._lock:
+            version = self.store.version()
+            if version is None or version == self._version:
+                return False
+            self._tokens = self.store.load() or {}
+            self._version = version
+            return True
+
+    def _retrieve_tokens(self) -> Tuple[Optional[str], Optional[str]]:
+        """current tokens, called by boxsdk before refreshing"""
+        self._reload_if_changed()
+        with self._lock:
+            return self._tokens.get("access_token"), self._tokens.get("refresh_token")
+
+    def _store_tokens(self, access_token: str, refresh_token: str) -> None:
+        """called by boxsdk with the refreshed tokens, under the store lock"""
+        oauth_json = tokens_json(access_token, refresh_token)
+        with self._lock:
+            expected_refresh_token = self._tokens.get("refresh_token")
+            if self.store.compare_and_swap(expected_refresh_token, oauth_json):
+                self._tokens = oauth_json
+                self._version = self.store.version()
+                return
+
+        # a writer outside the store lock got there first, keep a single token chain
+        logging.warning("Token store changed during refresh, adopting the stored tokens")
+        self._reload_if_changed()
+        self._update_oauth()
+
+    def reload(self) -> None:
+        """picks up tokens written outside of the manager, e.g. by the authorization flow"""
+        self._reload_if_changed()
+        self._update_oauth()
+
+    def _update_oauth(self) -> None:
+        self.oauth._get_and_update_current_tokens()  # pylint: disable=protected-access
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """the current access token"""
+        with self._lock:
+            return self._tokens.get("access_token")
+
+    @property
+    def access_token_expires_on(self) -> Optional[datetime]:
+        """expiry of the current access token, None if unknown"""
+        with self._lock:
+            expires_on = self._tokens.get("access_token_expires_on")
+        return datetime.fromisoformat(expires_on) if expires_on else None
+
+    def needs_refresh(self) -> bool:
+        """True when the access token expires within the refresh margin"""
+        expires_on = self.access_token_expires_on
+        return expires_on is None or datetime.today() >= expires_on - self.refresh_margin
+
+    def ensure_fresh(self) -> str:
+        """Refreshes the access token if about to expire, returns it"""
+        if self.needs_refresh() and self._reload_if_changed():
+            # another process already refreshed
+            self._update_oauth()
+        if self.needs_refresh():
+            self.oauth.refresh(self.access_token)
+        return self.access_token
+
+    def start(self) -> "TokenManager":
+        """Starts refreshing the tokens in the background"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="box-token-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the background refresh"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _seconds_until_refresh(self) -> float:
+        expires_on = self.access_token_expires_on
+        if expires_on is None:
+            return 0
+        return max(0.0, (expires_on - self.refresh_margin - datetime.today()).total_seconds())
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._seconds_until_refresh()):
+            try:
+                self.ensure_fresh()
+            except Exception as error:  # pylint: disable=broad-except
+                logging.warning("Background token refresh failed: %s", error)
+                if self._stopped.wait(RETRY_INTERVAL):
+                    break
@@ -0,0 +1,204 @@
+"""
+Token stores shared by the processes of a worker fleet
+
+Each store has an inter process lock, used as the boxsdk refresh lock,
+so only one process refreshes and the others pick up its tokens.
+"""
+import logging
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from app.box_oauth import TOKEN_FILE, read_tokens_file, write_tokens_file
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+TOKEN_FIELDS = ("access_token", "access_token_expires_on", "refresh_token", "refresh_token_expires_on")
+
+
+class TokenStoreLock:
+    """
+    reentrant lock, exclusive across the threads of the process
+    and across processes while held
+    """
+
+    def __init__(self, store: "TokenStore"):
+        self._store = store
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def __enter__(self) -> "TokenStoreLock":
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0:
+                self._store._acquire()  # pylint: disable=protected-access
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                self._store._release()  # pylint: disable=protected-access
+        finally:
+            self._thread_lock.release()
+
+
+class TokenStore:
+    """
+    Base token store
+
+    Tokens are the token file json: access_token, access_token_expires_on,
+    refresh_token and refresh_token_expires_on.
+    """
+
+    def __init__(self):
+        self.lock = TokenStoreLock(self)
+
+    def version(self):
+        """changes whenever the stored tokens change, cheap to call"""
+        raise NotImplementedError
+
+    def load(self) -> Optional[dict]:
+        """the stored tokens, None if there are none"""
+        raise NotImplementedError
+
+    def compare_and_swap(self, expected_refresh_token: Optional[str], oauth_json: dict) -> bool:
+        """
+        Stores the tokens only if the stored refresh token is still
+        the expected one. Returns False if another process got there first.
+        """
+        with self.lock:
+            current = self.load()
+            current_refresh_token = current.get("refresh_token") if current else None
+            if current_refresh_token != expected_refresh_token:
+                return False
+            self._save(oauth_json)
+            return True
+
+    def _save(self, oauth_json: dict) -> None:
+        raise NotImplementedError
+
+    def _acquire(self) -> None:
+        raise NotImplementedError
+
+    def _release(self) -> None:
+        raise NotImplementedError
+
+
+class LockedFileTokenStore(TokenStore):
+    """
+    Token file guarded by an advisory lock on a sibling lock file,
+    writes replace the file atomically
+    """
+
+    def __init__(self, path: str = TOKEN_FILE, lock_path: str = None):
+        super().__init__()
+        self.path = path
+        self.lock_path = lock_path or f"{path}.lock"
+        self._lock_file = None
+
+    def version(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> Optional[dict]:
+        return read_tokens_file(self.path)
+
+    def _save(self, oauth_json: dict) -> None:
+        write_tokens_file(oauth_json, self.path)
+
+    def _acquire(self) -> None:
+        # pylint: disable=consider-using-with
+        self._lock_file = open(self.lock_path, "a+", encoding="UTF-8")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._lock_file.seek(0)
+            msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _release(self) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class SQLiteTokenStore(TokenStore):
+    """
+    Tokens in a single row SQLite table, with a version counter.
+    The lock is an immediate (write) transaction.
+    """
+
+    def __init__(self, path: str = ".oauth.db", timeout: float = 30):
+        super().__init__()
+        self.path = path
+        # serializes the use of the connection between threads,
+        # reads do not need the inter process lock
+        self._connection_lock = threading.RLock()
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " access_token TEXT,"
+            " access_token_expires_on TEXT,"
+            " refresh_token TEXT,"
+            " refresh_token_expires_on TEXT,"
+            " version INTEGER NOT NULL)"
+        )
+
+    def close(self) -> None:
+        """closes the database connection"""
+        with self._connection_lock:
+            self._connection.close()
+
+    def version(self) -> Optional[int]:
+        with self._connection_lock:
+            row = self._connection.execute("SELECT version FROM tokens WHERE id = 1").fetchone()
+        return row[0] if row else None
+
+    def load(self) -> Optional[dict]:
+        with self._connection_lock:
+            row = self._connection.execute(f"SELECT {', '.join(TOKEN_FIELDS)} FROM tokens WHERE id = 1").fetchone()
+        return dict(zip(TOKEN_FIELDS, row)) if row else None
+
+    def _save(self, oauth_json: dict) -> None:
+        values = [oauth_json.get(field) for field in TOKEN_FIELDS]
+        with self._connection_lock:
+            self._connection.execute(
+                f"INSERT INTO tokens (id, {', '.join(TOKEN_FIELDS)}, version) VALUES (1, ?, ?, ?, ?, 1)"
+                " ON CONFLICT (id) DO UPDATE SET"
+                " access_token = excluded.access_token,"
+                " access_token_expires_on = excluded.access_token_expires_on,"
+                " refresh_token = excluded.refresh_token,"
+                " refresh_token_expires_on = excluded.refresh_token_expires_on,"
+                " version = tokens.version + 1",
+                values,
+            )
+
+    def _acquire(self) -> None:
+        with self._connection_lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+
+    def _release(self) -> None:
+        with self._connection_lock:
+            try:
+                self._connection.execute("COMMIT")
+            except sqlite3.Error as error:
+                logging.warning("Token store commit failed: %s", error)
+                self._connection.execute("ROLLBACK")
@@ -0,0 +1,82 @@
+"""
+Runs a prompt file over a folder (or a list of files) without prompting,
+appending the answers to a JSONL file as they complete.
+
+    python batch_qa.py --folder 0 --prompts prompts.txt --output results.jsonl
+    python batch_qa.py --files 123 456 --prompts prompts.txt --mode text_gen
+    python batch_qa.py --file-list ids.txt --prompts prompts.txt --jwt-config .jwt.config.json --as-user 789
+
+Run the same command again to resume, questions already answered are skipped.
+"""
+
+import argparse
+import logging
+
+from app.batch_qa import export_parquet, iter_files, load_prompts, run_batch
+from app.box_ai import AI, QAMode, TextGenMode
+from app.box_content import CrawlFilter
+
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
+
+MODES = {"single_item_qa": QAMode.SINGLE_ITEM_QA, "text_gen": TextGenMode.TEXT_GEN}
+
+
+def get_batch_client(args):
+    """service account client with --jwt-config, otherwise the stored oAuth2 tokens"""
+    if args.jwt_config:
+        from app.box_service_client import ServiceClientFactory  # pylint: disable=import-outside-toplevel
+
+        factory = ServiceClientFactory.from_jwt_settings(args.jwt_config, pool_size=args.workers)
+        factory.warm_up()
+        return factory.get_client(args.as_user)
+
+    from app.box_client import get_client  # pylint: disable=import-outside-toplevel
+    from app.config import get_config  # pylint: disable=import-outside-toplevel
+
+    return get_client(get_config())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--folder", help="folder id, its files are found recursively")
+    source.add_argument("--files", nargs="+", help="file ids")
+    source.add_argument("--file-list", help="text file with one file id per line")
+    parser.add_argument("--prompts", required=True, help="text file with one prompt per line")
+    parser.add_argument("--mode", choices=MODES, default="single_item_qa")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results, also the resume checkpoint")
+    parser.add_argument("--parquet", help="also export the results to this Parquet file at the end (needs pyarrow)")
+    parser.add_argument("--extensions", nargs="+", help="only files with these extensions, with --folder")
+    parser.add_argument("--workers", type=int, default=8, help="questions in flight")
+    parser.add_argument("--timeout", type=float, help="seconds allowed for the whole batch")
+    parser.add_argument("--jwt-config", help="JWT app settings file, for a service account")
+    parser.add_argument("--as-user", help="user id the service account acts as")
+    args = parser.parse_args()
+
+    file_ids = args.files
+    if args.file_list:
+        with open(args.file_list, "r", encoding="UTF-8") as file:
+            file_ids = [line.strip() for line in file if line.strip()]
+
+    client = get_batch_client(args)
+    item_filter = CrawlFilter(extensions=args.extensions) if args.extensions else None
+    files = iter_files(client, folder_id=args.folder, file_ids=file_ids, item_filter=item_filter)
+
+    stats = run_batch(
+        AI(client),
+        files,
+        load_prompts(args.prompts),
+        args.output,
+        mode=MODES[args.mode],
+        max_workers=args.workers,
+        timeout=args.timeout,
+    )
+    logging.info("answered %(answered)s, failed %(failed)s, skipped %(skipped)s, pending %(pending)s", stats)
+
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Measures the AI client overhead against a local mock Box AI server.
+
+Reports p50/p95/p99 latency, requests/sec, time to first token
+and allocations for ask_item, ask_item_streamed, ask_text_gen and
+ask_text_gen_streamed, as JSON.
+
+    python -m benchmarks.bench_ai_client --requests 200 --output bench.json
+    python -m benchmarks.bench_ai_client --baseline bench.json
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from app.box_ai import AI, AIItem, QAMode
+from benchmarks.mock_server import MockBoxAIServer
+
+ITEM = AIItem("123", "file", "some document content")
+
+
+def _scenarios(box_ai: AI) -> dict:
+    """each scenario makes one call and returns an iterator of chunks"""
+    return {
+        "ask_item": lambda: iter([box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "question", [ITEM])]),
+        "ask_item_streamed": lambda: box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "question", [ITEM]),
+        "ask_item_streamed_lean": lambda: box_ai.ask_item_streamed(
+            QAMode.SINGLE_ITEM_QA, "question", [ITEM], lean=True
+        ),
+        "ask_text_gen": lambda: iter([box_ai.ask_text_gen("question", ITEM, dialogue_history=[])]),
+        "ask_text_gen_streamed": lambda: box_ai.ask_text_gen_streamed("question", ITEM, dialogue_history=[]),
+    }
+
+
+def _percentiles(values: list) -> dict:
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49] * 1000, 3),
+        "p95": round(cuts[94] * 1000, 3),
+        "p99": round(cuts[98] * 1000, 3),
+    }
+
+
+def measure(call, requests: int, warmup: int) -> dict:
+    """latency, time to first token and throughput of a scenario"""
+    for _ in range(warmup):
+        for _ in call():
+            pass
+
+    latencies = []
+    first_tokens = []
+    chunks = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        first_token = None
+        for _ in call():
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            chunks += 1
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first_token)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "latency_ms": _percentiles(latencies),
+        "time_to_first_token_ms": _percentiles(first_tokens),
+        "requests_per_sec": round(requests / elapsed, 2),
+        "chunks_per_request": chunks / requests,
+    }
+
+
+def measure_allocations(call, requests: int) -> dict:
+    """python allocations per call, traced in a separate pass"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        for _ in range(requests):
+            for _ in call():
+                pass
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    allocated = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    return {
+        "peak_kib": round(peak / 1024, 2),
+        "retained_kib_per_request": round(allocated / 1024 / requests, 3),
+        "retained_blocks_per_request": round(blocks / requests, 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> dict:
+    """runs every selected scenario against a fresh mock server"""
+    results = {}
+    with MockBoxAIServer(
+        latency=args.latency,
+        chunk_count=args.chunks,
+        chunk_size=args.chunk_size,
+        chunk_delay=args.chunk_delay,
+    ) as server:
+        box_ai = AI(server.client())
+        for name, call in _scenarios(box_ai).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            results[name] = measure(call, args.requests, args.warmup)
+            results[name]["allocations"] = measure_allocations(call, max(1, args.requests // 10))
+
+    return {
+        "benchmark": "ai_client",
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "config": {
+            "requests": args.requests,
+            "latency": args.latency,
+            "chunks": args.chunks,
+            "chunk_size": args.chunk_size,
+            "chunk_delay": args.chunk_delay,
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """scenarios whose p50 latency regressed more than tolerance"""
+    regressions = []
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        before = previous["latency_ms"]["p50"]
+        after = result["latency_ms"]["p50"]
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before}ms -> {after}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="server latency in seconds")
+    parser.add_argument("--chunks", type=int, default=50, help="chunks per streamed answer")
+    parser.add_argument("--chunk-size", type=int, default=16, help="characters per chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between chunks")
+    parser.add_argument("--scenario", action="append", help="only run this scenario, repeatable")
+    parser.add_argument("--output", help="also write the json report to this file")
+    parser.add_argument("--baseline", help="json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 regression ratio")
+    args = parser.parse_args()
+
+    logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
+
+    report = run(args)
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            file.write(json.dumps(report, indent=4))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="UTF-8") as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Measures the cold start cost of importing the AI client,
+from `python -X importtime` run in fresh interpreters.
+
+Reports the median total import time, the slowest modules
+and fails when a module of the interactive path gets imported
+or when the import time regresses, as JSON.
+
+    python -m benchmarks.bench_import_time --output import.json
+    python -m benchmarks.bench_import_time --baseline import.json --max-ms 400
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.bench_ai_client import _git_commit
+
+STATEMENT = "from app.box_ai import AI"
+
+# only needed by the interactive samples and the oauth browser flow
+FORBIDDEN_MODULES = ("InquirerPy", "prompt_toolkit", "dotenv", "webbrowser", "http.server", "app.config")
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module name, self us, cumulative us, depth) from the -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def measure_once(statement: str) -> dict:
+    """imports statement in a fresh interpreter, without bytecode writes to keep runs alike"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=root,
+    )
+    return parse_importtime(result.stderr)
+
+
+def run(args) -> dict:
+    """imports the statement args.runs times, the first run warms the bytecode cache"""
+    measure_once(args.statement)
+    runs = [measure_once(args.statement) for _ in range(args.runs)]
+    # interpreter start up (site, encodings...) is reported too, measured alone to be left out
+    startup_runs = [measure_once("pass") for _ in range(args.runs)]
+    startup = statistics.median(_total(modules) for modules in startup_runs)
+    startup_names = {name for name, _, _, _ in startup_runs[-1]}
+
+    totals = [_total(modules) - startup for modules in runs]
+    imported = [module for module in runs[-1] if module[0] not in startup_names]
+    slowest = sorted(imported, key=lambda module: module[1], reverse=True)[: args.top]
+    names = [name for name, _, _, _ in imported]
+
+    return {
+        "benchmark": "import_time",
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "statement": args.statement,
+        "results": {
+            "total_ms": {
+                "p50": round(statistics.median(totals) / 1000, 2),
+                "min": round(min(totals) / 1000, 2),
+                "max": round(max(totals) / 1000, 2),
+            },
+            "startup_ms": round(startup / 1000, 2),
+            "modules": len(names),
+            "slowest_self_ms": {name: round(self_us / 1000, 2) for name, self_us, _, _ in slowest},
+            "forbidden": sorted(
+                name for name in names if any(_is_module(name, forbidden) for forbidden in args.forbid)
+            ),
+        },
+    }
+
+
+def _total(modules: list) -> int:
+    """the modules at depth 0 were imported directly, their cumulative time covers the others"""
+    return sum(cumulative for _, _, cumulative, depth in modules if depth == 0)
+
+
+def _is_module(name: str, package: str) -> bool:
+    return name == package or name.startswith(f"{package}.")
+
+
+def check(report: dict, baseline: dict, tolerance: float, max_ms: float) -> list:
+    """failures: forbidden imports, an import time above max_ms or regressed more than tolerance"""
+    failures = [f"imports {name}" for name in report["results"]["forbidden"]]
+    total = report["results"]["total_ms"]["p50"]
+    if max_ms and total > max_ms:
+        failures.append(f"p50 {total}ms over the {max_ms}ms budget")
+    if baseline:
+        before = baseline["results"]["total_ms"]["p50"]
+        if before and total > before * (1 + tolerance):
+            failures.append(f"p50 {before}ms -> {total}ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statement", default=STATEMENT, help="python statement to time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to report")
+    parser.add_argument("--forbid", action="append", default=list(FORBIDDEN_MODULES), help="module not to import")
+    parser.add_argument("--max-ms", type=float, help="import time budget in milliseconds")
+    parser.add_argument("--output", help="also write the json report to this file")
+    parser.add_argument("--baseline", help="json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed import time regression ratio")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=4))
+
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as file:
+            file.write(json.dumps(report, indent=4))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="UTF-8") as file:
+            baseline = json.load(file)
+    failures = check(report, baseline, args.tolerance, args.max_ms)
+    for failure in failures:
+        print(f"regression: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compares the slotted models and single pass serializer with the previous
+dict backed models (copied below), for a question with a large history.
+
+Reports bytes per AIAnswer and serialization time per question, as JSON.
+
+    python -m benchmarks.bench_models --history 200
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.box_ai import AIAnswer, AIItem, AIQuestion, AIQuestionMode
+from app.box_ai_json import orjson
+from app.dialogue_history import DialogueHistory
+
+CREATED_AT = "2023-10-18T10:00:00-07:00"
+
+
+class DictAnswer:
+    """AIAnswer before __slots__"""
+
+    def __init__(self, answer, created_at, completion_reason=None, prompt=None):
+        self.answer = answer
+        self.created_at = created_at
+        self.completion_reason = completion_reason
+        self.prompt = prompt
+
+    def to_json(self):
+        return {
+            "answer": self.answer,
+            "created_at": self.created_at,
+            "completion_reason": self.completion_reason,
+            "prompt": self.prompt,
+        }
+
+
+def dict_question_body(prompt: str, items: list, mode: AIQuestionMode, dialogue_history: list) -> str:
+    """AIQuestion.to_json, then the config added and json.dumps, as before"""
+    items_json = []
+    for item in items:
+        items_json.append(item.to_json())
+    dialogue_history_json = []
+    for dialogue in dialogue_history:
+        dialogue_history_json.append(dialogue.to_json())
+    question_json = {
+        "prompt": prompt,
+        "items": items_json,
+        "mode": mode.value,
+        "dialogue_history": dialogue_history_json,
+    }
+    question_json["config"] = {"is_streamed": False}
+    return json.dumps(question_json)
+
+
+def bytes_per_answer(model, count: int) -> float:
+    """traced allocations of count answers, divided by count"""
+    # the strings are built beforehand, only the answer objects are traced
+    texts = [(f"answer {i}", f"question {i}") for i in range(count)]
+    tracemalloc.start()
+    answers = [model(answer, CREATED_AT, "done", prompt) for answer, prompt in texts]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return round(allocated / len(answers), 1)
+
+
+def seconds_per_call(call, repeat: int) -> float:
+    """best of 5 runs of repeat calls"""
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call()
+        elapsed = (time.perf_counter() - start) / repeat
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(history: int, repeat: int) -> dict:
+    """serializes one question with history answers, with each model"""
+    items = [AIItem("123", "file", "some document content")]
+    dict_history = [DictAnswer(f"answer {i} " * 20, CREATED_AT, "done", f"question {i}") for i in range(history)]
+    slotted_history = [AIAnswer(f"answer {i} " * 20, CREATED_AT, "done", f"question {i}") for i in range(history)]
+    dialogue_history = DialogueHistory(max_tokens=10**9)
+    for answer in slotted_history:
+        dialogue_history.append(answer)
+
+    serializers = {
+        "dict_models": lambda: dict_question_body("hello", items, AIQuestionMode.TEXT_GEN, dict_history),
+        "slotted_models": lambda: AIQuestion(
+            "hello", items, AIQuestionMode.TEXT_GEN, dialogue_history=slotted_history
+        ).to_json_str(),
+        "slotted_dialogue_history": lambda: AIQuestion(
+            "hello", items, AIQuestionMode.TEXT_GEN, dialogue_history=dialogue_history
+        ).to_json_str(),
+    }
+    serialization = {name: seconds_per_call(call, repeat) for name, call in serializers.items()}
+    baseline = serialization["dict_models"]
+
+    return {
+        "benchmark": "models",
+        "history": history,
+        "orjson": orjson is not None,
+        "results": {
+            "bytes_per_answer": {
+                "dict_models": bytes_per_answer(DictAnswer, 10000),
+                "slotted_models": bytes_per_answer(AIAnswer, 10000),
+            },
+            "serialize_us_per_question": {name: round(seconds * 1e6, 1) for name, seconds in serialization.items()},
+            "serialize_speedup": {name: round(baseline / seconds, 2) for name, seconds in serialization.items()},
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=200, help="answers in the dialogue history")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.history, args.repeat), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares streamed answer parsing throughput (chunks/sec)
+between the default path (json.loads + boxsdk translator + AIAnswer
+per line) and the lean path (incremental parser + AIAnswerDelta).
+
+    python -m benchmarks.bench_stream_parser --chunks 50000
+"""
+
+import argparse
+import json
+import time
+
+from boxsdk.util.translator import Translator
+
+from app.box_ai import AIAnswer
+from app.box_ai_stream import iter_answer_deltas
+
+CREATED_AT = "2023-10-18T10:00:00-07:00"
+
+
+def build_body(chunks: int) -> bytes:
+    """a streamed answer of one word per chunk"""
+    lines = [json.dumps({"answer": f" word{i}", "created_at": CREATED_AT}) for i in range(chunks - 1)]
+    lines.append(json.dumps({"answer": " end", "created_at": CREATED_AT, "completion_reason": "done"}))
+    return "\n".join(lines).encode("utf-8")
+
+
+def network_chunks(body: bytes, size: int):
+    """the body as it would be read from the socket"""
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+
+
+def default_path(body: bytes, read_size: int) -> int:
+    """mirrors AI._get_ai_api_response_streamed"""
+    translator = Translator(extend_default_translator=True, new_child=True)
+    buffer = b""
+    count = 0
+    for data in network_chunks(body, read_size):
+        lines = (buffer + data).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if line:
+                response_object = translator.translate(session=None, response_object=json.loads(line))
+                AIAnswer(
+                    answer=response_object["answer"],
+                    created_at=response_object["created_at"],
+                    completion_reason=response_object.get("completion_reason"),
+                    prompt="prompt",
+                )
+                count += 1
+    if buffer:
+        json.loads(buffer)
+        count += 1
+    return count
+
+
+def lean_path(body: bytes, read_size: int) -> int:
+    """mirrors AI._get_ai_api_response_deltas"""
+    translator = Translator(extend_default_translator=True, new_child=True)
+
+    def translate(frame):
+        return translator.translate(session=None, response_object=frame)
+
+    count = 0
+    for _ in iter_answer_deltas(network_chunks(body, read_size), translate):
+        count += 1
+    return count
+
+
+def run(chunks: int, read_size: int, repeat: int) -> dict:
+    """best of repeat runs for each path"""
+    body = build_body(chunks)
+    results = {}
+    for name, path in (("default", default_path), ("lean", lean_path)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = path(body, read_size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        assert count == chunks
+        results[name] = {"seconds": round(best, 6), "chunks_per_sec": round(chunks / best)}
+    results["speedup"] = round(results["default"]["seconds"] / results["lean"]["seconds"], 2)
+    return {"benchmark": "stream_parser", "chunks": chunks, "read_size": read_size, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--read-size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.chunks, args.read_size, args.repeat), indent=4))
+
+
+if __name__ == "__main__":
+    main()
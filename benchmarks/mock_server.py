@@ -0,0 +1,51 @@
+"""
+Local HTTP server emulating the Box AI ai/ask endpoint
+with configurable latency and streamed chunk sizes,
+built on the stub server of the tests.
+"""
+
+from boxsdk import Client
+
+from tests.stub_server import make_stub_client, start_stub_server, stop_stub_server
+
+
+class MockBoxAIServer:
+    """
+    Mock Box AI server, run as a context manager
+
+    :param latency:
+        Seconds before the response starts.
+    :param chunk_count:
+        Number of streamed chunks, the non streamed answer joins them.
+    :param chunk_size:
+        Characters per chunk.
+    :param chunk_delay:
+        Seconds between streamed chunks.
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_count: int = 50, chunk_size: int = 16, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.chunk_count = chunk_count
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        """base api url to point clients to"""
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def client(self) -> Client:
+        """a boxsdk client using this server as the api"""
+        return make_stub_client(self._server)
+
+    def __enter__(self) -> "MockBoxAIServer":
+        self._server = start_stub_server()
+        self._server.record_calls = False
+        self._server.latency = self.latency
+        self._server.chunk_delay = self.chunk_delay
+        self._server.answer_chunks = ["x" * self.chunk_size] * self.chunk_count
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        stop_stub_server(self._server)
@@ -1,10 +1,15 @@
 import logging
+import os
 
 from InquirerPy import inquirer
 
 from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache
+from app.prefetch import DEFAULT_PREFETCH_PROMPTS, AnswerPrefetcher
+from app.singleflight import SingleFlight
 
-from app.config import AppConfig
+from app.config import get_config
+from app.folder_index import FolderIndex
 
 from app.box_client import get_client
 from app.prompts import select_file
@@ -12,7 +17,10 @@ from app.prompts import select_file
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
 
-conf = AppConfig()
+# questions answered in the background as soon as the file is selected,
+# only when PREFETCH=1 is set in the environment or the .env file,
+# since every prefetched question is a billed ai call
+PREFETCH_PROMPTS = DEFAULT_PREFETCH_PROMPTS
 
 
 def main():
@@ -21,20 +29,29 @@ def main():
     with oAuth2 authentication
     """
 
-    client = get_client(conf)
+    client = get_client(get_config())
 
     # user = client.user().get()
     print("\n----------------------------")
     print("AI Ask Demo - Single Item QA")
     print("----------------------------")
 
-    file_selection = select_file(client)
+    # folders are listed once, then kept current from the events stream
+    folder_index = FolderIndex(client)
+    file_selection = select_file(client, folder_index=folder_index)
+    folder_index.close()
     item = AIItem(
         item_id=file_selection.item_id,
         item_type=file_selection.item_type,
     )
 
-    box_ai = AI(client)
+    # questions asked while their prefetch is in flight join it,
+    # the file version is checked at most every 30 seconds
+    box_ai = AI(client, cache=LRUAnswerCache(), single_flight=SingleFlight(), etag_ttl=30)
+    prefetcher = None
+    if PREFETCH_PROMPTS and os.getenv("PREFETCH") == "1":
+        prefetcher = AnswerPrefetcher(box_ai, PREFETCH_PROMPTS)
+        prefetcher.prefetch(item)
 
     while True:
         prompt = inquirer.text(
@@ -46,6 +63,8 @@ def main():
             break
 
         if prompt == "restart":
+            if prefetcher is not None:
+                prefetcher.close()
             main()
 
         answer = box_ai.ask_item(
@@ -56,6 +75,9 @@ def main():
 
         print(f"\nAnswer:\n{answer.answer}\n")
 
+    if prefetcher is not None:
+        prefetcher.close()
+
 
 if __name__ == "__main__":
     main()
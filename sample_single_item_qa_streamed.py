@@ -5,7 +5,7 @@ from InquirerPy import inquirer
 
 from app.box_ai import AI, AIItem, QAMode
 
-from app.config import AppConfig
+from app.config import get_config
 
 from app.box_client import get_client
 from app.prompts import select_file
@@ -13,8 +13,6 @@ from app.prompts import select_file
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
 
-conf = AppConfig()
-
 
 def main():
     """
@@ -22,7 +20,7 @@ def main():
     with oAuth2 authentication
     """
 
-    client = get_client(conf)
+    client = get_client(get_config())
 
     # user = client.user().get()
     print("\n-------------------------------------")
@@ -3,8 +3,9 @@ import logging
 from InquirerPy import inquirer
 
 from app.box_ai import AI, AIItem
+from app.dialogue_history import DialogueHistory
 
-from app.config import AppConfig
+from app.config import get_config
 
 from app.box_client import get_client
 from app.prompts import get_manual_context, select_file
@@ -12,8 +13,6 @@ from app.prompts import get_manual_context, select_file
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
 
-conf = AppConfig()
-
 
 def main():
     """
@@ -21,7 +20,7 @@ def main():
     with oAuth2 authentication
     """
 
-    client = get_client(conf)
+    client = get_client(get_config())
 
     # user = client.user().get()
     print("\n----------------------")
@@ -30,7 +29,7 @@ def main():
 
     box_ai = AI(client)
 
-    dialogue_history = []
+    dialogue_history = DialogueHistory()
 
     file_selection = select_file(client)
 
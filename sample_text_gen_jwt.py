@@ -3,28 +3,23 @@ import logging
 from InquirerPy import inquirer
 
 from app.box_ai import AI, AIItem
-
-from app.config import AppConfig
+from app.box_service_client import get_service_client_factory
+from app.dialogue_history import DialogueHistory
 
 from app.prompts import get_manual_context, select_file
 
-from boxsdk import Client, JWTAuth
-
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
 
-conf = AppConfig()
-
 
 def main():
     """
     Simple script to demonstrate how to use the Box SDK
-    with oAuth2 authentication
+    with JWT authentication
     """
 
-    auth = JWTAuth.from_settings_file(".jwt.config.json")
-
-    client = Client(auth)
+    # pooled client, its service token is fetched once per process
+    client = get_service_client_factory().get_client()
 
     # user = client.user().get()
     print("\n----------------------")
@@ -33,7 +28,7 @@ def main():
 
     box_ai = AI(client)
 
-    dialogue_history = []
+    dialogue_history = DialogueHistory()
 
     file_selection = select_file(client)
 
@@ -3,9 +3,10 @@ from time import sleep
 
 from InquirerPy import inquirer
 
-from app.box_ai import AI, AIItem
+from app.box_ai import AI, AIAnswer, AIItem
+from app.dialogue_history import DialogueHistory
 
-from app.config import AppConfig
+from app.config import get_config
 
 from app.box_client import get_client
 from app.prompts import get_manual_context, select_file
@@ -13,8 +14,6 @@ from app.prompts import get_manual_context, select_file
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("boxsdk").setLevel(logging.CRITICAL)
 
-conf = AppConfig()
-
 
 def main():
     """
@@ -22,7 +21,7 @@ def main():
     with oAuth2 authentication
     """
 
-    client = get_client(conf)
+    client = get_client(get_config())
 
     print("\n---------------------------------")
     print("AI Ask Demo - Text Gen - Streamed")
@@ -30,7 +29,7 @@ def main():
 
     box_ai = AI(client)
 
-    dialogue_history = []
+    dialogue_history = DialogueHistory()
 
     file_selection = select_file(client)
 
@@ -57,15 +56,19 @@ def main():
             prompt=prompt,
             item=item,
             dialogue_history=dialogue_history,
+            lean=True,
         )
 
+        deltas = []
         for answer in answers:
             print(f"{answer.answer}", end="")
             sleep(0.1)  # just for effect ;)
-            dialogue_history.append(answer)
+            deltas.append(answer)
             if answer.completion_reason == "done":
                 print("\n")
 
+        dialogue_history.append(AIAnswer.from_deltas(deltas, prompt=prompt))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,22 @@
+""" shared fixtures, including a local stub of the box ai endpoint"""
+
+import pytest
+from boxsdk import Client
+
+from tests.stub_server import make_stub_client, start_stub_server, stop_stub_server
+
+
+@pytest.fixture
+def ai_stub():
+    """local http server emulating the box ai endpoint"""
+    server = start_stub_server()
+
+    yield server
+
+    stop_stub_server(server)
+
+
+@pytest.fixture
+def stub_client(ai_stub) -> Client:
+    """boxsdk client pointing to the local ai stub"""
+    return make_stub_client(ai_stub)
@@ -0,0 +1,244 @@
+""" local stub of the box api, answering ai/ask and the item endpoints, shared by the tests and the benchmarks"""
+
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from boxsdk import Client, OAuth2
+
+STUB_CREATED_AT = "2023-10-18T10:00:00-07:00"
+# children sent with a folder, the rest is paged
+ITEM_COLLECTION_LIMIT = 100
+
+
+class AIStubHandler(BaseHTTPRequestHandler):
+    """
+    Emulates POST /ai/ask
+    answering with the prompt echoed back,
+    as a single json object or as json lines when streamed
+    """
+
+    protocol_version = "HTTP/1.1"
+    # small header and body writes would otherwise wait on delayed acks
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send_json(self, status: int, response_json: dict, headers: dict = None):
+        body = json.dumps(response_json).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        handles GET /files/:id, answering the file etag, GET /files/:id/content
+        and GET /folders/:id/items, paging server.folders with markers or offsets
+        """
+        url = urllib.parse.urlparse(self.path)
+        path = url.path.strip("/").split("/")
+        if self.server.record_calls:
+            self.server.gets.append(self.path)
+
+        if path[0] == "folders" and path[-1] == "items":
+            query = urllib.parse.parse_qs(url.query)
+            entries = self.server.folders.get(path[1], [])
+            limit = int(query.get("limit", ["100"])[0])
+            if "usemarker" in query:
+                start = int(query.get("marker", ["0"])[0])
+                page = {"entries": entries[start : start + limit], "limit": limit}
+                if start + limit < len(entries):
+                    page["next_marker"] = str(start + limit)
+            else:
+                start = int(query.get("offset", ["0"])[0])
+                page = {"entries": entries[start : start + limit], "limit": limit, "offset": start}
+                page["total_count"] = len(entries)
+            self._send_json(200, page)
+            return
+
+        if path[0] == "folders":
+            self._send_json(200, self._folder_json(path[1]))
+            return
+
+        if path[0] == "events":
+            query = urllib.parse.parse_qs(url.query)
+            position = query.get("stream_position", ["0"])[0]
+            start = len(self.server.events) if position == "now" else int(position)
+            limit = int(query.get("limit", ["100"])[0])
+            entries = self.server.events[start : start + limit]
+            self._send_json(
+                200,
+                {"chunk_size": len(entries), "next_stream_position": start + len(entries), "entries": entries},
+            )
+            return
+
+        if path[0] == "files" and path[-1] == "content":
+            self.server.downloads.append(path[1])
+            body = self.server.contents[path[1]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        file_id = path[-1]
+        if self.server.etag_latency:
+            time.sleep(self.server.etag_latency)
+        file_json = {"type": "file", "id": file_id, "etag": self.server.etags.get(file_id, "0")}
+        if file_id in self.server.file_names:
+            file_json["name"] = self.server.file_names[file_id]
+        self._send_json(200, file_json)
+
+    def _folder_json(self, folder_id: str) -> dict:
+        """folder with its parent, path and item collections, from server.folders"""
+        entries = self.server.folders.get(folder_id, [])
+        parents = {
+            entry["id"]: parent_id
+            for parent_id, entries in self.server.folders.items()
+            for entry in entries
+            if entry["type"] == "folder"
+        }
+        ancestors = []
+        current = folder_id
+        while current in parents:
+            current = parents[current]
+            ancestors.insert(0, {"type": "folder", "id": current, "name": "All Files" if current == "0" else current})
+        return {
+            "type": "folder",
+            "id": folder_id,
+            "name": "All Files" if folder_id == "0" else folder_id,
+            "parent": ancestors[-1] if ancestors else None,
+            "path_collection": {"total_count": len(ancestors), "entries": ancestors},
+            # the first page of children, as box sends it
+            "item_collection": {
+                "total_count": len(entries),
+                "entries": entries[:ITEM_COLLECTION_LIMIT],
+                "offset": 0,
+                "limit": ITEM_COLLECTION_LIMIT,
+            },
+        }
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """handles the ai/ask request and the oauth2 token refresh"""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path.startswith("/oauth2/token"):
+            form = urllib.parse.parse_qs(body.decode("utf-8"))
+            self.server.token_requests.append(form)
+            # a slow refresh makes concurrent callers overlap
+            time.sleep(0.05)
+            count = len(self.server.token_requests)
+            self._send_json(
+                200,
+                {
+                    "access_token": f"access_{count}",
+                    "refresh_token": f"refresh_{count}",
+                    "expires_in": 3600,
+                    "token_type": "bearer",
+                },
+            )
+            return
+
+        request_json = json.loads(body)
+        if self.server.record_calls:
+            self.server.requests.append(request_json)
+            self.server.request_headers.append(dict(self.headers))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.failures:
+            status, headers = self.server.failures.pop(0)
+            self._send_json(status, {"type": "error", "status": status}, headers)
+            return
+
+        if request_json["prompt"] == "bad request":
+            self._send_json(400, {"type": "error", "status": 400, "code": "bad_request"})
+            return
+
+        if self.server.answer_chunks is not None:
+            chunks = list(self.server.answer_chunks)
+        else:
+            words = f"answer to {request_json['prompt']}".split(" ")
+            chunks = [word if index == 0 else f" {word}" for index, word in enumerate(words)]
+        answer = "".join(chunks)
+
+        if request_json.get("config", {}).get("is_streamed"):
+            lines = []
+            for index, chunk in enumerate(chunks):
+                frame = {"answer": chunk, "created_at": STUB_CREATED_AT}
+                if index == len(chunks) - 1:
+                    frame["completion_reason"] = "done"
+                lines.append(json.dumps(frame))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for line in lines:
+                    data = f"{line}\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                    if self.server.chunk_delay:
+                        time.sleep(self.server.chunk_delay)
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # the client closed the stream
+                self.close_connection = True
+            return
+
+        self._send_json(200, {"answer": answer, "created_at": STUB_CREATED_AT, "completion_reason": "done"})
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """starts the stub on a free local port, its attributes configure and record the calls"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AIStubHandler)
+    server.daemon_threads = True
+    # False keeps the memory flat over long benchmark runs, the lists below stay empty
+    server.record_calls = True
+    server.requests = []
+    server.request_headers = []
+    server.gets = []
+    # folder id -> list of item entries
+    server.folders = {}
+    server.events = []
+    server.token_requests = []
+    server.etags = {}
+    # file id -> name and content bytes, for GET /files/:id/content
+    server.file_names = {}
+    server.contents = {}
+    server.downloads = []
+    # (status, headers) answered, in order, before the next successful ai/ask
+    server.failures = []
+    # seconds before answering ai/ask
+    server.latency = 0
+    # seconds between two streamed chunks
+    server.chunk_delay = 0
+    # answer chunks sent instead of the words of "answer to <prompt>"
+    server.answer_chunks = None
+    # seconds before answering GET /files/:id
+    server.etag_latency = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    return server
+
+
+def stop_stub_server(server: ThreadingHTTPServer) -> None:
+    server.shutdown()
+    server.server_close()
+
+
+def make_stub_client(server: ThreadingHTTPServer) -> Client:
+    """boxsdk client pointing to the stub"""
+    oauth = OAuth2(client_id="stub_client_id", client_secret="stub_client_secret", access_token="stub_access_token")
+    client = Client(oauth)
+    client.session.api_config.BASE_API_URL = f"http://127.0.0.1:{server.server_port}"
+    return client
@@ -0,0 +1,116 @@
+""" check the headless batch runner against the local ai stub"""
+
+import json
+
+from app.batch_qa import iter_files, load_prompts, read_checkpoint, run_batch
+from app.box_ai import AI, TextGenMode
+
+
+def _read(path) -> list:
+    with open(path, "r", encoding="UTF-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_load_prompts(tmp_path):
+    """blank lines and comments are skipped"""
+    path = tmp_path / "prompts.txt"
+    path.write_text("# questions\nsummarize\n\n  who signed?  \n", encoding="UTF-8")
+
+    assert load_prompts(str(path)) == ["summarize", "who signed?"]
+
+
+def test_run_batch_over_a_folder(stub_client, ai_stub, tmp_path):
+    """every prompt is asked about every file of the tree"""
+    ai_stub.folders = {
+        "0": [{"type": "folder", "id": "1", "name": "a"}, {"type": "file", "id": "10", "name": "x.pdf"}],
+        "1": [{"type": "file", "id": "11", "name": "y.pdf"}],
+    }
+    output = tmp_path / "results.jsonl"
+
+    stats = run_batch(AI(stub_client), iter_files(stub_client, folder_id="0"), ["one", "two"], str(output))
+
+    assert stats == {"answered": 4, "failed": 0, "skipped": 0, "pending": 0}
+    results = _read(output)
+    assert sorted((result["file_id"], result["prompt"]) for result in results) == [
+        ("10", "one"),
+        ("10", "two"),
+        ("11", "one"),
+        ("11", "two"),
+    ]
+    assert {result["file_name"] for result in results} == {"x.pdf", "y.pdf"}
+    assert all(result["answer"] == f"answer to {result['prompt']}" for result in results)
+
+
+def test_run_batch_resumes_from_checkpoint(stub_client, ai_stub, tmp_path):
+    """answered questions are not asked again, failed ones and a cut off line are"""
+    output = tmp_path / "results.jsonl"
+    output.write_text(
+        json.dumps({"file_id": "1", "mode": "single_item_qa", "prompt": "one", "error": None})
+        + "\n"
+        + json.dumps({"file_id": "1", "mode": "single_item_qa", "prompt": "two", "error": "BoxAPIException()"})
+        + "\n"
+        + '{"file_id": "2", "pro',
+        encoding="UTF-8",
+    )
+    assert read_checkpoint(str(output)) == {("1", "single_item_qa", "one")}
+
+    stats = run_batch(AI(stub_client), iter_files(stub_client, file_ids=["1", "2"]), ["one", "two"], str(output))
+
+    assert stats == {"answered": 3, "failed": 0, "skipped": 1, "pending": 0}
+    assert len(ai_stub.requests) == 3
+    assert read_checkpoint(str(output)) == {
+        ("1", "single_item_qa", "one"),
+        ("1", "single_item_qa", "two"),
+        ("2", "single_item_qa", "one"),
+        ("2", "single_item_qa", "two"),
+    }
+
+
+def test_checkpoint_is_per_mode(stub_client, ai_stub, tmp_path):
+    """a resumed run in another mode asks every question again"""
+    output = tmp_path / "results.jsonl"
+    files = ["1"]
+
+    run_batch(AI(stub_client), iter_files(stub_client, file_ids=files), ["one"], str(output))
+    stats = run_batch(
+        AI(stub_client), iter_files(stub_client, file_ids=files), ["one"], str(output), mode=TextGenMode.TEXT_GEN
+    )
+
+    assert stats == {"answered": 1, "failed": 0, "skipped": 0, "pending": 0}
+    assert [request["mode"] for request in ai_stub.requests] == ["single_item_qa", "text_gen"]
+
+
+def test_run_batch_text_gen(stub_client, ai_stub, tmp_path):
+    """text_gen jobs go to the text_gen mode, failures are recorded"""
+    output = tmp_path / "results.jsonl"
+
+    stats = run_batch(
+        AI(stub_client),
+        iter_files(stub_client, file_ids=["1"]),
+        ["hello", "bad request"],
+        str(output),
+        mode=TextGenMode.TEXT_GEN,
+    )
+
+    assert stats == {"answered": 1, "failed": 1, "skipped": 0, "pending": 0}
+    assert {request["mode"] for request in ai_stub.requests} == {"text_gen"}
+    failed = [result for result in _read(output) if result["error"]]
+    assert [result["prompt"] for result in failed] == ["bad request"]
+
+
+def test_run_batch_timeout_leaves_questions_pending(stub_client, ai_stub, tmp_path):
+    """questions unanswered at the timeout are not written, the next run asks them"""
+    output = tmp_path / "results.jsonl"
+    ai_stub.latency = 0.5
+
+    stats = run_batch(
+        AI(stub_client), iter_files(stub_client, file_ids=["1", "2"]), ["one"], str(output), max_workers=2, timeout=0.1
+    )
+
+    assert stats == {"answered": 0, "failed": 0, "skipped": 0, "pending": 2}
+    assert _read(output) == []
+    ai_stub.latency = 0
+
+    stats = run_batch(AI(stub_client), iter_files(stub_client, file_ids=["1", "2"]), ["one"], str(output))
+
+    assert stats == {"answered": 2, "failed": 0, "skipped": 0, "pending": 0}
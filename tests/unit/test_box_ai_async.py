@@ -0,0 +1,92 @@
+""" check the asyncio ai client against the local ai stub"""
+
+import asyncio
+
+import pytest
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_async import AsyncAI
+from app.box_ai_cache import LRUAnswerCache
+
+
+def test_ask_item_concurrently(stub_client, ai_stub):
+    """questions run concurrently and answers keep their prompts"""
+
+    async def ask_all():
+        async with AsyncAI(stub_client, max_concurrency=4) as box_ai:
+            return await asyncio.gather(
+                *[box_ai.ask_item(QAMode.SINGLE_ITEM_QA, f"question {i}", [AIItem("123", "file")]) for i in range(10)]
+            )
+
+    answers = asyncio.run(ask_all())
+
+    assert [answer.prompt for answer in answers] == [f"question {i}" for i in range(10)]
+    assert answers[3].answer == "answer to question 3"
+    assert len(ai_stub.requests) == 10
+    assert ai_stub.requests[0]["config"] == {"is_streamed": False}
+
+
+def test_ask_text_gen_streamed(stub_client, ai_stub):
+    """streamed chunks are yielded as they are read"""
+
+    async def ask_streamed():
+        async with AsyncAI(stub_client, max_concurrency=2) as box_ai:
+            return [
+                answer
+                async for answer in box_ai.ask_text_gen_streamed(
+                    "hello", AIItem("123", "file", "some content"), dialogue_history=[]
+                )
+            ]
+
+    answers = asyncio.run(ask_streamed())
+
+    assert "".join(answer.answer for answer in answers) == "answer to hello"
+    assert answers[-1].completion_reason == "done"
+    assert ai_stub.requests[0]["mode"] == "text_gen"
+    assert ai_stub.requests[0]["config"] == {"is_streamed": True}
+
+
+def test_cancel_mid_stream(stub_client, ai_stub):
+    """cancelling the task closes the stream once the chunk being read returns"""
+    ai_stub.chunk_delay = 0.2
+
+    async def consume(box_ai, first_chunk):
+        async for _ in box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "a long answer", [AIItem("1", "file")]):
+            first_chunk.set()
+
+    async def cancel_mid_stream():
+        async with AsyncAI(stub_client, max_concurrency=2) as box_ai:
+            first_chunk = asyncio.Event()
+            task = asyncio.create_task(consume(box_ai, first_chunk))
+            await first_chunk.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # the pool is still usable
+            ai_stub.chunk_delay = 0
+            return await box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "after", [AIItem("1", "file")])
+
+    answer = asyncio.run(cancel_mid_stream())
+
+    assert answer.answer == "answer to after"
+
+
+def test_calls_go_through_the_ai(stub_client, ai_stub):
+    """the answer cache of the wrapped AI is used"""
+
+    async def ask_twice():
+        async with AsyncAI(stub_client, ai=AI(stub_client, cache=LRUAnswerCache())) as box_ai:
+            first = await box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "cached?", [AIItem("1", "file", version="1")])
+            second = [
+                delta
+                async for delta in box_ai.ask_item_streamed(
+                    QAMode.SINGLE_ITEM_QA, "cached?", [AIItem("1", "file", version="1")], lean=True
+                )
+            ]
+            return first, second
+
+    first, second = asyncio.run(ask_twice())
+
+    assert first.answer == "answer to cached?"
+    assert "".join(delta.answer for delta in second) == "answer to cached?"
+    assert len(ai_stub.requests) == 1
@@ -0,0 +1,128 @@
+""" check the batch question engine against the local ai stub"""
+
+from boxsdk import BoxAPIException
+
+from app.box_ai import AI, AIItem, AIQuestionMode, QAMode, TextGenMode
+
+
+def _jobs(count: int):
+    return [(QAMode.SINGLE_ITEM_QA, f"question {i}", [AIItem(str(i), "file")]) for i in range(count)]
+
+
+def test_ask_many_in_input_order(stub_client, ai_stub):
+    """results come back in input order with their answers"""
+    box_ai = AI(stub_client)
+
+    results = list(box_ai.ask_many(_jobs(20), max_workers=4))
+
+    assert [result.index for result in results] == list(range(20))
+    assert all(result.ok for result in results)
+    assert results[7].answer.answer == "answer to question 7"
+    assert len(ai_stub.requests) == 20
+
+
+def test_ask_many_reports_errors_per_job(stub_client):
+    """a failing job does not stop the batch"""
+    box_ai = AI(stub_client)
+    jobs = _jobs(3)
+    jobs.insert(1, (QAMode.SINGLE_ITEM_QA, "bad request", [AIItem("1", "file")]))
+
+    results = list(box_ai.ask_many(jobs, max_workers=2, as_completed=True))
+
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    failed = [result for result in results if not result.ok]
+    assert [result.index for result in failed] == [1]
+    assert isinstance(failed[0].error, BoxAPIException)
+    assert failed[0].error.status == 400
+
+
+def test_ask_many_text_gen_jobs(stub_client, ai_stub):
+    """both text_gen modes go to text_gen, a job without a single item fails alone"""
+    item = AIItem("1", "file")
+    jobs = [
+        (TextGenMode.TEXT_GEN, "one", [item]),
+        (AIQuestionMode.TEXT_GEN, "two", [item]),
+        (TextGenMode.TEXT_GEN, "none", []),
+        (AIQuestionMode.TEXT_GEN, "two items", [item, item]),
+    ]
+
+    results = list(AI(stub_client).ask_many(jobs, max_workers=2))
+
+    assert [result.ok for result in results] == [True, True, False, False]
+    assert all(isinstance(result.error, ValueError) for result in results[2:])
+    assert [request["mode"] for request in ai_stub.requests] == ["text_gen", "text_gen"]
+
+
+def test_ask_collection_map_reduce(stub_client, ai_stub):
+    """items are asked in batches, then the partial answers are merged"""
+    box_ai = AI(stub_client)
+    items = [AIItem(str(i), "file") for i in range(60)]
+
+    answer = box_ai.ask_collection("what changed?", items, batch_size=25)
+
+    mapped = [request for request in ai_stub.requests if request["mode"] == "multiple_item_qa"]
+    merged = [request for request in ai_stub.requests if request["mode"] == "text_gen"]
+    assert sorted(len(request["items"]) for request in mapped) == [10, 25, 25]
+    assert len(merged) == 1
+    assert merged[0]["items"][0]["content"].count("answer to what changed?") == 3
+    assert answer.prompt == "what changed?"
+    assert answer.answer.startswith("answer to ")
+
+
+def test_ask_collection_merges_in_rounds(stub_client, ai_stub):
+    """more partial answers than a batch are merged a batch at a time"""
+    box_ai = AI(stub_client)
+
+    box_ai.ask_collection("what?", [AIItem(str(i), "file") for i in range(9)], batch_size=2)
+
+    modes = [request["mode"] for request in ai_stub.requests]
+    # 5 batches -> 3 merges -> 2 merges -> 1 merge
+    assert modes.count("multiple_item_qa") == 5
+    assert modes.count("text_gen") == 6
+
+
+def test_ask_collection_skips_failed_batches(stub_client, ai_stub):
+    """a failed batch is left out of the merge, all failing raises"""
+    box_ai = AI(stub_client)
+    items = [AIItem(str(i), "file") for i in range(6)]
+    ai_stub.failures = [(400, {})]
+
+    box_ai.ask_collection("what?", items, batch_size=2, max_workers=1)
+
+    merged = [request for request in ai_stub.requests if request["mode"] == "text_gen"]
+    assert merged[0]["items"][0]["content"].count("Partial answer") == 2
+
+    try:
+        box_ai.ask_collection("bad request", items, batch_size=2)
+    except BoxAPIException as error:
+        assert error.status == 400
+    else:
+        raise AssertionError("expected the batch error")
+
+
+def test_ask_many_stops_pulling_jobs_at_the_timeout(stub_client, ai_stub):
+    """jobs not submitted before the deadline stay in the iterable"""
+    ai_stub.latency = 0.3
+    box_ai = AI(stub_client)
+    jobs = iter(_jobs(20))
+
+    results = list(box_ai.ask_many(jobs, max_workers=2, timeout=0.1))
+
+    # the initial backlog is reported as timed out, the rest is left
+    assert len(results) == 4
+    assert all(isinstance(result.error, TimeoutError) for result in results)
+    assert len(list(jobs)) == 16
+
+
+def test_ask_many_keeps_a_large_enough_pool(stub_client):
+    """the connection pool is only replaced to grow it"""
+    session = stub_client.session._network_layer._session
+    box_ai = AI(stub_client)
+
+    list(box_ai.ask_many(_jobs(2), max_workers=16))
+    adapter = session.get_adapter("http://")
+    list(box_ai.ask_many(_jobs(2), max_workers=4))
+    list(box_ai.ask_many(_jobs(2), max_workers=16))
+
+    assert session.get_adapter("http://") is adapter
+    assert adapter._pool_maxsize == 16
@@ -0,0 +1,84 @@
+""" check the ai answer cache backends and replay"""
+
+import time
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache, SQLiteAnswerCache, make_cache_key
+
+ANSWER_JSON = {"answer": "42", "created_at": "2023-10-18", "completion_reason": "done", "prompt": "q"}
+
+
+def test_cache_key_depends_on_versions():
+    """the same question on a new file version gets a new key"""
+    question_json = {"prompt": "q", "items": [{"type": "file", "id": "1"}], "mode": "single_item_qa"}
+
+    assert make_cache_key(question_json, ["1"]) == make_cache_key(dict(reversed(question_json.items())), ["1"])
+    assert make_cache_key(question_json, ["1"]) != make_cache_key(question_json, ["2"])
+
+
+def test_lru_cache_eviction_and_ttl():
+    """least recently used and expired answers are evicted"""
+    cache = LRUAnswerCache(max_entries=2, ttl=0.05)
+    cache.set("a", ANSWER_JSON)
+    cache.set("b", ANSWER_JSON)
+    assert cache.get("a") == ANSWER_JSON
+    cache.set("c", ANSWER_JSON)
+
+    assert cache.get("b") is None
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 2, "entries": 1}
+
+
+def test_sqlite_cache_persists(tmp_path):
+    """answers survive a new cache instance and respect max entries"""
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteAnswerCache(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, ANSWER_JSON)
+    cache.close()
+
+    cache = SQLiteAnswerCache(path, max_entries=2)
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == ANSWER_JSON
+    cache.close()
+
+
+def test_ai_replays_cached_answers(stub_client, ai_stub):
+    """unchanged files are answered from the cache, streamed or not"""
+    box_ai = AI(stub_client, cache=LRUAnswerCache())
+    items = [AIItem("123", "file")]
+
+    first = box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "what?", items)
+    streamed = list(box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "what?", items))
+
+    assert len(ai_stub.requests) == 1
+    assert [chunk.answer for chunk in streamed] == [first.answer]
+    assert streamed[0].completion_reason == "done"
+
+    ai_stub.etags["123"] = "1"
+    box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "what?", items)
+    assert len(ai_stub.requests) == 2
+
+    streamed = list(box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "new?", items))
+    again = box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "new?", items)
+    assert len(ai_stub.requests) == 3
+    assert again.answer == "".join(chunk.answer for chunk in streamed)
+
+
+def test_etags_are_reused_within_their_ttl(stub_client, ai_stub):
+    """cached answers cost no etag lookup while the etag is fresh"""
+    box_ai = AI(stub_client, cache=LRUAnswerCache(), etag_ttl=0.2)
+    items = [AIItem("123", "file")]
+
+    for _ in range(3):
+        box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "what?", items)
+
+    assert len([get for get in ai_stub.gets if get.startswith("/files/123")]) == 1
+    assert len(ai_stub.requests) == 1
+
+    ai_stub.etags["123"] = "1"
+    time.sleep(0.25)
+    box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "what?", items)
+    assert len(ai_stub.requests) == 2
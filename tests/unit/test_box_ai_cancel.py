@@ -0,0 +1,92 @@
+""" check the cancellation and deadlines of the ai calls"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache
+from app.box_ai_cancel import AICancelledError, AIDeadlineExceeded, CancelToken
+
+ITEMS = [AIItem("123", "file")]
+
+
+def test_cancelled_token_sends_nothing(stub_client, ai_stub):
+    """a call with a cancelled token fails before the request"""
+    cancel_token = CancelToken()
+    cancel_token.cancel()
+
+    with pytest.raises(AICancelledError):
+        AI(stub_client).ask_item(QAMode.SINGLE_ITEM_QA, "hello", ITEMS, cancel_token=cancel_token)
+    assert not ai_stub.requests
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_cancel_aborts_a_blocked_stream(stub_client, ai_stub, lean):
+    """cancelling from another thread interrupts the read in progress"""
+    ai_stub.chunk_delay = 1
+    box_ai = AI(stub_client)
+    cancel_token = CancelToken()
+
+    stream = box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "hello", ITEMS, lean=lean, cancel_token=cancel_token)
+    assert next(stream).answer == "answer"
+
+    timer = threading.Timer(0.1, cancel_token.cancel)
+    timer.start()
+    started = time.monotonic()
+    with pytest.raises(AICancelledError):
+        next(stream)
+    assert time.monotonic() - started < 0.8
+
+    # the aborted connection does not break the next call
+    ai_stub.chunk_delay = 0
+    assert box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "again", ITEMS).answer == "answer to again"
+
+
+@pytest.mark.parametrize("phase", ["etag", "answer"])
+def test_cancel_is_prompt_while_waiting(stub_client, ai_stub, phase):
+    """a call waiting on the etag lookup or on its answer is given up as soon as it is cancelled"""
+    if phase == "etag":
+        ai_stub.etag_latency = 1.5
+    else:
+        ai_stub.latency = 1.5
+    box_ai = AI(stub_client, cache=LRUAnswerCache())
+    cancel_token = CancelToken()
+
+    timer = threading.Timer(0.1, cancel_token.cancel)
+    timer.start()
+    started = time.monotonic()
+    with pytest.raises(AICancelledError):
+        box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "hello", ITEMS, cancel_token=cancel_token)
+    assert time.monotonic() - started < 0.8
+
+    ai_stub.etag_latency = ai_stub.latency = 0
+    assert box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "again", ITEMS).answer == "answer to again"
+
+
+def test_stream_deadline(stub_client, ai_stub):
+    """a stream still running at its deadline is aborted"""
+    ai_stub.chunk_delay = 1
+    started = time.monotonic()
+
+    with pytest.raises(AIDeadlineExceeded):
+        list(AI(stub_client).ask_item_streamed(QAMode.SINGLE_ITEM_QA, "hello", ITEMS, lean=True, timeout=0.3))
+    assert time.monotonic() - started < 0.9
+
+
+def test_deadline_bounds_the_response_wait(stub_client, ai_stub):
+    """a slow answer past the deadline raises AIDeadlineExceeded"""
+    ai_stub.latency = 1
+
+    with pytest.raises(AIDeadlineExceeded):
+        AI(stub_client).ask_item(QAMode.SINGLE_ITEM_QA, "hello", ITEMS, timeout=0.2)
+
+
+def test_read_timeout(stub_client, ai_stub):
+    """the read timeout of the client applies to every call"""
+    ai_stub.latency = 1
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        AI(stub_client, read_timeout=0.2).ask_item(QAMode.SINGLE_ITEM_QA, "hello", ITEMS)
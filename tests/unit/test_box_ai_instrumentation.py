@@ -0,0 +1,123 @@
+""" check the ai call timings"""
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache
+from app.box_ai_instrumentation import CallbackInstrumentation, OpenTelemetryInstrumentation
+from app.box_ai_rate_limit import RateLimiter
+
+
+def test_timings_of_non_streamed_call(stub_client):
+    """each point of the call is reached in order"""
+    recorded = []
+    box_ai = AI(stub_client, instrumentation=CallbackInstrumentation(recorded.append))
+
+    box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "timed?", [AIItem("1", "file")])
+
+    assert len(recorded) == 1
+    timings = recorded[0]
+    points = [
+        timings.serialized_at,
+        timings.dispatched_at,
+        timings.request_sent_at,
+        timings.first_byte_at,
+        timings.first_chunk_at,
+    ]
+    assert None not in points
+    assert points == sorted(points)
+    assert timings.ended_at >= timings.last_chunk_at
+    assert timings.bytes_received > 0
+    assert timings.attempts == 1
+    assert timings.to_json()["mode"] == "single_item_qa"
+
+
+def test_phases_are_measured_at_their_boundaries(stub_client, ai_stub):
+    """the etag lookup, the queueing and the server time land in their own phase"""
+    ai_stub.latency = 0.2
+    recorded = []
+    limiter = RateLimiter()
+    box_ai = AI(
+        stub_client,
+        cache=LRUAnswerCache(),
+        rate_limiter=limiter,
+        instrumentation=CallbackInstrumentation(recorded.append),
+    )
+
+    box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "phases?", [AIItem("1", "file")])
+
+    timings = recorded[0]
+    # the etag lookup happens before the cache check, not in the serialization
+    assert timings.cache_checked_at <= timings.serialized_at
+    assert timings.serialized_at - timings.cache_checked_at < 0.1
+    # the server latency is between the request and the headers, the body read is not
+    assert timings.first_byte_at - timings.request_sent_at >= 0.2
+    assert timings.ended_at - timings.first_byte_at < 0.2
+    assert timings.request_sent_at >= timings.dispatched_at
+
+
+def test_timings_of_lean_stream(stub_client):
+    """chunks and bytes are counted, abandoned streams still report"""
+    recorded = []
+    box_ai = AI(stub_client, instrumentation=CallbackInstrumentation(recorded.append))
+    items = [AIItem("1", "file")]
+
+    list(box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "timed?", items, lean=True))
+    deltas = box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "abandoned?", items, lean=True)
+    next(deltas)
+    deltas.close()
+
+    assert recorded[0].chunks_received == 3
+    assert recorded[0].first_chunk_at <= recorded[0].last_chunk_at
+    assert recorded[0].bytes_received > 0
+    assert recorded[1].chunks_received == 1
+    assert recorded[1].error is None
+
+
+class _Span:
+    def __init__(self, name, start_time):
+        self.name = name
+        self.start_time = start_time
+        self.events = []
+        self.attributes = {}
+        self.end_time = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, timestamp):
+        self.events.append((name, timestamp))
+
+    def record_exception(self, exception):
+        self.events.append(("exception", exception))
+
+    def end(self, end_time):
+        self.end_time = end_time
+
+
+class _Tracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time):
+        span = _Span(name, start_time)
+        self.spans.append(span)
+        return span
+
+
+def test_open_telemetry_spans(stub_client):
+    """a span with an event per point reached is recorded"""
+    tracer = _Tracer()
+    box_ai = AI(stub_client, instrumentation=OpenTelemetryInstrumentation(tracer))
+
+    list(box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "traced?", [AIItem("1", "file")]))
+
+    span = tracer.spans[0]
+    assert [name for name, _ in span.events] == [
+        "serialized",
+        "dispatched",
+        "request_sent",
+        "first_byte",
+        "first_chunk",
+        "last_chunk",
+    ]
+    assert span.start_time <= span.events[0][1] <= span.end_time
+    assert span.attributes["box_ai.chunks_received"] == 3
@@ -0,0 +1,98 @@
+""" check the box ai models and their serialization"""
+
+from datetime import datetime, timedelta, timezone
+import json
+
+import pytest
+
+from app import box_ai_json
+from app.box_ai import AI, AIAnswer, AIItem, AIQuestion, AIQuestionMode, TextGenMode
+from app.box_ai_cache import SQLiteAnswerCache
+from app.dialogue_history import DialogueHistory
+
+ITEM = AIItem("123", "file", "some content")
+
+
+def _answer(index: int) -> AIAnswer:
+    return AIAnswer(f"answer {index}", "2023-10-18T10:00:00-07:00", "done", f"question {index}")
+
+
+def test_models_have_no_instance_dict():
+    """the models are slotted"""
+    for model in (ITEM, _answer(0), AIQuestion("hello", [ITEM])):
+        assert not hasattr(model, "__dict__")
+        with pytest.raises(AttributeError):
+            model.unknown = 1
+
+
+def test_dialogue_history_defaults_are_not_shared():
+    """each question gets its own empty, immutable history"""
+    first = AIQuestion("one", [ITEM])
+    second = AIQuestion("two", [ITEM])
+    history = [_answer(0)]
+    third = AIQuestion("three", [ITEM], dialogue_history=history)
+    history.append(_answer(1))
+
+    assert first.dialogue_history == () and second.dialogue_history == ()
+    assert len(third.dialogue_history) == 1
+    assert isinstance(third.items, tuple)
+
+
+def test_dialogue_history_is_snapshotted():
+    """turns appended after the question is built are not sent with it"""
+    history = DialogueHistory()
+    history.append(_answer(0))
+    question = AIQuestion("hello", [ITEM], AIQuestionMode.TEXT_GEN, dialogue_history=history)
+    history.append(_answer(1))
+
+    assert isinstance(question.dialogue_history, tuple) and len(question.dialogue_history) == 1
+    assert len(question.to_json()["dialogue_history"]) == 1
+    assert len(json.loads(question.to_json_str())["dialogue_history"]) == 1
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_datetimes_serialize_the_same_with_or_without_orjson(use_orjson, monkeypatch, tmp_path):
+    """datetimes are ISO 8601 in the request body, the cache key and the sqlite cache"""
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(box_ai_json, "orjson", None)
+    created_at = datetime(2023, 10, 18, 10, 0, tzinfo=timezone(timedelta(hours=-7)))
+    answer = AIAnswer("answer", created_at, "done", "question")
+
+    body = json.loads(AIQuestion("hello", [ITEM], dialogue_history=[answer]).to_json_str())
+    cache = SQLiteAnswerCache(str(tmp_path / "cache.db"))
+    cache.set("key", answer.to_json())
+
+    assert body["dialogue_history"][0]["created_at"] == "2023-10-18T10:00:00-07:00"
+    assert cache.get("key")["created_at"] == "2023-10-18T10:00:00-07:00"
+    cache.close()
+    assert box_ai_json.dumps_json({"b": created_at, "a": 1}, sort_keys=True) == (
+        '{"a":1,"b":"2023-10-18T10:00:00-07:00"}'
+    )
+
+
+@pytest.mark.parametrize("history_type", [list, DialogueHistory])
+def test_to_json_str_matches_to_json(history_type):
+    """the single pass request body carries the same question as to_json plus the config"""
+    if history_type is list:
+        history = [_answer(i) for i in range(5)]
+    else:
+        history = DialogueHistory()
+        for i in range(5):
+            history.append(_answer(i))
+    question = AIQuestion("hello", [ITEM], AIQuestionMode.TEXT_GEN, dialogue_history=history)
+
+    expected = question.to_json()
+    expected["config"] = {"is_streamed": True}
+
+    assert json.loads(question.to_json_str(is_streamed=True)) == expected
+
+
+def test_ask_text_gen_without_history(stub_client, ai_stub):
+    """the history is optional"""
+    answer = AI(stub_client).ask_text_gen("hello", ITEM)
+
+    assert answer.answer == "answer to hello"
+    assert ai_stub.requests[0]["mode"] == TextGenMode.TEXT_GEN.value
+    assert ai_stub.requests[0]["dialogue_history"] == []
@@ -0,0 +1,71 @@
+""" check the ai rate limiter and retry scheduling"""
+
+import time
+
+import pytest
+from boxsdk import BoxAPIException
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_rate_limit import RateLimiter, RetryPolicy, TokenBucket, parse_retry_after
+
+
+def test_token_bucket_limits_rate():
+    """after the burst, tokens come at the bucket rate"""
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_adapts_per_mode():
+    """throttling halves the mode rate, successes bring it back"""
+    limiter = RateLimiter(rate=20, budgets={"text_gen": 4}, min_rate=1, recovery=0.25)
+
+    limiter.on_throttle("text_gen")
+    assert limiter.rate("text_gen") == 2
+    assert limiter.rate() == 10
+    assert limiter.rate("single_item_qa") == 10
+
+    limiter.on_success("text_gen")
+    limiter.on_success("text_gen")
+    assert limiter.rate("text_gen") == 4
+
+
+def test_retry_delay():
+    """retry after is honored and backoff stays under the cap"""
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=4)
+
+    assert 2 <= policy.get_delay(0, retry_after=2) <= 2.1
+    assert all(policy.get_delay(5) <= 4 for _ in range(20))
+    assert policy.should_retry(429, 1)
+    assert not policy.should_retry(429, 2)
+    assert not policy.should_retry(404, 0)
+    assert parse_retry_after({"Retry-After": "3"}) == 3
+    assert parse_retry_after({}) is None
+
+
+def test_ai_retries_throttled_requests(stub_client, ai_stub):
+    """429 and 5xx are retried and slow the limiter down"""
+    limiter = RateLimiter(rate=100)
+    box_ai = AI(stub_client, rate_limiter=limiter, retry_policy=RetryPolicy(base_delay=0.01))
+    ai_stub.failures = [(429, {"Retry-After": "0"}), (503, {})]
+
+    answer = box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "busy?", [AIItem("1", "file")])
+
+    assert answer.answer == "answer to busy?"
+    assert len(ai_stub.requests) == 3
+    assert limiter.rate() < 100
+
+
+def test_ai_gives_up_after_max_attempts(stub_client, ai_stub):
+    """the last error is raised once attempts run out"""
+    box_ai = AI(stub_client, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+    ai_stub.failures = [(500, {}), (500, {}), (500, {})]
+
+    with pytest.raises(BoxAPIException) as error:
+        box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "down?", [AIItem("1", "file")])
+
+    assert error.value.status == 500
+    assert len(ai_stub.requests) == 2
@@ -0,0 +1,62 @@
+""" check the lean streaming parser"""
+
+from app.box_ai import AI, AIAnswer, AIItem, QAMode
+from app.box_ai_stream import StreamParser, iter_answer_deltas
+
+
+def test_parser_handles_split_frames():
+    """frames split across network chunks are decoded once complete"""
+    parser = StreamParser()
+
+    assert not list(parser.feed(b'{"answer": "He'))
+    assert list(parser.feed(b'llo"}\n{"answer": " world", ')) == [{"answer": "Hello"}]
+    assert list(parser.feed(b'"completion_reason": "done"}')) == []
+    assert list(parser.close()) == [{"answer": " world", "completion_reason": "done"}]
+
+
+def test_parser_fed_byte_by_byte():
+    """a long frame fed one byte at a time is decoded once, like a single chunk"""
+    body = b'{"answer": "' + b"x" * 5000 + b'"}\n{"answer": "y"}\n'
+    parser = StreamParser()
+
+    frames = [frame for index in range(len(body)) for frame in parser.feed(body[index : index + 1])]
+
+    assert frames == [{"answer": "x" * 5000}, {"answer": "y"}]
+    assert list(parser.close()) == []
+
+
+def test_parser_handles_server_sent_events():
+    """data lines are decoded, other sse fields are skipped"""
+    body = b'event: message\r\ndata: {"answer": "a"}\r\n\r\n: keep alive\ndata: {"answer": "b"}\n\ndata: [DONE]\n'
+
+    deltas = list(iter_answer_deltas([body[:7], body[7:30], body[30:]]))
+
+    assert [delta.answer for delta in deltas] == ["a", "b"]
+
+
+def test_only_rich_frames_are_translated():
+    """plain answer frames skip the translator"""
+    translated = []
+
+    def translate(frame):
+        translated.append(frame)
+        return frame
+
+    body = b'{"answer": "a"}\n{"answer": "b", "type": "ai_answer"}\n'
+    deltas = list(iter_answer_deltas([body], translate))
+
+    assert [delta.answer for delta in deltas] == ["a", "b"]
+    assert translated == [{"answer": "b", "type": "ai_answer"}]
+
+
+def test_ai_lean_stream(stub_client, ai_stub):
+    """lean streaming yields deltas that accumulate into the answer"""
+    box_ai = AI(stub_client)
+
+    deltas = list(box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "lean?", [AIItem("1", "file")], lean=True))
+    answer = AIAnswer.from_deltas(deltas, prompt="lean?")
+
+    assert len(deltas) == 3
+    assert answer.answer == "answer to lean?"
+    assert answer.completion_reason == "done"
+    assert answer.prompt == "lean?"
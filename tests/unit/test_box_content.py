@@ -0,0 +1,74 @@
+""" check the folder crawler against the local stub"""
+
+from datetime import datetime
+
+from app.box_content import CrawlFilter, crawl_folder, get_folder_view
+
+
+def _file(file_id: str, name: str, size: int = 10, modified_at: str = "2023-10-01T10:00:00-07:00"):
+    return {"type": "file", "id": file_id, "name": name, "size": size, "modified_at": modified_at}
+
+
+def _folder(folder_id: str, name: str):
+    return {"type": "folder", "id": folder_id, "name": name}
+
+
+def test_crawl_folder_tree(stub_client, ai_stub):
+    """every file of the tree is yielded, folders are paged"""
+    ai_stub.folders = {
+        "0": [_folder("1", "a"), _file("10", "root.pdf")] + [_file(f"2{i}", f"{i}.txt") for i in range(5)],
+        "1": [_folder("2", "b"), _file("11", "a.docx")],
+        "2": [_file("12", "b.pdf")],
+    }
+
+    files = list(crawl_folder(stub_client, "0", max_workers=3, page_size=2))
+
+    assert sorted(item.id for item in files) == ["10", "11", "12", "20", "21", "22", "23", "24"]
+    assert any("usemarker=True" in get and "fields=" in get for get in ai_stub.gets)
+
+
+def test_crawl_filters_files(stub_client, ai_stub):
+    """extension, size and modified date filters are applied"""
+    ai_stub.folders = {
+        "0": [
+            _file("1", "keep.PDF", size=100, modified_at="2023-10-10T00:00:00+00:00"),
+            _file("2", "small.pdf", size=1, modified_at="2023-10-10T00:00:00+00:00"),
+            _file("3", "old.pdf", size=100, modified_at="2023-01-01T00:00:00+00:00"),
+            _file("4", "other.txt", size=100, modified_at="2023-10-10T00:00:00+00:00"),
+        ]
+    }
+    item_filter = CrawlFilter(extensions=[".pdf"], min_size=10, modified_after=datetime(2023, 6, 1))
+
+    files = list(crawl_folder(stub_client, "0", item_filter=item_filter))
+
+    assert [item.id for item in files] == ["1"]
+
+
+def test_folder_view_in_one_request(stub_client, ai_stub):
+    """children, parent and ancestry come with the folder, restricted to the view fields"""
+    ai_stub.folders = {
+        "0": [_folder("1", "a")],
+        "1": [_folder("2", "b")],
+        "2": [_file("12", "b.pdf"), {"type": "web_link", "id": "13", "name": "link"}, _folder("3", "c")],
+    }
+
+    view = get_folder_view(stub_client, "2")
+
+    assert [(item.type, item.id, item.name) for item in view.items] == [("file", "12", "b.pdf"), ("folder", "3", "c")]
+    assert view.parent_id == "1"
+    assert view.path == "All Files/1/2"
+    assert view.sub_folder_ids == ["3"]
+    assert len(ai_stub.gets) == 1
+    assert "fields=id%2Ctype%2Cname%2Cparent%2Cpath_collection%2Citem_collection" in ai_stub.gets[0]
+    assert get_folder_view(stub_client, "0").parent_id == "0"
+
+
+def test_folder_view_pages_large_folders(stub_client, ai_stub, monkeypatch):
+    """children beyond the item collection are listed"""
+    monkeypatch.setattr("tests.stub_server.ITEM_COLLECTION_LIMIT", 2)
+    ai_stub.folders = {"0": [_file(str(i), f"{i}.txt") for i in range(5)]}
+
+    view = get_folder_view(stub_client, "0", page_size=2)
+
+    assert [item.id for item in view.items] == ["0", "1", "2", "3", "4"]
+    assert "offset=2" in ai_stub.gets[1]
@@ -0,0 +1,71 @@
+""" check the service account client factory"""
+
+import pytest
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache
+from app.box_service_client import ServiceClientFactory
+
+
+@pytest.fixture
+def factory(ai_stub) -> ServiceClientFactory:
+    """ccg factory pointing to the local stub"""
+    factory = ServiceClientFactory.from_ccg("stub_client_id", "stub_client_secret", enterprise_id="42")
+    stub_url = f"http://127.0.0.1:{ai_stub.server_port}"
+    factory.auth.api_config.OAUTH2_API_URL = f"{stub_url}/oauth2"
+    factory.client.session.api_config.BASE_API_URL = stub_url
+    return factory
+
+
+def test_warm_up_fetches_the_service_token_once(factory, ai_stub):
+    """the token is fetched at start up and reused by every client"""
+    assert factory.warm_up() == "access_1"
+    assert factory.warm_up() == "access_1"
+    assert ai_stub.token_requests[0]["box_subject_type"] == ["enterprise"]
+    assert ai_stub.token_requests[0]["box_subject_id"] == ["42"]
+
+    AI(factory.get_client("7")).ask_item(QAMode.SINGLE_ITEM_QA, "hello", [AIItem("123", "file")])
+    assert len(ai_stub.token_requests) == 1
+
+
+def test_user_clients_are_cached_and_share_the_session(factory, ai_stub):
+    """as-user clients are reused and send the As-User header"""
+    factory.warm_up()
+    client = factory.get_client("7")
+    assert factory.get_client("7") is client
+    assert factory.get_client("8") is not client
+    assert factory.get_client() is factory.client
+    assert client.session._network_layer is factory.client.session._network_layer
+
+    AI(client).ask_item(QAMode.SINGLE_ITEM_QA, "hello", [AIItem("123", "file")])
+    AI(factory.get_client()).ask_item(QAMode.SINGLE_ITEM_QA, "hello", [AIItem("123", "file")])
+    assert ai_stub.request_headers[0]["As-User"] == "7"
+    assert "As-User" not in ai_stub.request_headers[1]
+    assert ai_stub.request_headers[0]["Authorization"] == "Bearer access_1"
+
+    factory.forget_user("7")
+    assert factory.get_client("7") is not client
+
+
+def test_user_clients_are_bounded(factory):
+    """the least recently used user client is dropped past max_user_clients"""
+    factory.max_user_clients = 2
+    first = factory.get_client("1")
+    second = factory.get_client("2")
+    factory.get_client("1")
+    factory.get_client("3")
+
+    assert factory.get_client("1") is first
+    assert factory.get_client("2") is not second
+
+
+def test_users_do_not_share_cached_answers(factory, ai_stub):
+    """a cache shared by two as-user clients answers each user from their own call"""
+    factory.warm_up()
+    cache = LRUAnswerCache()
+    items = [AIItem("123", "file", version="1")]
+
+    for user_id in ("7", "8", "7"):
+        AI(factory.get_client(user_id), cache=cache).ask_item(QAMode.SINGLE_ITEM_QA, "hello", items)
+
+    assert [headers["As-User"] for headers in ai_stub.request_headers] == ["7", "8"]
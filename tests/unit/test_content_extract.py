@@ -0,0 +1,94 @@
+""" check the content extraction pipeline against the local stub"""
+
+import io
+import zipfile
+
+import pytest
+
+from app.content_extract import (
+    ContentExtractor,
+    ExtractionCache,
+    UnsupportedContentError,
+    extract_csv,
+    extract_docx,
+    normalize_text,
+    segment_text,
+)
+
+DOCUMENT_XML = (
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    "<w:p><w:r><w:t>First</w:t></w:r><w:r><w:tab/><w:t>paragraph</w:t></w:r></w:p>"
+    "<w:p><w:r><w:t>Second paragraph</w:t></w:r></w:p>"
+    "</w:body></w:document>"
+)
+
+
+def _docx() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", DOCUMENT_XML)
+    return buffer.getvalue()
+
+
+def test_normalize_text():
+    """line ends, spaces, control characters and blank lines are normalized"""
+    assert normalize_text("﻿a  b\r\n\r\n\r\n\r\nc\x00\td  ") == "a b\n\nc d"
+    assert normalize_text("ﬁle") == "file"
+
+
+def test_segment_text_respects_the_size():
+    """paragraphs are kept together when they fit, long ones split at sentences"""
+    text = "Short one.\n\n" + " ".join(f"Sentence {i} is here." for i in range(20)) + "\n\nEnd."
+
+    segments = segment_text(text, max_chars=60)
+
+    assert all(end - start <= 60 for start, end in segments)
+    assert text[slice(*segments[0])].startswith("Short one.\n\nSentence 0")
+    assert text[slice(*segments[-1])].endswith("End.")
+    assert "".join(text[start:end] for start, end in segments).replace(" ", "").replace("\n", "") == text.replace(
+        " ", ""
+    ).replace("\n", "")
+
+
+def test_segment_text_cuts_long_words():
+    """text without any boundary is cut at max_chars"""
+    assert segment_text("x" * 25, max_chars=10) == [(0, 10), (10, 20), (20, 25)]
+
+
+def test_extract_docx_and_csv():
+    """docx paragraphs and csv rows become lines"""
+    assert extract_docx(io.BytesIO(_docx())) == "First\tparagraph\n\nSecond paragraph"
+    assert extract_csv(io.BytesIO(b"name,total\nacme, 12\n\n")) == "name | total\nacme | 12"
+
+
+def test_extract_is_cached_by_version(stub_client, ai_stub, tmp_path):
+    """a file version is downloaded once, a new version is extracted again"""
+    ai_stub.file_names["1"] = "notes.docx"
+    ai_stub.contents["1"] = _docx()
+    ai_stub.etags["1"] = "1"
+    extractor = ContentExtractor(stub_client, ExtractionCache(str(tmp_path)), max_segment_chars=20, chunk_size=16)
+
+    with extractor.extract("1") as extracted:
+        assert extracted.segments == ["First paragraph", "Second paragraph"]
+    with extractor.extract("1") as extracted:
+        assert extracted.text == "First paragraph\n\nSecond paragraph"
+    assert ai_stub.downloads == ["1"]
+
+    ai_stub.etags["1"] = "2"
+    ai_stub.contents["1"] = "Café crème".encode("utf-8")
+    ai_stub.file_names["1"] = "notes.txt"
+    item = extractor.get_ai_item("1", segment=0)
+
+    assert item.optional_document_content == "Café crème"
+    assert item.version == "2"
+    assert ai_stub.downloads == ["1", "1"]
+    # the previous version was removed
+    assert len(list(tmp_path.glob("1_*.txt"))) == 1
+
+
+def test_unsupported_file_type(stub_client, ai_stub, tmp_path):
+    """files without extractor are reported"""
+    extractor = ContentExtractor(stub_client, ExtractionCache(str(tmp_path)))
+
+    with pytest.raises(UnsupportedContentError):
+        extractor.extract("1", version="1", file_name="movie.mp4")
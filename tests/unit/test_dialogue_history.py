@@ -0,0 +1,84 @@
+""" check the token budgeted dialogue history"""
+
+import json
+
+import pytest
+from boxsdk import BoxAPIException
+
+from app.box_ai import AI, AIAnswer, AIItem, AIQuestion, TextGenMode
+from app.dialogue_history import DialogueHistory, KeepFirstLastPolicy, SummarizePolicy
+
+
+def _answer(index: int) -> AIAnswer:
+    # about 10 tokens per turn
+    return AIAnswer(answer=f"answer {index:02d}" + "x" * 20, created_at="2023-10-18", prompt=f"prompt {index:02d}")
+
+
+def test_sliding_window_keeps_budget():
+    """oldest turns are dropped once over budget"""
+    history = DialogueHistory(max_tokens=35)
+    for index in range(10):
+        history.append(_answer(index))
+
+    assert history.tokens <= 35
+    assert [answer.prompt for answer in history] == ["prompt 07", "prompt 08", "prompt 09"]
+
+
+def test_keep_first_and_last():
+    """the opening turn survives compaction"""
+    history = DialogueHistory(max_tokens=45, policy=KeepFirstLastPolicy(last=3))
+    for index in range(10):
+        history.append(_answer(index))
+
+    assert [answer.prompt for answer in history] == ["prompt 00", "prompt 07", "prompt 08", "prompt 09"]
+
+
+def test_question_json_uses_cached_turns():
+    """the question payload matches a plain list history"""
+    answers = [_answer(index) for index in range(3)]
+    history = DialogueHistory()
+    for answer in answers:
+        history.append(answer)
+    item = AIItem("1", "file")
+
+    cached = AIQuestion("q", [item], TextGenMode.TEXT_GEN, dialogue_history=history).to_json()
+    plain = AIQuestion("q", [item], TextGenMode.TEXT_GEN, dialogue_history=answers).to_json()
+
+    assert cached == plain
+    assert json.loads(history.to_json_str()) == plain["dialogue_history"]
+
+
+def test_summarize_older_turns(stub_client, ai_stub):
+    """older turns are replaced by a text_gen summary"""
+    item = AIItem("1", "file", "content")
+    history = DialogueHistory(max_tokens=60, policy=SummarizePolicy(AI(stub_client), item, keep_last=2))
+    for index in range(6):
+        history.append(_answer(index))
+
+    prompts = [answer.prompt for answer in history]
+    assert prompts == ["Summary of the earlier conversation", "prompt 04", "prompt 05"]
+    assert ai_stub.requests[0]["mode"] == "text_gen"
+    assert len(ai_stub.requests[0]["dialogue_history"]) == 4
+
+
+def test_failed_compaction_leaves_the_history_unchanged(stub_client, ai_stub):
+    """a failing summary call keeps the serialized history in step with its turns"""
+    item = AIItem("1", "file", "content")
+    history = DialogueHistory(max_tokens=60, policy=SummarizePolicy(AI(stub_client), item, keep_last=2))
+    for index in range(5):
+        history.append(_answer(index))
+    assert json.loads(history.to_json_str()) == history.to_json()
+    ai_stub.failures.append((400, {}))
+
+    with pytest.raises(BoxAPIException):
+        history.append(_answer(5))
+
+    assert len(history) == 5
+    assert json.loads(history.to_json_str()) == history.to_json()
+
+
+@pytest.mark.parametrize("policy", [lambda: KeepFirstLastPolicy(last=0), lambda: SummarizePolicy(None, None, 0)])
+def test_policies_keep_at_least_one_turn(policy):
+    """keeping no recent turn would compact nothing"""
+    with pytest.raises(ValueError):
+        policy()
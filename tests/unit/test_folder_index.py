@@ -0,0 +1,98 @@
+""" check the local folder index and its events sync"""
+
+import json
+import os
+
+from app.folder_index import FolderIndex
+
+EVENTS_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "fixtures", "folder_events.json")
+
+
+def _tree():
+    return {
+        "0": [
+            {"type": "folder", "id": "1", "name": "a"},
+            {"type": "file", "id": "10", "name": "root.pdf", "etag": "0"},
+        ],
+        "1": [
+            {"type": "folder", "id": "2", "name": "b"},
+            {"type": "file", "id": "11", "name": "a.docx", "etag": "0"},
+        ],
+        "2": [{"type": "file", "id": "12", "name": "b.pdf", "etag": "0"}],
+    }
+
+
+def test_folders_are_served_locally(stub_client, ai_stub, tmp_path):
+    """a folder is listed once, then read from the index"""
+    ai_stub.folders = _tree()
+    index = FolderIndex(stub_client, str(tmp_path / "index.db"))
+
+    assert [item.name for item in index.get_items("1")] == ["b", "a.docx"]
+    assert index.get_parent_id("1") == "0"
+    gets = len(ai_stub.gets)
+
+    assert [item.name for item in index.get_items("1")] == ["b", "a.docx"]
+    assert len(ai_stub.gets) == gets
+    index.close()
+
+
+def test_recorded_events_are_applied(stub_client, ai_stub, tmp_path):
+    """uploads, renames, moves and trashes update the index"""
+    ai_stub.folders = _tree()
+    index = FolderIndex(stub_client, str(tmp_path / "index.db"))
+    for folder_id in ("0", "1", "2"):
+        index.get_items(folder_id)
+
+    with open(EVENTS_FIXTURE, "r", encoding="UTF-8") as file:
+        events = json.load(file)
+    applied = index.apply_events(events, stream_position="5")
+
+    assert applied == 4
+    assert index.stream_position == "5"
+    assert [item.name for item in index.get_items("0")] == ["a"]
+    assert [item.name for item in index.get_items("1")] == ["new.pdf", "renamed.docx", "root.pdf"]
+    assert not index.is_synced("2")
+    index.close()
+
+
+def test_sync_from_events_stream(stub_client, ai_stub, tmp_path):
+    """events after the first listing are read from the stream"""
+    ai_stub.folders = _tree()
+    index = FolderIndex(stub_client, str(tmp_path / "index.db"))
+    index.get_items("1")
+
+    with open(EVENTS_FIXTURE, "r", encoding="UTF-8") as file:
+        ai_stub.events.extend(json.load(file)[:1])
+
+    assert index.refresh(force=True) == 1
+    assert index.stream_position == "1"
+    assert [item.name for item in index.get_items("1")] == ["b", "a.docx", "new.pdf"]
+    index.close()
+
+
+def test_sync_reads_past_short_pages(stub_client, ai_stub, tmp_path, monkeypatch):
+    """a short page is not the end of the stream, an empty one is"""
+    ai_stub.folders = _tree()
+    index = FolderIndex(stub_client, str(tmp_path / "index.db"))
+    index.get_items("1")
+    with open(EVENTS_FIXTURE, "r", encoding="UTF-8") as file:
+        upload = json.load(file)[0]
+    pages = [
+        {"entries": [upload], "next_stream_position": 1},
+        {"entries": [], "next_stream_position": 2},
+        {"entries": [upload], "next_stream_position": 3},
+    ]
+    positions = []
+    events = stub_client.events()
+
+    def get_events(limit, stream_position):
+        positions.append(stream_position)
+        return pages.pop(0)
+
+    monkeypatch.setattr(events, "get_events", get_events)
+    monkeypatch.setattr(stub_client, "events", lambda: events)
+
+    assert index.sync_events() == 1
+    assert positions == ["0", 1]
+    assert index.stream_position == "2"
+    index.close()
@@ -0,0 +1,118 @@
+""" check the folder listing cache and its prefetch"""
+
+import time
+
+import pytest
+
+from app.folder_index import FolderIndex
+from app.folder_listing_cache import FolderListingCache
+from app.prompts import refresh_folder
+
+
+def _tree():
+    return {
+        "0": [{"type": "folder", "id": "1", "name": "a"}, {"type": "file", "id": "10", "name": "root.pdf"}],
+        "1": [{"type": "folder", "id": "2", "name": "b"}, {"type": "file", "id": "11", "name": "a.docx"}],
+        "2": [{"type": "file", "id": "12", "name": "b.pdf"}],
+    }
+
+
+def _wait_for(predicate, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_sub_folders_are_prefetched(stub_client, ai_stub):
+    """opening a prefetched folder makes no request"""
+    ai_stub.folders = _tree()
+    with FolderListingCache(stub_client) as cache:
+        root = cache.get("0")
+        assert root.parent_id == "0"
+        cache.prefetch_sub_folders(root)
+        _wait_for(lambda: any(path.startswith("/folders/1?") for path in ai_stub.gets))
+        time.sleep(0.05)
+        gets = len(ai_stub.gets)
+
+        listing = cache.get("1")
+
+        assert [item.name for item in listing.items] == ["b", "a.docx"]
+        assert listing.parent_id == "0"
+        assert len(ai_stub.gets) == gets
+        assert cache.stats()["hits"] == 1
+
+
+def test_folder_opened_directly(stub_client, ai_stub):
+    """a folder is listed with its parent in one request"""
+    ai_stub.folders = _tree()
+    with FolderListingCache(stub_client) as cache:
+        assert cache.get("2").parent_id == "1"
+    assert len(ai_stub.gets) == 1
+
+
+def test_refresh_and_expiry(stub_client, ai_stub):
+    """invalidated and expired listings are fetched again"""
+    ai_stub.folders = _tree()
+    with FolderListingCache(stub_client, ttl=0.2) as cache:
+        cache.get("0")
+        ai_stub.folders["0"].append({"type": "file", "id": "13", "name": "new.txt"})
+        assert len(cache.get("0").items) == 2
+
+        cache.invalidate("0")
+        assert len(cache.get("0").items) == 3
+
+        time.sleep(0.25)
+        cache.get("0")
+        assert cache.stats() == {"hits": 1, "misses": 3, "size": 1}
+
+
+def test_lru_eviction_and_failures(stub_client, ai_stub, monkeypatch):
+    """the least recently used listing is evicted, failures are not cached"""
+    ai_stub.folders = _tree()
+    with FolderListingCache(stub_client, max_entries=2) as cache:
+        cache.get("0")
+        cache.get("1")
+        cache.get("0")
+        cache.get("2")
+        assert cache.stats()["size"] == 2
+        cache.get("0")
+        assert cache.stats()["hits"] == 2
+
+        def fail(client, folder_id):
+            raise ConnectionError(folder_id)
+
+        monkeypatch.setattr("app.folder_listing_cache.get_folder_view", fail)
+        with pytest.raises(ConnectionError):
+            cache.get("3")
+        monkeypatch.undo()
+        assert cache.get("3").items == []
+        assert cache.stats()["misses"] == 5
+
+
+def test_prefetch_is_capped(stub_client, ai_stub):
+    """only the first max_prefetch sub folders are listed ahead"""
+    ai_stub.folders = {"0": [{"type": "folder", "id": str(index), "name": str(index)} for index in range(1, 6)]}
+    with FolderListingCache(stub_client, max_prefetch=2) as cache:
+        cache.prefetch_sub_folders(cache.get("0"))
+        _wait_for(lambda: len(ai_stub.gets) >= 3)
+        time.sleep(0.05)
+
+        assert cache.stats()["size"] == 3
+        assert sorted(path.split("?")[0] for path in ai_stub.gets) == ["/folders/0", "/folders/1", "/folders/2"]
+
+
+def test_refresh_lists_the_folder_again_in_both(stub_client, ai_stub, tmp_path):
+    """with an index and a cache, refresh updates the index and drops the cached listing"""
+    ai_stub.folders = _tree()
+    index = FolderIndex(stub_client, str(tmp_path / "index.db"))
+    with FolderListingCache(stub_client) as cache:
+        index.get_items("2")
+        cache.get("2")
+        ai_stub.folders["2"].append({"type": "file", "id": "13", "name": "new.txt"})
+
+        refresh_folder("2", index, cache)
+
+        assert [item.name for item in index.get_items("2")] == ["b.pdf", "new.txt"]
+        assert len(cache.get("2").items) == 2
+    index.close()
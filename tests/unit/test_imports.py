@@ -0,0 +1,27 @@
+""" check the ai client path stays free of the interactive imports"""
+
+import subprocess
+import sys
+
+from benchmarks.bench_import_time import FORBIDDEN_MODULES, parse_importtime
+
+
+def test_ai_client_import_skips_interactive_modules():
+    """importing the ai client does not load the prompts, the browser flow or the .env reader"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app.box_ai import AI"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    names = {name for name, _, _, _ in parse_importtime(result.stderr)}
+
+    assert "app.box_ai" in names
+    assert not [name for name in names if name.split(".")[0] in FORBIDDEN_MODULES or name in FORBIDDEN_MODULES]
+
+
+def test_get_config_is_memoized():
+    """the configuration is read once"""
+    from app.config import get_config  # pylint: disable=import-outside-toplevel
+
+    assert get_config() is get_config()
@@ -0,0 +1,81 @@
+""" check the speculative answer prefetch against the local ai stub"""
+
+import threading
+import time
+
+import pytest
+
+from app.box_ai import AI, AIItem, QAMode
+from app.box_ai_cache import LRUAnswerCache
+from app.prefetch import AnswerPrefetcher
+from app.singleflight import SingleFlight
+
+
+def test_prefetched_answers_are_cached(stub_client, ai_stub):
+    """the opening questions are answered from the cache"""
+    ai_stub.etags["1"] = "7"
+    box_ai = AI(stub_client, cache=LRUAnswerCache())
+
+    with AnswerPrefetcher(box_ai, ["Summarize", "Key dates"]) as prefetcher:
+        futures = prefetcher.prefetch(AIItem("1", "file"))
+        assert [future.result(5).answer for future in futures] == ["answer to Summarize", "answer to Key dates"]
+
+    answer = box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "Key dates", [AIItem("1", "file")])
+
+    assert answer.answer == "answer to Key dates"
+    assert len(ai_stub.requests) == 2
+
+
+def test_version_is_looked_up_by_the_workers(stub_client, ai_stub, monkeypatch):
+    """prefetch makes no request in the calling thread"""
+    ai_stub.etags["1"] = "7"
+    box_ai = AI(stub_client, cache=LRUAnswerCache(), etag_ttl=30)
+    threads = []
+    get_file_version = box_ai.get_file_version
+
+    def record_thread(file_id, *args):
+        threads.append(threading.current_thread())
+        return get_file_version(file_id, *args)
+
+    monkeypatch.setattr(box_ai, "get_file_version", record_thread)
+
+    with AnswerPrefetcher(box_ai, ["Summarize", "Key dates"]) as prefetcher:
+        [future.result(5) for future in prefetcher.prefetch(AIItem("1", "file"))]
+
+    assert threads and threading.current_thread() not in threads
+    assert [path for path in ai_stub.gets if path.startswith("/files/1")] == ["/files/1?fields=etag"]
+
+
+def test_question_in_flight_is_joined(stub_client, ai_stub):
+    """asking a question being prefetched shares its call"""
+    ai_stub.latency = 0.3
+    box_ai = AI(stub_client, cache=LRUAnswerCache(), single_flight=SingleFlight())
+
+    with AnswerPrefetcher(box_ai, ["Summarize"]) as prefetcher:
+        prefetcher.prefetch(AIItem("1", "file", version="1"))
+        answer = box_ai.ask_item(QAMode.SINGLE_ITEM_QA, "Summarize", [AIItem("1", "file", version="1")])
+
+    assert answer.answer == "answer to Summarize"
+    assert len(ai_stub.requests) == 1
+
+
+def test_a_new_item_drops_pending_prefetches(stub_client, ai_stub):
+    """prefetches of the previous item not started yet are cancelled"""
+    ai_stub.latency = 0.2
+    box_ai = AI(stub_client, cache=LRUAnswerCache())
+
+    with AnswerPrefetcher(box_ai, ["a", "b", "c"], max_workers=1) as prefetcher:
+        first = prefetcher.prefetch(AIItem("1", "file", version="1"))
+        while not first[0].running():
+            time.sleep(0.01)
+        second = prefetcher.prefetch(AIItem("2", "file", version="1"))
+        [future.result(5) for future in second]
+
+    assert [future.cancelled() for future in first] == [False, True, True]
+    assert len(ai_stub.requests) == 4
+
+
+def test_requires_a_cache(stub_client):
+    """prefetching without a cache would waste the answers"""
+    with pytest.raises(ValueError):
+        AnswerPrefetcher(AI(stub_client))
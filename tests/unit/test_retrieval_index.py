@@ -0,0 +1,113 @@
+""" check the local retrieval index"""
+
+import pytest
+
+from app.box_ai import AI
+from app.content_extract import ContentExtractor, ExtractionCache
+from app.retrieval_index import RetrievalIndex, tokenize
+
+
+def _index(path) -> RetrievalIndex:
+    index = RetrievalIndex(str(path))
+    index.add("1", "Quarterly revenue grew by ten percent in the north region.", name="q3-report.docx", version="a")
+    index.add("2", "The onboarding checklist lists laptops and badges.", name="onboarding.md", version="a")
+    index.add("3", "Revenue forecast and revenue targets for next year.", name="forecast.xlsx", version="a")
+    return index
+
+
+def test_tokenize():
+    """words are lowercased, stop words and single letters dropped"""
+    assert tokenize("What is the Q3 revenue, in $?") == ["q3", "revenue"]
+
+
+def test_search_ranks_by_bm25(tmp_path):
+    """the items mentioning the terms most come first"""
+    index = _index(tmp_path / "index.db")
+
+    ranked = index.search("revenue forecast", k=5)
+
+    assert [item_id for item_id, _ in ranked] == ["3", "1"]
+    assert [item.item_id for item in index.select_items("onboarding laptops")] == ["2"]
+    assert index.search("unrelated words") == []
+    index.close()
+
+
+def test_updates_are_incremental_and_persisted(tmp_path):
+    """an unchanged version is skipped, a new one replaces the terms"""
+    path = tmp_path / "index.db"
+    index = _index(path)
+
+    assert not index.add("2", "anything", version="a")
+    assert index.add("2", "Payroll calendar.", name="payroll.md", version="b")
+    assert index.search("onboarding") == []
+    index.remove("3")
+    index.close()
+
+    index = RetrievalIndex(str(path))
+    assert len(index) == 2
+    assert index.get_version("2") == "b"
+    assert [item.item_id for item in index.select_items("payroll revenue")] in (["2", "1"], ["1", "2"])
+    index.close()
+
+
+def test_index_folder_and_ask(stub_client, ai_stub, tmp_path):
+    """files are indexed by name and text, only the selected items are asked"""
+    ai_stub.folders = {
+        "0": [
+            {"type": "file", "id": "10", "name": "budget.txt", "etag": "0"},
+            {"type": "file", "id": "11", "name": "holiday.txt", "etag": "0"},
+            {"type": "file", "id": "12", "name": "budget-photo.jpg", "etag": "0"},
+        ]
+    }
+    ai_stub.contents["10"] = b"Marketing budget for the spring campaign."
+    ai_stub.contents["11"] = b"Holiday schedule."
+    extractor = ContentExtractor(stub_client, ExtractionCache(str(tmp_path / "cache")))
+    index = RetrievalIndex(str(tmp_path / "index.db"))
+
+    assert index.index_folder(stub_client, "0", extractor) == 3
+    assert index.index_folder(stub_client, "0", extractor) == 0
+    assert sorted(ai_stub.downloads) == ["10", "11"]
+
+    answer = index.ask(AI(stub_client), "campaign budget", k=5)
+
+    assert answer.answer == "answer to campaign budget"
+    assert [item["id"] for item in ai_stub.requests[-1]["items"]] == ["10", "12"]
+    assert ai_stub.requests[-1]["mode"] == "multiple_item_qa"
+    index.close()
+
+
+def test_embeddings_blend_with_bm25(tmp_path):
+    """hashed embeddings still rank the matching item first"""
+    pytest.importorskip("numpy")
+    index = RetrievalIndex(str(tmp_path / "index.db"), embedding_weight=0.3, dimensions=64)
+    index.add("1", "solar panels and wind turbines", version="a")
+    index.add("2", "tax return deadline", version="a")
+
+    assert index.search("wind turbines")[0][0] == "1"
+    index.close()
+
+
+def test_index_folder_skips_bad_files_and_prunes_removed_ones(stub_client, ai_stub, tmp_path):
+    """a corrupt file does not stop the indexing, deleted files leave the index"""
+    ai_stub.folders = {
+        "0": [
+            {"type": "file", "id": "10", "name": "broken.docx", "etag": "0"},
+            {"type": "file", "id": "11", "name": "notes.txt", "etag": "0"},
+            {"type": "file", "id": "12", "name": "old.txt", "etag": "0"},
+        ]
+    }
+    ai_stub.contents = {"10": b"not a zip file", "11": b"meeting notes", "12": b"old budget"}
+    extractor = ContentExtractor(stub_client, ExtractionCache(str(tmp_path / "cache")))
+    index = RetrievalIndex(str(tmp_path / "index.db"))
+    index.add("99", "indexed by hand", version="a")
+
+    assert index.index_folder(stub_client, "0", extractor) == 2
+    assert index.get_version("10") is None
+
+    del ai_stub.folders["0"][2]
+    index.index_folder(stub_client, "0", extractor)
+
+    assert index.search("budget") == []
+    assert index.get_version("12") is None
+    assert index.get_version("99") == "a"
+    index.close()
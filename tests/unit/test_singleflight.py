@@ -0,0 +1,137 @@
+""" check the single flight request coalescing"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from app.box_ai import AI, AIItem, QAMode
+from app.singleflight import SingleFlight
+
+
+def _wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_do_shares_one_call():
+    """callers arriving while the call is in flight get its value"""
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait()
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(single_flight.do, "key", call) for _ in range(5)]
+        _wait_for(lambda: single_flight.stats()["coalesced"] == 4)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert single_flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+    # completed calls are not cached
+    assert single_flight.do("key", lambda: "again") == "again"
+
+
+def test_do_shares_the_error():
+    """the waiting callers get the error of the call"""
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait()
+        raise ValueError("upstream failed")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(single_flight.do, "key", call) for _ in range(3)]
+        _wait_for(lambda: single_flight.stats()["coalesced"] == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_do_stream_fans_out_every_chunk():
+    """each subscriber gets the whole stream, read once from upstream"""
+    single_flight = SingleFlight()
+    pulled = []
+
+    def upstream():
+        for chunk in ["a", "b", "c"]:
+            pulled.append(chunk)
+            yield chunk
+
+    first = single_flight.do_stream("key", upstream)
+    assert next(first) == "a"
+    # a late subscriber replays the chunks already read
+    second = single_flight.do_stream("key", upstream)
+
+    assert list(second) == ["a", "b", "c"]
+    assert list(first) == ["b", "c"]
+    assert pulled == ["a", "b", "c"]
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_do_stream_closes_upstream_when_every_subscriber_leaves():
+    """the upstream stream is closed once nobody reads it"""
+    single_flight = SingleFlight()
+    closed = []
+
+    def upstream():
+        try:
+            yield from range(100)
+        finally:
+            closed.append(True)
+
+    first = single_flight.do_stream("key", upstream)
+    second = single_flight.do_stream("key", upstream)
+    next(first)
+    next(second)
+    first.close()
+    assert not closed
+    second.close()
+
+    assert closed == [True]
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_ai_coalesces_identical_questions(stub_client, ai_stub):
+    """concurrent identical questions make one ai/ask request"""
+    ai_stub.latency = 0.3
+    box_ai = AI(stub_client, single_flight=SingleFlight())
+    items = [AIItem("123", "file")]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(box_ai.ask_item, QAMode.SINGLE_ITEM_QA, "same?", items) for _ in range(4)]
+        answers = [future.result() for future in futures]
+
+    assert len(ai_stub.requests) == 1
+    assert {answer.answer for answer in answers} == {"answer to same?"}
+    assert len({id(answer) for answer in answers}) == 4
+
+
+def test_ai_fans_out_streamed_answers(stub_client, ai_stub):
+    """concurrent identical streamed questions share one stream"""
+    ai_stub.latency = 0.3
+    box_ai = AI(stub_client, single_flight=SingleFlight())
+    items = [AIItem("123", "file")]
+
+    def ask():
+        return "".join(
+            delta.answer for delta in box_ai.ask_item_streamed(QAMode.SINGLE_ITEM_QA, "same?", items, lean=True)
+        )
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        answers = list(executor.map(lambda _: ask(), range(3)))
+
+    assert answers == ["answer to same?"] * 3
+    assert len(ai_stub.requests) == 1
@@ -0,0 +1,147 @@
+""" check the stream broadcaster"""
+
+import threading
+
+import pytest
+
+from app.box_ai import AI, AIItem, QAMode
+from app.stream_broadcast import BLOCK, DROP, StreamBroadcaster, broadcast
+
+
+def _counting(count: int, produced: list, gate: threading.Event = None):
+    for index in range(count):
+        if gate is not None:
+            gate.wait()
+        produced.append(index)
+        yield index
+
+
+def test_every_consumer_gets_every_chunk():
+    """each subscription reads the whole stream, at its own pace"""
+    produced = []
+    subscriptions = broadcast(_counting(100, produced), consumers=3)
+    results = [None] * 3
+
+    def consume(index):
+        results[index] = list(subscriptions[index])
+
+    threads = [threading.Thread(target=consume, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [list(range(100))] * 3
+    assert produced == list(range(100))
+
+
+def test_block_policy_holds_the_source_back():
+    """a full blocking subscription pauses the source"""
+    consumed = []
+    ahead = []
+    full = threading.Event()
+
+    def source():
+        for index in range(100):
+            # chunks produced but not read yet
+            ahead.append(index - len(consumed))
+            if index == 2:
+                full.set()
+            yield index
+
+    broadcaster = StreamBroadcaster(source(), max_queue=2, policy=BLOCK)
+    subscription = broadcaster.subscribe()
+    broadcaster.start()
+    assert full.wait(5)
+
+    for chunk in subscription:
+        consumed.append(chunk)
+
+    assert consumed == list(range(100))
+    # at most two queued and one being read
+    assert max(ahead) <= 3
+
+
+def test_drop_policy_does_not_stall_the_others():
+    """a slow dropping consumer loses chunks, the others get everything"""
+    broadcaster = StreamBroadcaster(_counting(50, []), max_queue=5)
+    slow = broadcaster.subscribe(policy=DROP)
+    fast = broadcaster.subscribe(max_queue=100)
+    broadcaster.start()
+    broadcaster.join(5)
+
+    assert list(fast) == list(range(50))
+    assert list(slow) == list(range(5))
+    assert slow.dropped == 45
+
+
+def test_late_subscriber_replays_the_ring_buffer():
+    """a late subscription starts from the oldest chunk still buffered"""
+    gate = threading.Event()
+    broadcaster = StreamBroadcaster(_counting(10, [], gate), replay_size=4)
+    first = broadcaster.subscribe()
+    broadcaster.start()
+    gate.set()
+    assert [next(first) for _ in range(6)] == list(range(6))
+
+    broadcaster.join(5)
+    late = broadcaster.subscribe()
+
+    assert list(late) == [6, 7, 8, 9]
+    assert late.missed == 6
+    assert list(first) == [6, 7, 8, 9]
+
+
+def test_replay_is_cut_to_the_queue_size():
+    """a late subscription never starts with more than max_queue chunks"""
+    broadcaster = StreamBroadcaster(_counting(10, []), replay_size=8)
+    broadcaster.start()
+    broadcaster.join(5)
+
+    late = broadcaster.subscribe(max_queue=3)
+
+    assert list(late) == [7, 8, 9]
+    assert late.missed == 7
+
+
+def test_source_error_reaches_every_consumer():
+    """the error is raised after the chunks read before it"""
+
+    def failing():
+        yield 1
+        raise ValueError("stream broken")
+
+    subscriptions = broadcast(failing(), consumers=2)
+    for subscription in subscriptions:
+        assert next(subscription) == 1
+        with pytest.raises(ValueError):
+            next(subscription)
+
+
+def test_source_is_closed_when_every_consumer_leaves():
+    """nobody reading stops the source"""
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield "chunk"
+        finally:
+            closed.set()
+
+    first, second = broadcast(endless(), consumers=2, max_queue=1)
+    next(first)
+    first.close()
+    next(second)
+    second.close()
+
+    assert closed.wait(5)
+
+
+def test_broadcast_an_ai_answer(stub_client):
+    """a streamed answer is read once and delivered to each consumer"""
+    stream = AI(stub_client).ask_item_streamed(QAMode.SINGLE_ITEM_QA, "hello", [AIItem("123", "file")], lean=True)
+    websocket, log = broadcast(stream, consumers=2)
+
+    assert "".join(delta.answer for delta in websocket) == "answer to hello"
+    assert "".join(delta.answer for delta in log) == "answer to hello"
@@ -0,0 +1,84 @@
+""" check the proactive token refresh"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import json
+
+from app.box_oauth import read_tokens_file, write_tokens_file
+from app.config import AppConfig
+from app.token_manager import TokenManager
+
+
+def _write_tokens(path, access_token: str, expires_in: timedelta):
+    write_tokens_file(
+        {
+            "access_token": access_token,
+            "access_token_expires_on": str(datetime.today() + expires_in),
+            "refresh_token": f"refresh_for_{access_token}",
+            "refresh_token_expires_on": str(datetime.today() + timedelta(days=60)),
+        },
+        str(path),
+    )
+
+
+def _manager(path, ai_stub) -> TokenManager:
+    manager = TokenManager(AppConfig(), token_path=str(path))
+    manager.oauth.api_config.OAUTH2_API_URL = f"http://127.0.0.1:{ai_stub.server_port}/oauth2"
+    return manager
+
+
+def test_valid_token_is_not_refreshed(tmp_path, ai_stub):
+    """a token far from expiry is used as is"""
+    path = tmp_path / "oauth.json"
+    _write_tokens(path, "valid", timedelta(minutes=50))
+
+    manager = _manager(path, ai_stub)
+
+    assert manager.ensure_fresh() == "valid"
+    assert ai_stub.token_requests == []
+
+
+def test_concurrent_refresh_is_single_flighted(tmp_path, ai_stub):
+    """many threads close to expiry share one refresh"""
+    path = tmp_path / "oauth.json"
+    _write_tokens(path, "expiring", timedelta(minutes=1))
+    manager = _manager(path, ai_stub)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda _: manager.ensure_fresh(), range(16)))
+
+    assert set(tokens) == {"access_1"}
+    assert len(ai_stub.token_requests) == 1
+    assert ai_stub.token_requests[0]["refresh_token"] == ["refresh_for_expiring"]
+    assert read_tokens_file(str(path))["access_token"] == "access_1"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sibling_refresh_is_adopted(tmp_path, ai_stub):
+    """tokens refreshed by another process are picked up from the file"""
+    path = tmp_path / "oauth.json"
+    _write_tokens(path, "expiring", timedelta(minutes=1))
+    manager = _manager(path, ai_stub)
+
+    _write_tokens(path, "from_sibling", timedelta(minutes=60))
+
+    assert manager.ensure_fresh() == "from_sibling"
+    assert manager.oauth.access_token == "from_sibling"
+    assert ai_stub.token_requests == []
+
+
+def test_background_refresh(tmp_path, ai_stub):
+    """the background thread refreshes before expiry"""
+    path = tmp_path / "oauth.json"
+    _write_tokens(path, "expiring", timedelta(minutes=1))
+    manager = _manager(path, ai_stub).start()
+
+    for _ in range(100):
+        if ai_stub.token_requests:
+            break
+        manager._stopped.wait(0.02)
+    manager.stop()
+
+    assert len(ai_stub.token_requests) == 1
+    with open(path, "r", encoding="UTF-8") as file:
+        assert json.load(file)["access_token"] == "access_1"
@@ -0,0 +1,74 @@
+""" check the shared token stores"""
+
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+
+import pytest
+
+from app.box_oauth import tokens_json
+from app.config import AppConfig
+from app.token_manager import TokenManager
+from app.token_store import LockedFileTokenStore, SQLiteTokenStore
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    """each token store backend"""
+    if request.param == "file":
+        yield LockedFileTokenStore(str(tmp_path / "oauth.json"))
+    else:
+        store = SQLiteTokenStore(str(tmp_path / "oauth.db"))
+        yield store
+        store.close()
+
+
+def test_compare_and_swap(store):
+    """only the holder of the current refresh token can replace it"""
+    assert store.load() is None
+    assert store.compare_and_swap(None, tokens_json("access_1", "refresh_1"))
+    version = store.version()
+
+    assert not store.compare_and_swap("refresh_0", tokens_json("stale", "stale"))
+    assert store.load()["access_token"] == "access_1"
+    assert store.version() == version
+
+    assert store.compare_and_swap("refresh_1", tokens_json("access_2", "refresh_2"))
+    assert store.load()["refresh_token"] == "refresh_2"
+    assert store.version() != version
+
+
+def test_lock_is_reentrant(store):
+    """the store can be written while its lock is held"""
+    with store.lock:
+        with store.lock:
+            assert store.compare_and_swap(None, tokens_json("access_1", "refresh_1"))
+    assert store.load()["access_token"] == "access_1"
+
+
+def _refresh_in_worker(token_path: str, oauth2_url: str, results) -> None:
+    manager = TokenManager(AppConfig(), token_path=token_path)
+    manager.oauth.api_config.OAUTH2_API_URL = oauth2_url
+    results.put(manager.ensure_fresh())
+
+
+def test_worker_processes_share_one_refresh(tmp_path, ai_stub):
+    """sibling processes pick up the refresh instead of issuing their own"""
+    token_path = str(tmp_path / "oauth.json")
+    expiring = tokens_json("expiring", "refresh_0")
+    expiring["access_token_expires_on"] = str(datetime.today() + timedelta(minutes=1))
+    assert LockedFileTokenStore(token_path).compare_and_swap(None, expiring)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    oauth2_url = f"http://127.0.0.1:{ai_stub.server_port}/oauth2"
+    workers = [context.Process(target=_refresh_in_worker, args=(token_path, oauth2_url, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    tokens = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    assert set(tokens) == {"access_1"}
+    assert len(ai_stub.token_requests) == 1
+    assert os.path.exists(f"{token_path}.lock")